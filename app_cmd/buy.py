@@ -9,9 +9,24 @@ def buy_cmd(args: Namespace):
     import uuid
 
     from util import LOG_DIR
-    from task.buy import buy
+    from util.CancelToken import CancelToken, install_signal_handlers
+    from task import events
+    from task.policy import OutcomePolicy
+    from task.runner import (
+        BuyTask,
+        run_buy_tasks,
+        run_buy_tasks_async,
+        unique_task_names,
+    )
     from loguru import logger
 
+    cancel_token = CancelToken()
+    install_signal_handlers(cancel_token)
+    # (终端地址, telemetry)，按引擎启动心跳线程或心跳协程
+    heartbeats = []
+    extra_sinks: list[events.EventSink] = [events.TerminalQRSink()]
+    viewer_qr = None
+
     def load_tickets_info(tickets_info: str) -> tuple[str, str | None]:
         config_path = os.path.expanduser(tickets_info)
         if os.path.isfile(config_path):
@@ -23,80 +38,125 @@ def buy_cmd(args: Namespace):
                 raise SystemExit(f"读取配置文件失败: {exc}") from exc
         return tickets_info, None
 
-    tickets_info, config_path = load_tickets_info(args.tickets_info)
-    filename = os.path.basename(config_path) if config_path else "default"
-    filename_only = os.path.basename(filename)
+    tickets_infos = (
+        args.tickets_info
+        if isinstance(args.tickets_info, list)
+        else [args.tickets_info]
+    )
+    loaded = [load_tickets_info(t) for t in tickets_infos]
+    task_names = unique_task_names(
+        [os.path.basename(path) if path else "default" for _, path in loaded]
+    )
+    tasks = [
+        BuyTask(name=name, tickets_info=content)
+        for name, (content, _) in zip(task_names, loaded)
+    ]
+    if len(tasks) == 1:
+        # 单个配置沿用进程级的状态，保持原有行为
+        tasks[0].telemetry = GlobalStatusInstance.telemetry
+        tasks[0].telemetry.task = tasks[0].name
+    filename_only = " ".join(task_names)
     if getattr(args, "web", False):
         log_file = loguru_config(
-            LOG_DIR, f"{uuid.uuid1()}.log", enable_console=False, file_colorize=True
+            LOG_DIR, f"{uuid.uuid1()}.log", enable_console=False, file_colorize=False
         )
-        from task.endpoint import start_heartbeat_thread
-        import gradio_client
-        import gradio as gr
-        from gradio_log import Log
+        import webbrowser
+        from task.viewer import ViewerQRSink, start_log_viewer
 
-        with gr.Blocks(
-            head="""<script src="https://cdn.jsdelivr.net/npm/@tailwindcss/browser@4"></script>""",
-            title=f"{filename_only}",
-            fill_height=True,
-        ) as demo:
-            gr.Markdown(
-                f"""
-                # 当前抢票 {filename_only}
-                > 你可以在这里查看程序的运行日志
-                """
-            )
-
-            Log(
-                log_file,
-                dark=True,
-                scale=1,
-                xterm_log_level="info",
-                xterm_scrollback=5000,
-                elem_classes="h-full",
-            )
-
-            def exit_program():
-                print(f"{filename_only} ，关闭程序...")
-                os._exit(0)
-
-            btn = gr.Button("关闭程序")
-            btn.click(fn=exit_program)
+        def exit_program():
+            print(f"{filename_only} ，关闭程序...")
+            cancel_token.cancel("网页端关闭程序")
 
+        viewer = start_log_viewer(
+            filename_only,
+            on_exit=exit_program,
+            host=args.server_name,
+            port=args.port or 0,
+        )
+        if getattr(args, "share", False):
+            logger.warning("抢票日志页面不支持 --share 公网分享，仅在本机地址上提供")
         print(f"抢票日志路径： {log_file}")
         print(f"运行程序网址   ↓↓↓↓↓↓↓↓↓↓↓↓↓↓   {filename_only} ")
-        demo.launch(
-            server_name=args.server_name,
-            server_port=args.port,
-            share=args.share,
-            inbrowser=True,
-            prevent_thread_lock=True,
-        )
-        client = gradio_client.Client(args.endpoint_url)
-        assert demo.local_url
+        print(viewer.url)
+        webbrowser.open(viewer.url)
+        viewer_qr = ViewerQRSink(viewer)
+        extra_sinks.append(viewer_qr)
         GlobalStatusInstance.nowTask = filename_only
-        start_heartbeat_thread(
-            client,
-            self_url=demo.local_url,
-            to_url=args.endpoint_url,
-        )
+        if args.endpoint_url:
+            heartbeats = [
+                (
+                    viewer.url if len(tasks) == 1 else f"{viewer.url}#{task.name}",
+                    task.telemetry,
+                )
+                for task in tasks
+            ]
     else:
         log_file = loguru_config(
             LOG_DIR, f"{uuid.uuid1()}.log", enable_console=True, file_colorize=True
         )
-    buy(
-        tickets_info,
-        args.time_start,
-        args.interval,
-        args.audio_path,
-        args.pushplusToken,
-        args.serverchanKey,
-        args.barkToken,
-        args.https_proxys,
-        args.serverchan3ApiUrl,
-        args.ntfy_url,
-        args.ntfy_username,
-        args.ntfy_password,
-        not args.hide_random_message,
+    if args.low_jitter:
+        from util.CriticalWindow import get_critical_window
+
+        get_critical_window().worker_index = args.worker_index
+    buy_kwargs = dict(
+        time_start=args.time_start,
+        interval=args.interval,
+        audio_path=args.audio_path,
+        pushplusToken=args.pushplusToken,
+        serverchanKey=args.serverchanKey,
+        barkToken=args.barkToken,
+        https_proxys=args.https_proxys,
+        serverchan3ApiUrl=args.serverchan3ApiUrl,
+        ntfy_url=args.ntfy_url,
+        ntfy_username=args.ntfy_username,
+        ntfy_password=args.ntfy_password,
+        show_random_message=not args.hide_random_message,
+        extra_sinks=extra_sinks,
+        low_jitter=args.low_jitter,
+        policy=OutcomePolicy.from_budgets(
+            prepare_attempts=args.prepare_attempts,
+            prepare_timeout=args.prepare_timeout,
+            create_attempts=args.create_attempts,
+            create_timeout=args.create_timeout,
+            connect_timeout=args.connect_timeout,
+            read_timeout=args.read_timeout,
+            adaptive_timeout=args.adaptive_timeout,
+        ),
     )
-    logger.info("抢票完成后退出程序。。。。。")
+    if args.engine == "async":
+        from task.abuy import run_event_loop
+        from task.endpoint import heartbeat_async
+
+        run_event_loop(
+            run_buy_tasks_async(
+                tasks,
+                cancel_token=cancel_token,
+                background=[
+                    heartbeat_async(url, args.endpoint_url, telemetry, cancel_token)
+                    for url, telemetry in heartbeats
+                ],
+                **buy_kwargs,
+            )
+        )
+        final_reports = []
+    else:
+        from task.endpoint import start_heartbeat_thread
+
+        final_reports = [
+            start_heartbeat_thread(url, args.endpoint_url, telemetry, cancel_token)
+            for url, telemetry in heartbeats
+        ]
+        run_buy_tasks(tasks, cancel_token=cancel_token, **buy_kwargs)
+    if viewer_qr is not None and viewer_qr.shown and not cancel_token.cancelled:
+        # 网页上的付款二维码需要保持可见，直到用户点击关闭程序
+        logger.info("付款二维码已显示在网页上，付款后点击“关闭程序”退出")
+        while not cancel_token.wait(1):
+            pass
+    if cancel_token.cancelled:
+        logger.info(f"已停止抢票（{cancel_token.reason}），退出程序")
+    else:
+        logger.info("抢票完成后退出程序。。。。。")
+    # 退出前上报最终状态并写完日志，异步引擎的心跳协程退出时已上报
+    for report in final_reports:
+        report()
+    logger.complete()
@@ -5,31 +5,17 @@ Allows users to generate ticket purchase configurations via terminal.
 import json
 import os
 import re
+from fnmatch import fnmatch
 from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse, parse_qs
 
 from loguru import logger
 
-from util import TEMP_PATH, GLOBAL_COOKIE_PATH, main_request, set_main_request, ConfigDB
+from util import TEMP_PATH, GLOBAL_COOKIE_PATH, set_main_request, ConfigDB
+from util import ApiCache
+from util.ApiCache import fetch_project, fetch_project_by_date, prefetch_project_dates
 from util.BiliRequest import BiliRequest
-
-# 销售状态映射
-SALES_FLAG_MAP = {
-    1: "不可售",
-    2: "预售",
-    3: "停售",
-    4: "售罄",
-    5: "不可用",
-    6: "库存紧张",
-    8: "暂时售罄",
-    9: "不在白名单",
-    101: "未开始",
-    102: "已结束",
-    103: "未完成",
-    105: "下架",
-    106: "已取消",
-}
-
+from util.Catalogue import Catalogue, Ticket, build_buy_config
 
 def filename_filter(filename: str) -> str:
     """过滤文件名中的非法字符"""
@@ -90,7 +76,9 @@ def get_multiple_choice(prompt: str, max_val: int) -> List[int]:
             print(f"  ❌ 输入错误: {e}")
 
 
-def fetch_ticket_info(url_or_id: str, request: BiliRequest) -> Dict[str, Any]:
+def fetch_ticket_info(
+    url_or_id: str, request: BiliRequest, refresh: bool = False
+) -> Dict[str, Any]:
     """获取票务信息"""
     # 提取ID
     if "http" in url_or_id:
@@ -100,11 +88,8 @@ def fetch_ticket_info(url_or_id: str, request: BiliRequest) -> Dict[str, Any]:
     else:
         ticket_id = url_or_id
 
-    # 请求票务信息
-    res = request.get(
-        url=f"https://show.bilibili.com/api/ticket/project/getV2?version=134&id={ticket_id}&project_id={ticket_id}"
-    )
-    ret = res.json()
+    # 请求票务信息（优先使用缓存）
+    ret = fetch_project(request, ticket_id, refresh=refresh)
 
     if ret.get("errno", ret.get("code")) == 100001:
         raise ValueError("输入无效，请输入一个有效的票务ID或网址")
@@ -114,21 +99,30 @@ def fetch_ticket_info(url_or_id: str, request: BiliRequest) -> Dict[str, Any]:
     return ret["data"]
 
 
-def fetch_buyers(request: BiliRequest, project_id: int) -> List[Dict]:
+def fetch_buyers(
+    request: BiliRequest, project_id: int, refresh: bool = False
+) -> List[Dict]:
     """获取购票人列表"""
-    res = request.get(
-        url=f"https://show.bilibili.com/api/ticket/buyer/list?is_default&projectId={project_id}"
-    )
-    return res.json()["data"]["list"]
+    res = ApiCache.fetch_buyers(request, project_id, refresh=refresh)
+    return res["data"]["list"]
 
 
-def fetch_addresses(request: BiliRequest) -> List[Dict]:
+def fetch_addresses(request: BiliRequest, refresh: bool = False) -> List[Dict]:
     """获取收货地址列表"""
-    res = request.get(url="https://show.bilibili.com/api/ticket/addr/list")
-    return res.json()["data"]["addr_list"]
+    res = ApiCache.fetch_addresses(request, refresh=refresh)
+    return res["data"]["addr_list"]
+
 
+def save_config(config: Dict[str, Any], output_dir: str) -> str:
+    """保存配置文件，返回文件路径"""
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = os.path.join(output_dir, filename_filter(config["detail"]) + ".json")
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+    return filepath
 
-def config_cmd_interactive():
+
+def config_cmd_interactive(refresh: bool = False):
     """交互式配置生成"""
     from util import main_request
     
@@ -138,7 +132,7 @@ def config_cmd_interactive():
 
     # 检查登录状态
     try:
-        username = main_request.get_request_name()
+        username = main_request.get_request_name(refresh=refresh)
         if not username:
             print("\n⚠️  当前未登录，请先运行 'btb login' 登录")
             return
@@ -159,62 +153,28 @@ def config_cmd_interactive():
 
     try:
         print("\n⏳ 正在获取票务信息...")
-        data = fetch_ticket_info(url, main_request)
-        project_id = data["id"]
-        project_name = data["name"]
-        is_hot_project = data["hotProject"]
-        
+        catalogue = Catalogue(fetch_ticket_info(url, main_request, refresh=refresh))
+        project_id = catalogue.project_id
+        project_name = catalogue.name
+
         print(f"\n✅ 获取成功!")
         print(f"   项目名称: {project_name}")
-        print(f"   热门项目: {'是' if is_hot_project else '否'}")
+        print(f"   热门项目: {'是' if catalogue.is_hot_project else '否'}")
 
-        # 解析票种信息
-        ticket_list = []
-        ticket_str_list = []
-        
-        for screen in data["screen_list"]:
-            if "name" not in screen:
-                continue
-            screen_name = screen["name"]
-            screen_id = screen["id"]
-            screen_project_id = screen.get("project_id", project_id)
-            
-            express_fee = 0
-            if data.get("has_eticket"):
-                express_fee = 0
-            else:
-                if screen.get("express_fee", 0) >= 0:
-                    express_fee = screen.get("express_fee", 0)
-
-            for ticket in screen["ticket_list"]:
-                ticket_desc = ticket["desc"]
-                sale_start = ticket.get("sale_start", "未知")
-                ticket_price = ticket["price"] + express_fee
-                ticket["price"] = ticket_price
-                ticket["screen"] = screen_name
-                ticket["screen_id"] = screen_id
-                ticket["is_hot_project"] = is_hot_project
-                
-                sale_status = SALES_FLAG_MAP.get(ticket.get("sale_flag_number", 0), "未知")
-                ticket_str = f"{screen_name} - {ticket_desc} - ¥{ticket_price / 100:.2f} - {sale_status} - 【起售: {sale_start}】"
-                ticket_str_list.append(ticket_str)
-                ticket_list.append({
-                    "project_id": screen_project_id,
-                    "ticket": ticket
-                })
-
-        if not ticket_list:
+        tickets = catalogue.tickets()
+        if not tickets:
             print("❌ 未找到可用的票种信息")
             return
 
         # 选择票种
+        ticket_str_list = [t.label for t in tickets]
         print_menu("选择票种", ticket_str_list)
         ticket_idx = get_single_choice("请选择票种", len(ticket_str_list))
-        selected_ticket = ticket_list[ticket_idx]
+        selected_ticket = tickets[ticket_idx]
 
         # 获取购票人列表
         print("\n⏳ 正在获取购票人列表...")
-        buyers = fetch_buyers(main_request, project_id)
+        buyers = fetch_buyers(main_request, project_id, refresh=refresh)
         if not buyers:
             print("❌ 没有找到购票人信息")
             print("   请在B站APP「会员购」-「个人中心」-「购票人信息」中添加")
@@ -228,7 +188,7 @@ def config_cmd_interactive():
 
         # 获取收货地址
         print("\n⏳ 正在获取收货地址...")
-        addresses = fetch_addresses(main_request)
+        addresses = fetch_addresses(main_request, refresh=refresh)
         if not addresses:
             print("❌ 没有找到收货地址")
             print("   请在B站APP「会员购」-「地址管理」中添加")
@@ -257,44 +217,19 @@ def config_cmd_interactive():
 
         # 生成配置
         username = main_request.get_request_name()
-        detail = f"{username}-{project_name}-{ticket_str_list[ticket_idx]}"
-        for p in selected_buyers:
-            detail += f"-{p['name']}"
-
-        config = {
-            "username": username,
-            "detail": detail,
-            "count": len(selected_buyers),
-            "screen_id": selected_ticket["ticket"]["screen_id"],
-            "project_id": selected_ticket["project_id"],
-            "is_hot_project": selected_ticket["ticket"]["is_hot_project"],
-            "sku_id": selected_ticket["ticket"]["id"],
-            "order_type": 1,
-            "pay_money": selected_ticket["ticket"]["price"] * len(selected_buyers),
-            "buyer_info": selected_buyers,
-            "buyer": buyer_name,
-            "tel": buyer_phone,
-            "deliver_info": {
-                "name": selected_addr["name"],
-                "tel": selected_addr["phone"],
-                "addr_id": selected_addr["id"],
-                "addr": (
-                    selected_addr.get("prov", "") +
-                    selected_addr.get("city", "") +
-                    selected_addr.get("area", "") +
-                    selected_addr.get("addr", "")
-                ),
-            },
-            "cookies": main_request.cookieManager.get_cookies(),
-            "phone": main_request.cookieManager.get_config_value("phone", ""),
-        }
+        config = build_buy_config(
+            main_request,
+            username,
+            catalogue,
+            selected_ticket,
+            selected_buyers,
+            buyer_name,
+            buyer_phone,
+            selected_addr,
+        )
 
         # 保存配置文件
-        filename = filename_filter(detail) + ".json"
-        filepath = os.path.join(TEMP_PATH, filename)
-        
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=4)
+        filepath = save_config(config, TEMP_PATH)
 
         print("\n" + "="*60)
         print("  ✅ 配置生成成功!")
@@ -314,6 +249,132 @@ def config_cmd_interactive():
         return None
 
 
+def _match_tickets(candidates: List[Ticket], selectors: List[Any]) -> List[Ticket]:
+    """selector 为 sku_id 或匹配票种名称的通配符，如 "*VIP*" """
+    matched: List[Ticket] = []
+    for selector in selectors:
+        if isinstance(selector, int) or str(selector).isdigit():
+            hits = [t for t in candidates if t.sku_id == int(selector)]
+        else:
+            hits = [t for t in candidates if fnmatch(t.label, str(selector))]
+        if not hits:
+            raise ValueError(f"票种 {selector} 没有匹配到任何票")
+        matched.extend(t for t in hits if t not in matched)
+    return matched
+
+
+def _match_by_id_or_name(items: List[Dict], selector: Any, kind: str) -> Dict:
+    for item in items:
+        if str(item["id"]) == str(selector) or item.get("name") == selector:
+            return item
+    raise ValueError(f"没有找到{kind} {selector}")
+
+
+def _add_linkgoods(catalogue: Catalogue, link_ids: Any, refresh: bool) -> List[Ticket]:
+    """把场贩商品的票加入目录，link_ids 为 ID 列表或 all"""
+    from util import main_request
+
+    if link_ids == "all":
+        ret = ApiCache.fetch_linkgoods_list(main_request, catalogue.project_id, refresh)
+        if ret.get("errno", ret.get("code")) != 0:
+            raise ValueError(f"获取场贩商品列表失败: {ret.get('msg', ret.get('message', '未知错误'))}")
+        link_ids = [item["id"] for item in ret["data"]["list"]]
+    elif not isinstance(link_ids, list) or not all(str(i).isdigit() for i in link_ids):
+        raise ValueError("link_ids 应为场贩商品 ID 列表或 \"all\"")
+    tickets: List[Ticket] = []
+    for link_id in link_ids:
+        ret = ApiCache.fetch_linkgoods_detail(main_request, int(link_id), refresh)
+        if ret.get("errno", ret.get("code")) != 0:
+            raise ValueError(f"获取场贩商品 {link_id} 失败: {ret.get('msg', ret.get('message', '未知错误'))}")
+        tickets += catalogue.add_linkgoods(ret["data"], int(link_id))
+    return tickets
+
+
+def config_cmd_spec(spec_path: str, refresh: bool = False) -> List[str]:
+    """
+    根据描述文件批量生成配置，票务目录和账号信息只获取一次。
+
+    描述文件示例:
+    {
+        "url": "https://show.bilibili.com/platform/detail.html?id=84096",
+        "dates": ["2025-10-01", "2025-10-02"],
+        "link_ids": [12345],
+        "tickets": [1234567, "*VIP*"],
+        "buyers": [123456, "张三"],
+        "address": 654321,
+        "contact": {"name": "张三", "tel": "13800000000"},
+        "output_dir": "./configs"
+    }
+    dates 可写 "all" 表示全部日期；link_ids 为场贩商品 ID，可写 "all" 表示项目的全部场贩商品；address 只有一个地址时可省略；
+    contact 和 output_dir 省略时使用上次填写的联系人和默认目录
+    """
+    from util import main_request
+
+    try:
+        with open(spec_path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        for key in ("url", "tickets", "buyers"):
+            if not spec.get(key):
+                raise ValueError(f"描述文件缺少 {key}")
+
+        username = main_request.get_request_name(refresh=refresh)
+        catalogue = Catalogue(fetch_ticket_info(str(spec["url"]), main_request, refresh))
+        dates = spec.get("dates") or []
+        if dates == "all":
+            dates = catalogue.sales_dates
+        futures = prefetch_project_dates(
+            main_request, catalogue.project_id, dates, refresh
+        )
+        candidates = catalogue.tickets()
+        for date in dates:
+            futures[date].result()
+            data = fetch_project_by_date(main_request, catalogue.project_id, date)
+            if data.get("errno", data.get("code")) != 0:
+                raise ValueError(f"获取 {date} 的票务信息失败: {data.get('msg', '未知错误')}")
+            candidates += catalogue.add_date(date, data["data"])
+        candidates += _add_linkgoods(catalogue, spec.get("link_ids") or [], refresh)
+        tickets = _match_tickets(candidates, spec["tickets"])
+
+        all_buyers = fetch_buyers(main_request, catalogue.project_id, refresh=refresh)
+        buyers = [_match_by_id_or_name(all_buyers, b, "购票人") for b in spec["buyers"]]
+        addresses = fetch_addresses(main_request, refresh=refresh)
+        if spec.get("address") is not None:
+            address = _match_by_id_or_name(addresses, spec["address"], "收货地址")
+        elif len(addresses) == 1:
+            address = addresses[0]
+        else:
+            raise ValueError("有多个收货地址，请在描述文件中指定 address")
+
+        contact = spec.get("contact") or {}
+        buyer_name = contact.get("name") or ConfigDB.get("people_buyer_name") or ""
+        buyer_tel = contact.get("tel") or ConfigDB.get("people_buyer_phone") or ""
+        if not buyer_name or not buyer_tel:
+            raise ValueError("联系人姓名和电话不能为空")
+        output_dir = spec.get("output_dir") or TEMP_PATH
+
+        paths = []
+        for ticket in tickets:
+            config = build_buy_config(
+                main_request,
+                username,
+                catalogue,
+                ticket,
+                buyers,
+                buyer_name,
+                buyer_tel,
+                address,
+            )
+            paths.append(save_config(config, output_dir))
+            print(f"✅ {ticket.label} -> {paths[-1]}")
+        print(f"\n共生成 {len(paths)} 个配置文件，可使用以下命令同时抢票:")
+        print("   btb buy " + " ".join(f'"{p}"' for p in paths))
+        return paths
+    except Exception as e:
+        logger.exception(e)
+        print(f"\n❌ 错误: {e}")
+        return []
+
+
 def config_cmd(args):
     """配置命令入口"""
     from argparse import Namespace
@@ -326,4 +387,8 @@ def config_cmd(args):
             print(f"❌ 加载cookies文件失败: {e}")
             return
     
-    config_cmd_interactive()
+    refresh = getattr(args, "refresh", False)
+    if getattr(args, "spec", ""):
+        config_cmd_spec(args.spec, refresh=refresh)
+    else:
+        config_cmd_interactive(refresh=refresh)
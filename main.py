@@ -12,7 +12,28 @@ def str_to_bool(value):
     return str(value).strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
-def main():
+def non_negative_int(value) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be >= 0, got {value}")
+    return number
+
+
+def positive_float(value) -> float:
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be > 0, got {value}")
+    return number
+
+
+def non_negative_float(value) -> float:
+    number = float(value)
+    if not number >= 0:
+        raise argparse.ArgumentTypeError(f"must be >= 0, got {value}")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
     gradio_parent = argparse.ArgumentParser(add_help=False)
     gradio_parent.add_argument(
         "--share",
@@ -48,7 +69,9 @@ def main():
             "命令行使用示例:\n"
             "  btb login                        # 扫码登录\n"
             "  btb config                       # 生成配置文件\n"
+            "  btb config --spec spec.json      # 按描述文件批量生成配置\n"
             "  btb buy tickets.json             # 开始抢票\n"
+            "  btb buy a.json b.json            # 单进程同时运行多个配置\n"
             "  btb buy tickets.json --interval 500 --time_start 2024-01-01T10:00:00\n"
             "  btb info https://show.bilibili.com/platform/detail.html?id=84096\n\n"
         ),
@@ -97,6 +120,17 @@ def main():
         default="",
         help="Path to cookies JSON file to use",
     )
+    config_parser.add_argument(
+        "--spec",
+        type=str,
+        default="",
+        help="Generate configs non-interactively from a JSON spec file (url, tickets, buyers, ...)",
+    )
+    config_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached project and account data and fetch it again",
+    )
 
     # ===== Info Command =====
     info_parser = subparsers.add_parser(
@@ -109,6 +143,11 @@ def main():
         type=str,
         help="Ticket project URL, e.g. https://show.bilibili.com/platform/detail.html?id=84096",
     )
+    info_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached project data and fetch it again",
+    )
     buy_parser = subparsers.add_parser(
         "buy",
         help="Buy tickets directly in the command line",
@@ -119,7 +158,11 @@ def main():
     buy_core.add_argument(
         "tickets_info",
         type=str,
-        help="Ticket information in JSON format or a path to a JSON config file.",
+        nargs="+",
+        help=(
+            "Ticket information in JSON format or a path to a JSON config file. "
+            "Pass several config files to run them as tasks in one process."
+        ),
     )
     buy_core.add_argument(
         "--interval",
@@ -145,6 +188,63 @@ def main():
         default=os.environ.get("BTB_HTTPS_PROXYS", "none"),
         help="HTTPS proxy, e.g. http://127.0.0.1:8080",
     )
+    buy_core.add_argument(
+        "--engine",
+        choices=["sync", "async"],
+        default=os.environ.get("BTB_ENGINE", "sync"),
+        help=(
+            "Order engine: 'sync' uses requests in worker threads, 'async' runs "
+            "every task and the heartbeat on one asyncio loop (uvloop if installed)."
+        ),
+    )
+
+    # ===== Retry Policy =====
+    policy = buy_parser.add_argument_group("Retry Policy Options")
+    policy.add_argument(
+        "--create_attempts",
+        type=non_negative_int,
+        default=get_env_default("CREATE_ATTEMPTS", "60", str),
+        help="createV2 attempts per prepared order before preparing again (0 = unlimited). Defaults to 60.",
+    )
+    policy.add_argument(
+        "--create_timeout",
+        type=non_negative_float,
+        default=get_env_default("CREATE_TIMEOUT", "0", str),
+        help="Seconds spent on createV2 per prepared order before preparing again (0 = unlimited).",
+    )
+    policy.add_argument(
+        "--prepare_attempts",
+        type=non_negative_int,
+        default=get_env_default("PREPARE_ATTEMPTS", "0", str),
+        help="Consecutive failed prepare attempts before giving up (0 = unlimited).",
+    )
+    policy.add_argument(
+        "--prepare_timeout",
+        type=non_negative_float,
+        default=get_env_default("PREPARE_TIMEOUT", "0", str),
+        help="Seconds of consecutive prepare failures before giving up (0 = unlimited).",
+    )
+    policy.add_argument(
+        "--connect_timeout",
+        type=positive_float,
+        default=get_env_default("CONNECT_TIMEOUT", "3.05", str),
+        help="Connect timeout (s) for prepare and createV2. Defaults to 3.05.",
+    )
+    policy.add_argument(
+        "--read_timeout",
+        type=positive_float,
+        default=get_env_default("READ_TIMEOUT", "5", str),
+        help="Read timeout (s) for prepare and createV2. Defaults to 5.",
+    )
+    policy.add_argument(
+        "--adaptive_timeout",
+        type=non_negative_float,
+        default=get_env_default("ADAPTIVE_TIMEOUT", "0", str),
+        help=(
+            "Use this multiple of the recent p95 latency as the read timeout for "
+            "prepare and createV2, capped by --read_timeout (0 = fixed)."
+        ),
+    )
 
     # ===== Notifications =====
     notify = buy_parser.add_argument_group("Notification Options")
@@ -210,9 +310,36 @@ def main():
         action="store_true",
         help="Hide random message when fail.",
     )
+    runtime.add_argument(
+        "--low_jitter",
+        action="store_true",
+        default=get_env_default("LOW_JITTER", False, str_to_bool),
+        help=(
+            "Shortly before the start time, freeze and disable GC, raise priority "
+            "and pin each task's order thread to its own CPU where allowed; "
+            "restored after the order or 60 seconds."
+        ),
+    )
+    runtime.add_argument(
+        "--worker_index",
+        type=int,
+        default=get_env_default("WORKER_INDEX", "0", str),
+        help=(
+            "Index of this process among buy processes started together; "
+            "--low_jitter assigns CPUs starting from it. Defaults to 0."
+        ),
+    )
+
+    # ===== Worker Command (内部使用，不在帮助中显示) =====
+    subparsers.add_parser("worker", parents=[gradio_parent])
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
 
-    args = parser.parse_args()
-    
     if args.command == "login":
         from app_cmd.login import login_cmd
         login_cmd(args=args)
@@ -225,6 +352,9 @@ def main():
     elif args.command == "buy":
         from app_cmd.buy import buy_cmd
         buy_cmd(args=args)
+    elif args.command == "worker":
+        from task.pool import worker_cmd
+        worker_cmd(parser)
     else:
         from app_cmd.ticker import ticker_cmd
         ticker_cmd(args=args)
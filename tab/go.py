@@ -1,14 +1,20 @@
+import asyncio
 import datetime
+import html
 import os
 import platform
-import time
+import sys
+import threading
 import gradio as gr
 from gradio import SelectData
 from loguru import logger
 import requests
 
-from task.buy import buy_new_terminal
-from util import ConfigDB, Endpoint, GlobalStatusInstance, time_service
+from task.buy import build_buy_args, buy_new_terminal, parse_time_start
+from task.endpoint import get_heartbeat_server
+from task.pool import get_worker_pool
+from task.supervisor import get_supervisor
+from util import ConfigDB, ERRNO_DICT, GlobalStatusInstance, time_service
 
 
 def withTimeString(string):
@@ -134,13 +140,27 @@ def go_tab(demo: gr.Blocks):
             )
 
             test_proxy_btn = gr.Button("🔍 测试代理连通性")
-            test_timeout_ui = gr.Number(
-                label="测试代理超时时间(秒)",
-                value=10,
-                minimum=5,
-                maximum=60,
-                step=1,
-            )
+            with gr.Row():
+                test_timeout_ui = gr.Number(
+                    label="测试代理超时时间(秒)",
+                    value=10,
+                    minimum=5,
+                    maximum=60,
+                    step=1,
+                )
+                test_samples_ui = gr.Number(
+                    label="每个代理采样次数",
+                    info="复用同一连接多次请求，统计 min/p50/p95/抖动",
+                    value=5,
+                    minimum=1,
+                    maximum=50,
+                    step=1,
+                )
+                test_refresh_ui = gr.Checkbox(
+                    label="忽略缓存重新测试",
+                    info="默认复用 60 秒内的测试结果",
+                    value=False,
+                )
 
             test_result_ui = gr.Textbox(
                 label="测试结果",
@@ -150,21 +170,23 @@ def go_tab(demo: gr.Blocks):
                 placeholder="点击上方按钮开始测试代理连通性...",
             )
 
-            def test_proxy_connectivity(proxy_string, timeout):
-                """测试代理连通性"""
+            def test_proxy_connectivity(proxy_string, timeout, samples, refresh):
+                """多次采样测试代理延迟并排名"""
                 try:
-                    from util.ProxyTester import test_proxy_connectivity
+                    from util.ProxyTester import profile_proxy_connectivity
 
                     if not proxy_string or proxy_string.strip() == "":
                         proxy_string = "none"  # 测试直连
-                    result = test_proxy_connectivity(proxy_string, int(timeout))
+                    result = profile_proxy_connectivity(
+                        proxy_string, int(timeout), int(samples), bool(refresh)
+                    )
                     return result
                 except Exception as e:
                     return f"❌ 测试过程中发生错误: {str(e)}"
 
             test_proxy_btn.click(
                 fn=test_proxy_connectivity,
-                inputs=[https_proxy_ui, test_timeout_ui],
+                inputs=[https_proxy_ui, test_timeout_ui, test_samples_ui, test_refresh_ui],
                 outputs=test_result_ui,
             )
         with gr.Accordion(label="配置抢票成功后播放音乐[可选]", open=False):
@@ -387,6 +409,13 @@ def go_tab(demo: gr.Blocks):
                 interactive=True,
             )
 
+    def prewarm_workers(files, terminal_ui):
+        # 上传配置后就按文件数预热进程，点击开始时无需再等待导入
+        if files and terminal_ui == "网页":
+            get_worker_pool().ensure_async(len(files))
+
+    upload_ui.upload(fn=prewarm_workers, inputs=[upload_ui, terminal_ui])
+
     def try_assign_endpoint(endpoint_url, payload):
         try:
             response = requests.post(f"{endpoint_url}/buy", json=payload, timeout=5)
@@ -419,6 +448,13 @@ def go_tab(demo: gr.Blocks):
     ):
         if not files:
             return [gr.update(value=withTimeString("未提交抢票配置"), visible=True)]
+        sale_time = None
+        if time_start:
+            try:
+                sale_time = parse_time_start(time_start)
+            except ValueError:
+                gr.Warning(f"开票时间格式不正确: {time_start}")
+                return
         yield [
             gr.update(value=withTimeString("开始多开抢票,详细查看终端"), visible=True)
         ]
@@ -460,8 +496,8 @@ def go_tab(demo: gr.Blocks):
                     left_task_num = len(files) - idx
                     assigned_proxies = split_proxies(https_proxy_list, left_task_num)
 
-                buy_new_terminal(
-                    endpoint_url=demo.local_url,
+                buy_kwargs = dict(
+                    endpoint_url=get_heartbeat_server().url,
                     tickets_info=content,
                     time_start=time_start,
                     interval=interval,
@@ -476,7 +512,26 @@ def go_tab(demo: gr.Blocks):
                     https_proxys=",".join(assigned_proxies[assigned_proxies_next_idx]),
                     terminal_ui=terminal_ui,
                     show_random_message=not hide_random_message,
+                    worker_index=idx,
                 )
+                if terminal_ui == "网页":
+                    # 网页模式交给预热进程，终端模式需要新开控制台窗口
+                    def launch(kw=buy_kwargs):
+                        return get_worker_pool().submit(build_buy_args(**kw))
+                else:
+                    def launch(kw=buy_kwargs):
+                        return buy_new_terminal(**kw)
+
+                if terminal_ui == "网页" or sys.platform == "win32":
+                    get_supervisor().add(
+                        filename_only,
+                        launch,
+                        time_start=sale_time,
+                        heartbeats=terminal_ui == "网页",
+                    )
+                else:
+                    # macOS 终端模式拿到的是 osascript 进程，无法监控实际的抢票进程
+                    launch()
                 assigned_proxies_next_idx += 1
         gr.Info("正在启动，请等待抢票页面弹出。")
 
@@ -490,42 +545,136 @@ def go_tab(demo: gr.Blocks):
         outputs=_time_tmp,
         js='(x) => document.getElementById("datetime").value',
     )
-    _report_tmp = gr.Button(visible=False)
-    _report_tmp.api_info
-
-    # hander endpoint hearts
-
-    _end_point_tinput = gr.Textbox(visible=False)
-
-    def report(end_point, detail):
-        now = time.time()
-        GlobalStatusInstance.endpoint_details[end_point] = Endpoint(
-            endpoint=end_point, detail=detail, update_at=now
+    # 终端心跳走独立的轻量接口，不占用 Gradio 队列
+    get_heartbeat_server()
+
+    endpoints_ui = gr.HTML()
+    # session_hash -> 页面关闭时置位，结束对应的监听
+    watcher_stops: dict[str, threading.Event] = {}
+
+    def render_endpoints(endpoints):
+        if len(endpoints) == 0:
+            return ""
+
+        def cell(value, suffix=""):
+            return "-" if value is None else f"{html.escape(str(value))}{suffix}"
+
+        rows = []
+        for e in endpoints:
+            stats = e.stats or {}
+            errno = stats.get("e")
+            errno_text = (
+                "-" if errno is None else f"{errno} {ERRNO_DICT.get(errno, '')}"
+            )
+            latency = (
+                "-"
+                if stats.get("l50") is None
+                else f"{stats['l50']} / {stats.get('l95')}ms"
+            )
+            period = (
+                "-"
+                if stats.get("i50") is None
+                else f"{stats['i50']} / {stats.get('i95')}ms（目标 {stats.get('it')}ms）"
+            )
+            rows.append(
+                f"""<tr class="border-t">
+                <td class="p-2"><a href="{html.escape(e.endpoint)}" target="_blank"
+                    class="underline">🚀 {html.escape(e.endpoint)}</a></td>
+                <td class="p-2">{html.escape(e.detail)}</td>
+                <td class="p-2">{cell(stats.get("p"))}</td>
+                <td class="p-2">{cell(stats.get("a"))}</td>
+                <td class="p-2">{html.escape(errno_text)}</td>
+                <td class="p-2">{latency}</td>
+                <td class="p-2">{period}</td>
+                <td class="p-2">{cell(stats.get("o"), "ms")}</td>
+                <td class="p-2">{cell(stats.get("m"), "MB")}</td>
+                </tr>"""
+            )
+        return f"""<h2>当前运行终端列表</h2>
+            <table class="w-full text-left text-sm">
+            <thead><tr>
+                <th class="p-2">终端</th><th class="p-2">配置</th>
+                <th class="p-2">阶段</th><th class="p-2">尝试次数</th>
+                <th class="p-2">最近错误码</th><th class="p-2">延迟 p50/p95</th>
+                <th class="p-2">请求间隔 p50/p95</th>
+                <th class="p-2">时间偏差</th><th class="p-2">内存</th>
+            </tr></thead>
+            <tbody>{"".join(rows)}</tbody></table>"""
+
+    def render_workers(workers):
+        if len(workers) == 0:
+            return ""
+
+        def cell(value, suffix=""):
+            return "-" if value is None else f"{html.escape(str(value))}{suffix}"
+
+        rows = "".join(
+            f"""<tr class="border-t">
+            <td class="p-2">{html.escape(w["name"])}</td>
+            <td class="p-2">{w["pid"]}</td>
+            <td class="p-2">{w["status"]}</td>
+            <td class="p-2">{cell(w["exit_code"])}</td>
+            <td class="p-2">{w["restarts"]}</td>
+            <td class="p-2">{cell(w["cpu"], "%")}</td>
+            <td class="p-2">{cell(w["rss"], "MB")}</td>
+            </tr>"""
+            for w in workers
         )
-
-    _report_tmp.click(
-        fn=report,
-        inputs=[_end_point_tinput, _time_tmp],  # fake useage
-        api_name="report",
+        return f"""<h2>抢票进程</h2>
+            <table class="w-full text-left text-sm">
+            <thead><tr>
+                <th class="p-2">配置</th><th class="p-2">PID</th>
+                <th class="p-2">状态</th><th class="p-2">退出码</th>
+                <th class="p-2">重启次数</th><th class="p-2">CPU（约）</th>
+                <th class="p-2">内存（约）</th>
+            </tr></thead>
+            <tbody>{rows}</tbody></table>"""
+
+    async def watch_endpoints(request: gr.Request):
+        """只在终端加入、离开或状态变化时推送，空闲时不产生任何更新"""
+        stop = watcher_stops.setdefault(request.session_hash, threading.Event())
+        version = -1
+        workers = None
+        try:
+            while not stop.is_set():
+                new_version, endpoints = GlobalStatusInstance.snapshot()
+                new_workers = get_supervisor().snapshot()
+                if new_version != version or new_workers != workers:
+                    yield [
+                        render_endpoints(endpoints)
+                        if new_version != version
+                        else gr.update(),
+                        render_workers(new_workers)
+                        if new_workers != workers
+                        else gr.update(),
+                    ]
+                    version, workers = new_version, new_workers
+                await asyncio.sleep(0.5)
+        finally:
+            watcher_stops.pop(request.session_hash, None)
+
+    def stop_watch(request: gr.Request):
+        stop = watcher_stops.get(request.session_hash)
+        if stop:
+            stop.set()
+
+    workers_ui = gr.HTML()
+    stop_all_btn = gr.Button("停止所有抢票进程", variant="stop")
+
+    def stop_all_workers():
+        count = get_supervisor().stop_all()
+        gr.Info(f"已停止 {count} 个抢票进程")
+
+    stop_all_btn.click(fn=stop_all_workers)
+
+    demo.load(
+        fn=watch_endpoints,
+        outputs=[endpoints_ui, workers_ui],
+        show_progress="hidden",
+        concurrency_limit=None,
+        show_api=False,
     )
-
-    def tick():
-        return f"当前时间戳：{int(time.time())}"
-
-    timer = gr.Textbox(label="定时更新", interactive=False, visible=False)
-    demo.load(fn=tick, inputs=None, outputs=timer, every=1)
-
-    @gr.render(inputs=timer)
-    def show_split(text):
-        endpoints = GlobalStatusInstance.available_endpoints()
-        if len(endpoints) != 0:
-            gr.Markdown("## 当前运行终端列表")
-            for endpoint in endpoints:
-                with gr.Row():
-                    gr.Button(
-                        value=f"点击跳转 🚀 {endpoint.endpoint} {endpoint.detail}",
-                        link=endpoint.endpoint,
-                    )
+    demo.unload(stop_watch)
 
     go_btn.click(
         fn=start_go,
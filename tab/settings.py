@@ -1,45 +1,31 @@
+import asyncio
 import json
 import os
 import re
-from datetime import datetime
-import time
-from typing import Any, Dict, List
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse, parse_qs
 
 import gradio as gr
 from gradio_calendar import Calendar
 from loguru import logger
-import qrcode
-import requests
 
+from util.ApiCache import (
+    fetch_addresses,
+    fetch_buyers,
+    fetch_linkgoods_detail,
+    fetch_linkgoods_list,
+    fetch_project,
+    fetch_project_by_date,
+    invalidate_account,
+    prefetch_project_dates,
+)
 from util.BiliRequest import BiliRequest
+from util.Catalogue import Catalogue, build_buy_config
 from util import TEMP_PATH, GLOBAL_COOKIE_PATH, set_main_request, ConfigDB
 import util
-from util.CookieManager import parse_cookie_list
-
-buyer_value: List[Dict[str, Any]] = []
-addr_value: List[Dict[str, Any]] = []
-ticket_value: List[Dict[str, Any]] = []
-project_name: str = ""
-ticket_str_list: List[str] = []
-sales_dates = []
-project_id = 0
-
-sales_flag_number_map = {
-    1: "不可售",
-    2: "预售",
-    3: "停售",
-    4: "售罄",
-    5: "不可用",
-    6: "库存紧张",
-    8: "暂时售罄",
-    9: "不在白名单",
-    101: "未开始",
-    102: "已结束",
-    103: "未完成",
-    105: "下架",
-    106: "已取消",
-}
+from util import QRLogin
+from util.QRLogin import start_qr_login
 
 
 def filename_filter(filename):
@@ -47,28 +33,41 @@ def filename_filter(filename):
     return filename
 
 
-def on_submit_ticket_id(num):
-    global buyer_value
-    global addr_value
-    global ticket_value
-    global project_name
-    global ticket_str_list
-    global sales_dates
-    global project_id
+FETCH_WORKERS = 4  # 获取票务信息时的最大并发请求数
+
+
+def on_submit_ticket_id(num, refresh=False):
+    """
+    输出依次为选票、购票人、地址、详情区、票务信息、日期，
+    以及本会话的 Catalogue、购票人列表和地址列表
+    """
+    executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
     try:
-        buyer_value = []
-        addr_value = []
-        ticket_value = []
         extracted_id_message = ""
         if "http" in num or "https" in num:
             num = extract_id_from_url(num)
             extracted_id_message = f"已提取URL票ID：{num}"
         else:
             raise gr.Error("输入无效，请输入一个有效的网址。", duration=5)
-        res = util.main_request.get(
-            url=f"https://show.bilibili.com/api/ticket/project/getV2?version=134&id={num}&project_id={num}"
+
+        # 互不依赖的请求同时发出，结果到达后立即更新界面
+        project_future = executor.submit(
+            fetch_project, util.main_request, num, refresh
         )
-        ret = res.json()
+        # 值为请求类型和场贩商品 ID
+        pending: dict[Future, tuple[str, Optional[int]]] = {
+            executor.submit(
+                fetch_linkgoods_list, util.main_request, num, refresh
+            ): ("goods_list", None),
+            executor.submit(
+                fetch_buyers, util.main_request, num, refresh
+            ): ("buyer", None),
+            executor.submit(
+                fetch_addresses, util.main_request, refresh
+            ): ("addr", None),
+        }
+
+        ret = project_future.result()
         # logger.debug(ret)
 
         # 检查 errno
@@ -78,112 +77,93 @@ def on_submit_ticket_id(num):
             raise gr.Error(
                 ret.get("msg", ret.get("message", "未知错误")) + "。", duration=5
             )
-        data = ret["data"]
-        ticket_str_list = []
-
-        project_id = data["id"]
-        project_name = data["name"]
-        is_hot_project = data["hotProject"]
-
-        project_start_time = datetime.fromtimestamp(data["start_time"]).strftime(
-            "%Y-%m-%d %H:%M:%S"
-        )
-        project_end_time = datetime.fromtimestamp(data["end_time"]).strftime(
-            "%Y-%m-%d %H:%M:%S"
-        )
-
-        venue_info = data["venue_info"]
-        venue_name = venue_info["name"]
-        venue_address = venue_info["address_detail"]
-        sales_dates = [t["date"] for t in data["sales_dates"]]
-        sales_dates_show = len(data["sales_dates"]) != 0
-        for item in data["screen_list"]:
-            item["project_id"] = data["id"]
-
-        try:
-            good_list = util.main_request.get(
-                url=f"https://show.bilibili.com/api/ticket/linkgoods/list?project_id={project_id}&page_type=0"
+        catalogue = Catalogue(ret["data"])
+        if catalogue.sales_dates:
+            # 切换日期时直接读缓存
+            prefetch_project_dates(
+                util.main_request,
+                catalogue.project_id,
+                catalogue.sales_dates,
+                refresh,
             )
-            good_list = good_list.json()
-            ids = [item["id"] for item in good_list["data"]["list"]]
-            for id in ids:
-                good_detail = util.main_request.get(
-                    url=f"https://show.bilibili.com/api/ticket/linkgoods/detail?link_id={id}"
-                )
-                good_detail = good_detail.json()
-                for item in good_detail["data"]["specs_list"]:
-                    item["project_id"] = good_detail["data"]["item_id"]
-                    item["link_id"] = id
-                data["screen_list"] += good_detail["data"]["specs_list"]
-        except Exception as e:
-            logger.warning(f"获取场贩商品信息出错: {e}")
-
-        for screen in data["screen_list"]:
-            if "name" not in screen:
-                #  TODO 应该是跳转到会员购了
-                continue
-            screen_name = screen["name"]
-            screen_id = screen["id"]
-            project_id = screen["project_id"]
-            express_fee = 0
-            if data["has_eticket"]:
-                express_fee = 0  # 电子票免费
-            else:
-                if screen["express_fee"] >= 0:
-                    # -2 === t ? "快递到付" : -1 === t ? "快递包邮" : "快递配送"
-                    express_fee = screen["express_fee"]
-
-            for ticket in screen["ticket_list"]:
-                ticket_desc = ticket["desc"]
-                sale_start = ticket["sale_start"]
-                ticket["price"] = ticket_price = ticket["price"] + express_fee
-                ticket["screen"] = screen_name
-                ticket["screen_id"] = screen_id
-                ticket["is_hot_project"] = is_hot_project
-                if "link_id" in screen:
-                    ticket["link_id"] = screen["link_id"]
-                ticket_can_buy = sales_flag_number_map[ticket["sale_flag_number"]]
-                ticket_str = f"{screen_name} - {ticket_desc} - ￥{ticket_price / 100}- {ticket_can_buy} - 【起售时间：{sale_start}】"
-                ticket_str_list.append(ticket_str)
-                ticket_value.append(
-                    {"project_id": screen["project_id"], "ticket": ticket}
-                )
-
-        buyer_json = util.main_request.get(
-            url=f"https://show.bilibili.com/api/ticket/buyer/list?is_default&projectId={project_id}"
-        ).json()
-        logger.debug(buyer_json)
-        addr_json = util.main_request.get(
-            url="https://show.bilibili.com/api/ticket/addr/list"
-        ).json()
-        logger.debug(addr_json)
-        buyer_value = buyer_json["data"]["list"]
-        buyer_str_list = [
-            f"{item['name']}-{item['personal_id']}" for item in buyer_value
-        ]
-        addr_value = addr_json["data"]["addr_list"]
-        addr_str_list = [
-            f"{item['addr']}-{item['name']}-{item['phone']}" for item in addr_value
-        ]
 
         yield [
-            gr.update(choices=ticket_str_list),
-            gr.update(choices=buyer_str_list),
-            gr.update(choices=addr_str_list),
+            gr.update(choices=catalogue.choices(), value=None),
+            gr.update(),
+            gr.update(),
             gr.update(visible=True),
             gr.update(
-                value=f"{extracted_id_message}\n获取票信息成功:\n展会名称：{project_name}\n"
-                f"开展时间：{project_start_time} - {project_end_time}\n场馆地址：{venue_name} {venue_address}",
+                value=f"{extracted_id_message}\n获取票信息成功:\n{catalogue.summary}",
                 visible=True,
             ),
-            gr.update(visible=True, value=sales_dates[0])
-            if sales_dates_show
+            gr.update(visible=True, value=catalogue.sales_dates[0])
+            if catalogue.sales_dates
             else gr.update(visible=False),
+            catalogue,
+            gr.update(),
+            gr.update(),
         ]
+
+        while pending:
+            future = next(as_completed(pending))
+            kind, link_id = pending.pop(future)
+            update = [gr.update() for _ in range(9)]
+            try:
+                result = future.result()
+            except Exception as e:
+                if kind in ("goods_list", "goods_detail"):
+                    logger.warning(f"获取场贩商品信息出错: {e}")
+                    continue
+                raise
+            logger.debug(result)
+            if kind == "goods_list":
+                # 每个场贩商品的详情并发获取，到达后立即加入选票列表
+                for item in result["data"]["list"]:
+                    pending[
+                        executor.submit(
+                            fetch_linkgoods_detail,
+                            util.main_request,
+                            item["id"],
+                            refresh,
+                        )
+                    ] = ("goods_detail", item["id"])
+                continue
+            if kind == "goods_detail":
+                assert link_id is not None
+                try:
+                    catalogue.add_linkgoods(result["data"], link_id)
+                except Exception as e:
+                    logger.warning(f"获取场贩商品信息出错: {e}")
+                    continue
+                # 按界面当前选择的日期刷新，不会把选票列表重置为其他日期
+                update[0] = gr.update(
+                    choices=catalogue.choices(catalogue.selected_date)
+                )
+                update[6] = catalogue
+            elif kind == "buyer":
+                buyers = result["data"]["list"]
+                update[1] = gr.update(
+                    choices=[
+                        f"{item['name']}-{item['personal_id']}" for item in buyers
+                    ]
+                )
+                update[7] = buyers
+            elif kind == "addr":
+                addresses = result["data"]["addr_list"]
+                update[2] = gr.update(
+                    choices=[
+                        f"{item['addr']}-{item['name']}-{item['phone']}"
+                        for item in addresses
+                    ]
+                )
+                update[8] = addresses
+            yield update
     except gr.Error as e:
         gr.Warning(e.message)
     except Exception as e:
         logger.exception(e)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 def extract_id_from_url(url):
@@ -194,20 +174,23 @@ def extract_id_from_url(url):
 
 def on_submit_all(
     ticket_id,
-    ticket_info: int,
+    sku_id: Optional[int],
     people_indices,
     people_buyer_name,
     people_buyer_phone,
     address_index,
+    catalogue: Optional[Catalogue],
+    buyers: List[Dict[str, Any]],
+    addresses: List[Dict[str, Any]],
 ):
     try:
-        if ticket_id is None:
+        if ticket_id is None or catalogue is None:
             raise gr.Error("你所填不是网址，或者网址是错的", duration=5)
         if len(people_indices) == 0:
             raise gr.Error("至少选一个实名人", duration=5)
-        if addr_value is None:
+        if not addresses:
             raise gr.Error("没有填写地址", duration=5)
-        if ticket_info is None:
+        if sku_id is None or catalogue.by_sku(sku_id) is None:
             raise gr.Error("没有填写选票", duration=5)
         if not people_buyer_name:
             raise gr.Error("没有填写联系人姓名", duration=5)
@@ -215,45 +198,26 @@ def on_submit_all(
             raise gr.Error("没有填写联系人电话", duration=5)
         if address_index is None:
             raise gr.Error("没有填写地址", duration=5)
-        ticket_cur: dict[str, Any] = ticket_value[ticket_info]
-        people_cur = [buyer_value[item] for item in people_indices]
-        ticket_id = extract_id_from_url(ticket_id)
+        ticket_cur = catalogue.by_sku(sku_id)
+        assert ticket_cur is not None
+        people_cur = [buyers[item] for item in people_indices]
 
         ConfigDB.insert("people_buyer_name", people_buyer_name)
         ConfigDB.insert("people_buyer_phone", people_buyer_phone)
 
-        address_cur = addr_value[address_index]
+        address_cur = addresses[address_index]
         username = util.main_request.get_request_name()
-        detail = f"{username}-{project_name}-{ticket_str_list[ticket_info]}"
-        for p in people_cur:
-            detail += f"-{p['name']}"
-        config_dir = {
-            "username": username,
-            "detail": detail,
-            "count": len(people_indices),
-            "screen_id": ticket_cur["ticket"]["screen_id"],
-            "project_id": ticket_cur["project_id"],
-            "is_hot_project": ticket_cur["ticket"]["is_hot_project"],
-            "sku_id": ticket_cur["ticket"]["id"],
-            "order_type": 1,
-            "pay_money": ticket_cur["ticket"]["price"] * len(people_indices),
-            "buyer_info": people_cur,
-            "buyer": people_buyer_name,
-            "tel": people_buyer_phone,
-            "deliver_info": {
-                "name": address_cur["name"],
-                "tel": address_cur["phone"],
-                "addr_id": address_cur["id"],
-                "addr": address_cur["prov"]
-                + address_cur["city"]
-                + address_cur["area"]
-                + address_cur["addr"],
-            },
-            "cookies": util.main_request.cookieManager.get_cookies(),
-            "phone": util.main_request.cookieManager.get_config_value("phone", ""),
-        }
-        if "link_id" in ticket_cur["ticket"]:
-            config_dir["link_id"] = ticket_cur["ticket"]["link_id"]
+        config_dir = build_buy_config(
+            util.main_request,
+            username,
+            catalogue,
+            ticket_cur,
+            people_cur,
+            people_buyer_name,
+            people_buyer_phone,
+            address_cur,
+        )
+        detail = config_dir["detail"]
         filename = os.path.join(TEMP_PATH, filename_filter(detail) + ".json")
         with open(filename, "w", encoding="utf-8") as f:
             json.dump(config_dir, f, ensure_ascii=False, indent=4)
@@ -323,78 +287,17 @@ def setting_tab():
                 gr_file_ui = gr.File(
                     label="当前登录信息文件", value=lambda: GLOBAL_COOKIE_PATH, scale=1
                 )
+            account_refresh_btn = gr.Button("刷新账号信息", size="sm")
 
-            def generate_qrcode():
-                global session_cookies
-                headers = {
-                    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0",
-                }
-                max_retry = 10
-                for _ in range(max_retry):
-                    res = requests.request(
-                        "GET",
-                        "https://passport.bilibili.com/x/passport-login/web/qrcode/generate",
-                        headers=headers,
-                    )
-                    res_json = res.json()
-                    if res_json["code"] == 0:
-                        break
-                    time.sleep(1)
-                else:
-                    return None, "二维码生成失败"
-
-                url = res_json["data"]["url"]
-                qrcode_key = res_json["data"]["qrcode_key"]
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.constants.ERROR_CORRECT_H,  # type: ignore
-                    box_size=10,
-                    border=4,
-                )
-                qr.add_data(url)
-                qr.make(fit=True)
-                path = os.path.join(TEMP_PATH, "login_qrcode.png")
+            def on_account_refresh():
+                # 在网页端修改了购票人或地址后，清掉缓存重新获取
+                invalidate_account(util.main_request)
+                return gr.update(value=util.main_request.get_request_name(refresh=True))
 
-                qr.make_image(fill_color="black", back_color="white").get_image().save(
-                    path
-                )
-                return path, qrcode_key
-
-            def poll_login(qrcode_key):
-                headers = {"User-Agent": "Mozilla/5.0"}
-                for _ in range(120):  # 轮询60秒，每0.5秒一次
-                    res = requests.request(
-                        "GET",
-                        "https://passport.bilibili.com/x/passport-login/web/qrcode/poll",
-                        params={"qrcode_key": qrcode_key},
-                        headers=headers,
-                        timeout=5,
-                    )
-                    poll_res = res.json()
-                    if poll_res.get("code") == 0:
-                        code = poll_res["data"]["code"]
-                        if code == 0:
-                            # 登录成功 requests.utils.dict_from_cookiejar(
-                            cookies = parse_cookie_list(res.headers["set-cookie"])
-                            return "登录成功！", cookies
-                        elif code in (86101, 86090):
-                            # 等待扫码或确认
-                            time.sleep(0.5)
-                            continue
-                        else:
-                            return f"扫码失败：{poll_res['data']['message']}", None
-                    else:
-                        time.sleep(0.5)
-                return "登录超时，请重试。", None
-
-            def start_login():
-                img_path, qrcode_key = generate_qrcode()
-                if not img_path:
-                    return None, "二维码生成失败"
-                return img_path, qrcode_key
-
-            qr_img = gr.Image(label="登录验证码", visible=False)
-            check_btn = gr.Button("扫码后点击此按钮", visible=False)
+            account_refresh_btn.click(on_account_refresh, outputs=username_ui)
+
+            qr_img = gr.Image(label="登录验证码", visible=False, type="pil")
+            qr_status_ui = gr.Markdown(visible=False)
 
             with gr.Row():
                 login_btn = gr.Button(
@@ -402,84 +305,66 @@ def setting_tab():
                     elem_classes="!bg-blue-500 dark:!bg-blue-600 !rounded-md !hover:bg-blue-600 dark:hover:!bg-blue-400 !transition",
                 )
 
-                qrcode_key_state = gr.State("")
-
-                def on_login_click():
+                async def on_login_click():
+                    """
+                    扫码登录在后台线程中轮询，这里只观察状态变化并推送到界面，
+                    等待扫码期间不占用请求线程
+                    """
+                    invalidate_account(util.main_request)
                     util.main_request.cookieManager.db.delete("cookie")
                     gr.Info("已经注销，请重新登录", duration=5)
-                    img_path, msg_or_key = start_login()
-                    if img_path:
-                        gr.Info("已经生成二维码", duration=5)
-                        return [
-                            gr.update(value=img_path, visible=True),
-                            gr.update(value="未登录"),
+                    session = start_qr_login()
+                    version = -1
+                    shown_url = None
+                    try:
+                        while True:
+                            if session.version != version:
+                                version = session.version
+                                status = f"**{session.status}** {session.message}"
+                                if session.status == QRLogin.SUCCESS:
+                                    break
+                                image = gr.update(
+                                    visible=session.url is not None
+                                    and not session.finished
+                                )
+                                if session.url != shown_url:
+                                    shown_url = session.url
+                                    image = gr.update(
+                                        value=session.image(), visible=True
+                                    )
+                                yield [
+                                    image,
+                                    gr.update(value=status, visible=True),
+                                    gr.update(value="未登录"),
+                                    gr.update(value=GLOBAL_COOKIE_PATH),
+                                ]
+                                if session.finished:
+                                    gr.Warning(f"登录出现错误 {session.message}")
+                                    return
+                            await asyncio.sleep(0.2)
+
+                        # 扫码登录使用 GLOBAL_COOKIE_PATH
+                        request = BiliRequest(cookies_config_path=GLOBAL_COOKIE_PATH)
+                        request.cookieManager.db.insert("cookie", session.cookies)
+                        set_main_request(request)
+                        name = request.get_request_name()
+                        gr.Info("登录成功", duration=5)
+                        yield [
+                            gr.update(value=None, visible=False),
+                            gr.update(value=f"**{session.status}**", visible=True),
+                            gr.update(value=name),
                             gr.update(value=GLOBAL_COOKIE_PATH),
-                            msg_or_key,
                         ]
-
-                    else:
-                        gr.Warning("生成二维码异常", duration=5)
-                        return [
-                            gr.update(value="", visible=False),
-                            gr.update(value="未登录"),
-                            gr.update(value=GLOBAL_COOKIE_PATH),
-                            "",
-                        ]
-
-                def on_check_login(key):
-                    if not key:
-                        return [
-                            gr.update(),
-                            gr.update(),
-                            gr.update(),
-                            gr.update(),
-                        ]
-                    msg, cookies = poll_login(key)
-                    if cookies:
-                        try:
-                            # 扫码登录使用 GLOBAL_COOKIE_PATH
-                            set_main_request(
-                                BiliRequest(cookies_config_path=GLOBAL_COOKIE_PATH)
-                            )
-                            util.main_request.cookieManager.db.insert("cookie", cookies)
-                            name = util.main_request.get_request_name()
-                            if name:
-                                gr.Info("登录成功", duration=5)
-                            return [
-                                gr.update(value=name),
-                                gr.update(value=GLOBAL_COOKIE_PATH),
-                                gr.update(visible=False),
-                                gr.update(visible=False),
-                            ]
-                        except Exception:
-                            pass
-
-                    name = util.main_request.get_request_name()
-                    gr.Warning(f"登录出现错误 {msg}", duration=5)
-                    return [
-                        gr.update(value=name),
-                        gr.update(value=GLOBAL_COOKIE_PATH),
-                        gr.update(),
-                        gr.update(),
-                    ]
+                    finally:
+                        session.cancel()
 
                 login_btn.click(
                     on_login_click,
-                    outputs=[qr_img, username_ui, gr_file_ui, qrcode_key_state],
+                    outputs=[qr_img, qr_status_ui, username_ui, gr_file_ui],
+                    concurrency_limit=None,
+                    show_progress="hidden",
                 )
 
-                @gr.on(
-                    qrcode_key_state.change, inputs=qrcode_key_state, outputs=check_btn
-                )
-                def qrcode_key_state_change(key):
-                    if key:
-                        return gr.update(visible=True)
-
-                check_btn.click(
-                    on_check_login,
-                    inputs=[qrcode_key_state],
-                    outputs=[username_ui, gr_file_ui, qr_img, check_btn],
-                )
                 upload_ui = gr.UploadButton(
                     label="导入",
                     elem_classes="!bg-white dark:!bg-gray-700 !rounded-md !shadow-sm  dark:!text-white",
@@ -511,14 +396,26 @@ def setting_tab():
                 interactive=True,
                 info="形如 https://show.bilibili.com/platform/detail.html?id=84096",
             )
-            ticket_id_btn = gr.Button("获取票信息")
+            with gr.Row():
+                ticket_id_btn = gr.Button("获取票信息", scale=4)
+                ticket_refresh_ui = gr.Checkbox(
+                    label="忽略缓存重新获取",
+                    value=False,
+                    scale=1,
+                    min_width=120,
+                )
+
+            # 每个浏览器会话各自持有票务目录和账号信息
+            catalogue_state = gr.State(None)
+            buyers_state = gr.State([])
+            addresses_state = gr.State([])
 
             with gr.Column(visible=False, elem_id="ticket-detail") as inner:
                 with gr.Row():
                     ticket_info_ui = gr.Dropdown(
                         label="选票",
                         interactive=True,
-                        type="index",
+                        type="value",
                         info="必填，请仔细核对起售时间，千万别选错其他时间点的票",
                     )
                     data_ui = Calendar(
@@ -571,13 +468,16 @@ def setting_tab():
                         people_buyer_name,
                         people_buyer_phone,
                         address_ui,
+                        catalogue_state,
+                        buyers_state,
+                        addresses_state,
                     ],
                     outputs=[config_output_ui, config_file_ui],
                 )
 
             ticket_id_btn.click(
                 fn=on_submit_ticket_id,
-                inputs=ticket_id_ui,
+                inputs=[ticket_id_ui, ticket_refresh_ui],
                 outputs=[
                     ticket_info_ui,
                     people_ui,
@@ -585,49 +485,38 @@ def setting_tab():
                     inner,
                     info_ui,
                     data_ui,
+                    catalogue_state,
+                    buyers_state,
+                    addresses_state,
                 ],
             )
 
-            def on_submit_data(_date):
-                global ticket_str_list
-                global ticket_value
-
+            def on_submit_data(_date, catalogue: Optional[Catalogue]):
                 try:
-                    ticket_that_day = util.main_request.get(
-                        url=f"https://show.bilibili.com/api/ticket/project/infoByDate?id={project_id}&date={_date}"
-                    ).json()["data"]
-                    ticket_str_list = []
-                    ticket_value = []
-                    for screen in ticket_that_day["screen_list"]:
-                        screen_name = screen["name"]
-                        screen_id = screen["id"]
-                        express_fee = screen["express_fee"]
-                        for ticket in screen["ticket_list"]:
-                            ticket_desc = ticket["desc"]
-                            sale_start = ticket["sale_start"]
-                            ticket_price = ticket["price"] + express_fee
-                            ticket["price"] = ticket_price
-                            ticket["screen"] = screen_name
-                            ticket["screen_id"] = screen_id
-                            ticket_can_buy = (
-                                "可购买" if ticket["clickable"] else "不可购买"
-                            )
-                            ticket_str = f"{screen_name} - {ticket_desc} - ￥{ticket_price / 100}- {ticket_can_buy} - 【起售时间：{sale_start}】"
-                            ticket_str_list.append(ticket_str)
-                            ticket_value.append(
-                                {"project_id": project_id, "ticket": ticket}
-                            )
+                    if catalogue is None:
+                        return [gr.update(), gr.update(), gr.update(), catalogue]
+                    ticket_that_day = fetch_project_by_date(
+                        util.main_request, catalogue.project_id, _date
+                    )["data"]
+                    catalogue.add_date(_date, ticket_that_day)
+                    catalogue.selected_date = _date
 
                     return [
                         gr.update(value=_date, visible=True),
-                        gr.update(choices=ticket_str_list),
+                        gr.update(choices=catalogue.choices(_date), value=None),
                         gr.update(value=f"当前票日期更新为: {_date}"),
+                        catalogue,
                     ]
                 except Exception as e:
-                    return [gr.update(), gr.update(), gr.update(value=e, visible=True)]
+                    return [
+                        gr.update(),
+                        gr.update(),
+                        gr.update(value=e, visible=True),
+                        catalogue,
+                    ]
 
             data_ui.change(
                 fn=on_submit_data,
-                inputs=data_ui,
-                outputs=[data_ui, ticket_info_ui, info_ui],
+                inputs=[data_ui, catalogue_state],
+                outputs=[data_ui, ticket_info_ui, info_ui, catalogue_state],
             )
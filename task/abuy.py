@@ -0,0 +1,192 @@
+"""
+基于 asyncio 的抢票引擎（`btb buy --engine async`）。
+
+下单流程与同步引擎共用 task.buy.order_flow，这里只负责在事件循环中执行它产出的
+请求、等待和阻塞操作：请求进行中也能立即响应取消，心跳不会被阻塞。安装了 uvloop 时自动使用。
+"""
+import asyncio
+from collections.abc import AsyncIterator, Coroutine
+from typing import Any, TypeVar
+
+import httpx
+from loguru import logger
+
+from task import effects, events
+from task.buy import order_flow
+from task.policy import OutcomePolicy
+from util import GlobalStatusInstance
+from util.BiliRequest import AsyncBiliRequest
+from util.CancelToken import CancelToken
+from util.Notifier import NotifierConfig
+from util.Telemetry import TaskTelemetry
+
+T = TypeVar("T")
+
+
+def run_event_loop(main: Coroutine[None, None, T]) -> T:
+    """运行事件循环，优先使用 uvloop"""
+    try:
+        import uvloop  # type: ignore[import-not-found]  # 可选依赖，Windows 上不可用
+    except ImportError:
+        return asyncio.run(main)
+    logger.info("使用 uvloop 事件循环")
+    return uvloop.run(main)
+
+
+class _AsyncRunner:
+    """在事件循环中执行 order_flow 产出的 effect"""
+
+    def __init__(self, telemetry: TaskTelemetry, cancel_token: CancelToken):
+        self.telemetry = telemetry
+        self.cancel_token = cancel_token
+        self.request: AsyncBiliRequest | None = None
+
+    async def perform(self, effect: effects.Effect) -> Any:
+        if isinstance(effect, effects.Request):
+            assert self.request is not None
+            try:
+                return await self.request.request(
+                    effect.method, effect.url, effect.data, effect.isJson, effect.timeout
+                )
+            except httpx.TimeoutException as e:
+                # httpx 的超时异常通常没有说明文字
+                raise effects.RequestTimedOut(str(e) or type(e).__name__) from e
+            except httpx.HTTPError as e:
+                raise effects.RequestFailed(str(e) or type(e).__name__) from e
+        if isinstance(effect, effects.Wait):
+            return await self.cancel_token.wait_async(effect.seconds)
+        if isinstance(effect, effects.Open):
+            self.request = AsyncBiliRequest(
+                cookies=effect.cookies,
+                proxy=effect.proxy,
+                telemetry=self.telemetry,
+                cancel_token=self.cancel_token,
+            )
+            return None
+        if isinstance(effect, effects.Call):
+            return await asyncio.to_thread(effect.fn, *effect.args)
+        if isinstance(effect, effects.Spawn):
+            return asyncio.ensure_future(asyncio.to_thread(effect.fn, *effect.args))
+        if isinstance(effect, effects.Join):
+            await effect.handle
+            return None
+        raise TypeError(f"未知的 effect: {effect!r}")
+
+    async def aclose(self) -> None:
+        if self.request is not None:
+            await self.request.aclose()
+
+
+async def abuy_stream(
+    tickets_info,
+    time_start,
+    interval,
+    notifier_config,
+    https_proxys,
+    show_random_message=True,
+    telemetry: TaskTelemetry | None = None,
+    policy: OutcomePolicy | None = None,
+    cancel_token: CancelToken | None = None,
+    low_jitter: bool = False,
+) -> AsyncIterator[events.BuyEvent]:
+    """异步引擎：在事件循环中执行 order_flow，产出 events.BuyEvent"""
+    if telemetry is None:
+        telemetry = TaskTelemetry()
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    if policy is None:
+        policy = OutcomePolicy()
+    runner = _AsyncRunner(telemetry, cancel_token)
+    flow = order_flow(
+        tickets_info,
+        time_start,
+        interval,
+        notifier_config,
+        https_proxys,
+        show_random_message,
+        telemetry,
+        policy,
+        cancel_token,
+        low_jitter,
+    )
+    reply: Any = None
+    error: Exception | None = None
+    try:
+        while True:
+            try:
+                item = flow.send(reply) if error is None else flow.throw(error)
+            except StopIteration:
+                return
+            reply, error = None, None
+            if isinstance(item, events.BuyEvent):
+                yield item
+                continue
+            try:
+                reply = await runner.perform(item)
+            except Exception as e:
+                error = e
+    finally:
+        flow.close()
+        await runner.aclose()
+
+
+async def abuy(
+    tickets_info,
+    time_start,
+    interval,
+    audio_path,
+    pushplusToken,
+    serverchanKey,
+    barkToken,
+    https_proxys,
+    serverchan3ApiUrl=None,
+    ntfy_url=None,
+    ntfy_username=None,
+    ntfy_password=None,
+    show_random_message=True,
+    telemetry: TaskTelemetry | None = None,
+    task_name: str | None = None,
+    policy: OutcomePolicy | None = None,
+    cancel_token: CancelToken | None = None,
+    extra_sinks: list[events.EventSink] | None = None,
+    low_jitter: bool = False,
+    sinks: events.SinkGroup | None = None,
+):
+    """buy 的协程版本"""
+    notifier_config = NotifierConfig(
+        serverchan_key=serverchanKey,
+        serverchan3_api_url=serverchan3ApiUrl,
+        pushplus_token=pushplusToken,
+        bark_token=barkToken,
+        ntfy_url=ntfy_url,
+        ntfy_username=ntfy_username,
+        ntfy_password=ntfy_password,
+        audio_path=audio_path,
+    )
+    telemetry = telemetry or GlobalStatusInstance.telemetry
+    # sinks 由调用方传入时，调用方可以在任务卡住时提前关闭
+    if sinks is None:
+        sinks = events.SinkGroup()
+    sinks.sinks.extend(
+        [
+            events.LogSink(task_name),
+            events.TelemetrySink(telemetry),
+            events.MetricsSink(task_name, telemetry),
+            *(extra_sinks or []),
+        ]
+    )
+    await events.dispatch_async(
+        abuy_stream(
+            tickets_info,
+            time_start,
+            interval,
+            notifier_config,
+            https_proxys,
+            show_random_message,
+            telemetry=telemetry,
+            policy=policy,
+            cancel_token=cancel_token,
+            low_jitter=low_jitter,
+        ),
+        sinks,
+    )
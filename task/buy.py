@@ -6,57 +6,90 @@ import stat
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 from random import randint
 from datetime import datetime
 from json import JSONDecodeError
-import qrcode
+from collections.abc import Generator, Iterator
+from typing import Any
 from loguru import logger
 
-from requests import HTTPError, RequestException
+from requests import RequestException, Timeout
 
-from util import ERRNO_DICT, time_service
+from util import ERRNO_DICT, LOG_DIR, GlobalStatusInstance, time_service
 from util.Notifier import NotifierManager, NotifierConfig
-from util.BiliRequest import BiliRequest
+from util.BiliRequest import DEFAULT_TIMEOUT, BiliRequest, RequestTimeout
+from util.CancelToken import CancelToken, Cancelled
+from util.CriticalWindow import LEAD_SECONDS, get_critical_window
+from util.Telemetry import TaskTelemetry
 from util.RandomMessages import get_random_fail_message
 from util.CTokenUtil import CTokenGenerator
+from util.QRCodeUtil import qr_png
+from task import effects, events
+from task.pacing import DeadlineScheduler, PacingController, TimeoutController
+from task.policy import Action, OutcomePolicy
+from task.preflight import (
+    MIN_PREFLIGHT_SECONDS,
+    PreflightError,
+    preflight_events,
+    preflight_spec,
+    start_preflight,
+    validate_config,
+)
 
 
 base_url = "https://show.bilibili.com"
 
 
-def get_qrcode_url(_request, order_id) -> str:
-    url = f"{base_url}/api/ticket/order/getPayParam?order_id={order_id}"
-    data = _request.get(url).json()
+def pay_param_url(order_id) -> str:
+    return f"{base_url}/api/ticket/order/getPayParam?order_id={order_id}"
+
+
+def parse_qrcode_url(data: dict) -> str:
     if data.get("errno", data.get("code")) == 0:
         return data["data"]["code_url"]
     raise ValueError("获取二维码失败")
 
 
-def buy_stream(
-    tickets_info,
-    time_start,
-    interval,
-    notifier_config,
-    https_proxys,
-    show_random_message=True,
-):
-    isRunning = True
-    tickets_info = json.loads(tickets_info)
+def get_qrcode_url(
+    _request, order_id, timeout: RequestTimeout = DEFAULT_TIMEOUT
+) -> str:
+    return parse_qrcode_url(_request.get(pay_param_url(order_id), timeout=timeout).json())
+
+
+def parse_time_start(time_start: str) -> float:
+    """开票时间字符串转为时间戳，支持精确到秒或分钟"""
+    try:
+        return datetime.strptime(time_start, "%Y-%m-%dT%H:%M:%S").timestamp()
+    except ValueError:
+        return datetime.strptime(time_start, "%Y-%m-%dT%H:%M").timestamp()
+
+
+def save_pay_qr(order_id, code_url: str) -> events.PayQR:
+    """渲染付款二维码并保存到日志目录，保存失败不影响展示"""
+    png = qr_png(code_url)
+    path: str | None = None
+    try:
+        path = os.path.join(LOG_DIR, f"pay_{order_id}.png")
+        with open(path, "wb") as f:
+            f.write(png)
+    except OSError as e:
+        logger.warning(f"保存付款二维码失败: {e}")
+        path = None
+    return events.PayQR(order_id=str(order_id), url=code_url, png=png, path=path)
+
+
+def load_order(tickets_info: dict) -> tuple[dict, str, list, bool, dict]:
+    """
+    tickets_info 为 validate_config 的结果，会被原地修改。
+    返回 (下单参数, 项目详情, cookies, 是否热门项目, 订单准备参数)
+    """
     detail = tickets_info["detail"]
-    cookies = tickets_info["cookies"]
-    phone = tickets_info.get("phone", None)
-    tickets_info.pop("cookies", None)
+    cookies = tickets_info.pop("cookies")
     tickets_info["buyer_info"] = json.dumps(tickets_info["buyer_info"])
     tickets_info["deliver_info"] = json.dumps(tickets_info["deliver_info"])
-    logger.info(f"使用代理：{https_proxys}")
-    _request = BiliRequest(cookies=cookies, proxy=https_proxys)
-
-    if "is_hot_project" in tickets_info:
-        is_hot_project = tickets_info["is_hot_project"]
-    else:
-        is_hot_project = False
-
+    is_hot_project = tickets_info.get("is_hot_project", False)
     token_payload = {
         "count": tickets_info["count"],
         "screen_id": tickets_info["screen_id"],
@@ -66,143 +99,422 @@ def buy_stream(
         "token": "",
         "newRisk": True,
     }
+    return tickets_info, detail, cookies, is_hot_project, token_payload
 
-    if time_start != "":
-        timeoffset = time_service.get_timeoffset()
-        yield "0) 等待开始时间"
-        yield f"时间偏差已被设置为: {timeoffset}s"
-        try:
-            time_difference = (
-                datetime.strptime(time_start, "%Y-%m-%dT%H:%M:%S").timestamp()
-                - time.time()
-                + timeoffset
-            )
-        except ValueError:
-            time_difference = (
-                datetime.strptime(time_start, "%Y-%m-%dT%H:%M").timestamp()
-                - time.time()
-                + timeoffset
-            )
-        start_time = time.perf_counter()
-        end_time = start_time + time_difference
-        while True:
-            now = time.perf_counter()
-            if now >= end_time:
-                break
-            remaining = end_time - now
-            time.sleep(min(0.5, remaining))
-
-    while isRunning:
-        try:
-            yield "1）订单准备"
-            if is_hot_project:
-                ctoken_generator = CTokenGenerator(time.time(), 0, randint(2000, 10000))
-                token_payload["token"] = ctoken_generator.generate_ctoken(
-                    is_create_v2=False
+
+def start_notifiers(
+    notifier_config: NotifierConfig, detail: str, cancel_token: CancelToken
+) -> NotifierManager:
+    # 使用统一的工厂方法创建NotifierManager
+    # 不传递interval_seconds和duration_minutes，让每个推送渠道使用自己的默认值
+    notifierManager = NotifierManager.create_from_config(
+        config=notifier_config,
+        title="抢票成功",
+        content=f"bilibili会员购，请尽快前往订单中心付款: {detail}",
+    )
+
+    # 提交到进程内共用的推送线程池，同一进程的多个任务不再各自创建推送线程
+    notifierManager.dispatch_all()
+    cancel_token.on_cancel(lambda: notifierManager.stop_all(wait=False))
+    return notifierManager
+
+
+def order_flow(
+    tickets_info,
+    time_start,
+    interval,
+    notifier_config: NotifierConfig,
+    https_proxys,
+    show_random_message: bool,
+    telemetry: TaskTelemetry,
+    policy: OutcomePolicy,
+    cancel_token: CancelToken,
+    low_jitter: bool,
+) -> Generator[events.BuyEvent | effects.Effect, Any, None]:
+    """
+    下单状态机，同步和异步引擎共用。
+    产出 events.BuyEvent 交给 sink，产出 effects 中的对象由引擎执行后把结果送回
+    """
+    try:
+        config = validate_config(tickets_info)
+    except PreflightError as e:
+        yield events.phase("已停止", "配置检查失败: {}", e)
+        return
+    spec = preflight_spec(config)
+    tickets_info, detail, cookies, is_hot_project, token_payload = load_order(config)
+    yield events.message("使用代理：{}", https_proxys)
+    yield effects.Open(cookies, https_proxys)
+    pacing = PacingController(interval / 1000)
+    scheduler = DeadlineScheduler(telemetry)
+    timeouts = TimeoutController(policy.timeouts, policy.adaptive_timeout, telemetry)
+    delay = pacing.base
+    lease = None
+
+    try:
+        if time_start != "":
+            timeoffset = time_service.get_timeoffset()
+            telemetry.time_offset = timeoffset
+            yield events.phase("等待开票", "0) 等待开始时间")
+            yield events.message("时间偏差已被设置为: {}s", timeoffset)
+            time_difference = parse_time_start(time_start) - time.time() + timeoffset
+            start_time = time.perf_counter()
+            end_time = start_time + time_difference
+            # 登录状态、票种等联网检查在等待期间进行，开票时未完成则放弃
+            preflight = start_preflight(spec, https_proxys, cancel_token, time_difference)
+            if preflight is None:
+                yield events.message("[预检] 距离开票不足 {}s，跳过联网检查", MIN_PREFLIGHT_SECONDS)
+            while True:
+                if preflight is not None and preflight.done():
+                    yield from preflight_events(preflight)
+                    preflight = None
+                now = time.perf_counter()
+                if now >= end_time:
+                    break
+                remaining = end_time - now
+                if low_jitter and lease is None and remaining <= LEAD_SECONDS:
+                    lease = get_critical_window().enter()
+                    yield events.message("[低抖动] 进入关键窗口: {}", lease.summary)
+                if (yield effects.Wait(min(0.5, remaining))):
+                    break
+            if not cancel_token.cancelled:
+                # 开票时刻的唤醒误差
+                telemetry.record_wake_error(time.perf_counter() - end_time)
+            if preflight is not None and not cancel_token.cancelled:
+                yield events.message("[预检] 开票前未完成，已放弃", level="WARNING")
+        if low_jitter and lease is None:
+            lease = get_critical_window().enter()
+            yield events.message("[低抖动] 进入关键窗口: {}", lease.summary)
+
+        prepare_scheduler = DeadlineScheduler()
+        prepare_delay = 0.0
+        prepare_attempt = 0
+        prepare_started = time.monotonic()
+        while not cancel_token.cancelled:
+            try:
+                if policy.prepare_budget.exhausted(prepare_attempt, prepare_started):
+                    yield events.phase("已停止", "订单准备超出次数或时间预算，停止抢票")
+                    break
+                prepare_attempt += 1
+                yield events.phase("订单准备", "1）订单准备")
+                if (yield effects.Wait(prepare_scheduler.plan(prepare_delay))):
+                    continue
+                if is_hot_project:
+                    ctoken_generator = CTokenGenerator(time.time(), 0, randint(2000, 10000))
+                    token_payload["token"] = ctoken_generator.generate_ctoken(
+                        is_create_v2=False
+                    )
+                timeout, timeout_note = timeouts.decide("prepare")
+                if timeout_note:
+                    yield events.message(timeout_note)
+                prepare_scheduler.start()
+                request_start = time.perf_counter()
+                request_result_normal = yield effects.Request(
+                    "POST",
+                    f"{base_url}/api/ticket/order/prepare?project_id={tickets_info['project_id']}",
+                    data=token_payload,
+                    isJson=True,
+                    timeout=timeout,
                 )
-            request_result_normal = _request.post(
-                url=f"{base_url}/api/ticket/order/prepare?project_id={tickets_info['project_id']}",
-                data=token_payload,
-                isJson=True,
-            )
-            request_result = request_result_normal.json()
-            yield f"请求头: {request_result_normal.headers} // 请求体: {request_result}"
-            tickets_info["again"] = 1
-            tickets_info["token"] = request_result["data"]["token"]
-            yield "2）创建订单"
-            tickets_info["timestamp"] = int(time.time()) * 1000
-            payload = tickets_info
-            if "detail" in payload:
-                del payload["detail"]
-
-            result = None
-            for attempt in range(1, 61):
-                if not isRunning:
-                    yield "抢票结束"
+                latency = time.perf_counter() - request_start
+                request_result = request_result_normal.json()
+                yield events.message(
+                    "请求头: {} // 请求体: {}",
+                    request_result_normal.headers,
+                    request_result,
+                    latency=latency,
+                )
+                prepare_errno = int(request_result.get("errno", request_result.get("code", -1)))
+                token = (request_result.get("data") or {}).get("token")
+                action = policy.prepare_action(prepare_errno, token)
+                if action == Action.STOP:
+                    yield events.phase(
+                        "已停止",
+                        "[{}]({}) 停止抢票",
+                        prepare_errno,
+                        ERRNO_DICT.get(prepare_errno, "未知错误码"),
+                    )
                     break
-                try:
-                    url = f"{base_url}/api/ticket/order/createV2?project_id={tickets_info['project_id']}"
-                    if is_hot_project:
-                        payload["ctoken"] = ctoken_generator.generate_ctoken(  # type: ignore
-                            is_create_v2=True
-                        )
-                        ptoken = request_result["data"]["ptoken"] or ""
-                        payload["ptoken"] = ptoken
-                        payload["orderCreateUrl"] = (
-                            "https://show.bilibili.com/api/ticket/order/createV2"
-                        )
-                        url += "&ptoken=" + ptoken
-                    ret = _request.post(
-                        url=url,
-                        data=payload,
-                        isJson=True,
-                    ).json()
-                    err = int(ret.get("errno", ret.get("code")))
-                    if err == 100034:
-                        yield f"更新票价为：{ret['data']['pay_money'] / 100}"
-                        tickets_info["pay_money"] = ret["data"]["pay_money"]
-                        payload = tickets_info
-                    if err in [0, 100048, 100079]:
-                        yield "请求成功，停止重试"
-                        result = (ret, err)
+                if action != Action.SUCCESS:
+                    yield events.attempt(
+                        prepare_attempt,
+                        "[准备 {}] [{}]({}) 未获取到token，{}",
+                        policy.prepare_budget.describe(prepare_attempt),
+                        prepare_errno,
+                        ERRNO_DICT.get(prepare_errno, "未知错误码"),
+                        action.value,
+                        errno=prepare_errno,
+                    )
+                    prepare_delay, note = pacing.decide(action, prepare_errno)
+                    if note:
+                        yield events.message(note)
+                    continue
+                prepare_attempt = 0
+                prepare_delay = 0.0
+                prepare_started = time.monotonic()
+                tickets_info["again"] = 1
+                tickets_info["token"] = token
+                yield events.phase("创建订单", "2）创建订单")
+                tickets_info["timestamp"] = int(time.time()) * 1000
+                payload = tickets_info
+                if "detail" in payload:
+                    del payload["detail"]
+
+                result = None
+                attempt = 0
+                create_started = time.monotonic()
+                while not cancel_token.cancelled:
+                    if policy.create_budget.exhausted(attempt, create_started):
+                        if show_random_message:
+                            yield events.message("群友说👴： {}", get_random_fail_message())
+                        yield events.message("重试次数过多，重新准备订单")
                         break
-                    if err == 100051:
+                    attempt += 1
+                    progress = policy.create_budget.describe(attempt)
+                    if (yield effects.Wait(scheduler.plan(delay))):
                         break
-                    yield f"[尝试 {attempt}/60]  [{err}]({ERRNO_DICT.get(err, '未知错误码')}) | {ret}"
-
-                    time.sleep(interval / 1000)
+                    try:
+                        url = f"{base_url}/api/ticket/order/createV2?project_id={tickets_info['project_id']}"
+                        if is_hot_project:
+                            payload["ctoken"] = ctoken_generator.generate_ctoken(  # type: ignore
+                                is_create_v2=True
+                            )
+                            ptoken = request_result["data"]["ptoken"] or ""
+                            payload["ptoken"] = ptoken
+                            payload["orderCreateUrl"] = (
+                                "https://show.bilibili.com/api/ticket/order/createV2"
+                            )
+                            url += "&ptoken=" + ptoken
+                        timeout, timeout_note = timeouts.decide("createV2")
+                        if timeout_note:
+                            yield events.message(timeout_note)
+                        scheduler.start()
+                        request_start = time.perf_counter()
+                        ret = (
+                            yield effects.Request(
+                                "POST", url, data=payload, isJson=True, timeout=timeout
+                            )
+                        ).json()
+                        latency = time.perf_counter() - request_start
+                        err = int(ret.get("errno", ret.get("code")))
+                        action = policy.create_action(err)
+                        if action == Action.UPDATE_PRICE:
+                            yield events.message(
+                                "更新票价为：{}", ret["data"]["pay_money"] / 100
+                            )
+                            tickets_info["pay_money"] = ret["data"]["pay_money"]
+                            payload = tickets_info
+                        if action in (Action.SUCCESS, Action.STOP):
+                            yield events.attempt(
+                                attempt,
+                                "[{}]({}) 停止重试",
+                                err,
+                                ERRNO_DICT.get(err, "未知错误码"),
+                                errno=err,
+                                latency=latency,
+                            )
+                            result = (ret, err)
+                            break
+                        if action == Action.REPREPARE:
+                            yield events.attempt(
+                                attempt,
+                                "token过期，需要重新准备订单",
+                                errno=err,
+                                latency=latency,
+                            )
+                            break
+                        yield events.attempt(
+                            attempt,
+                            "[尝试 {}]  [{}]({}) | {}",
+                            progress,
+                            err,
+                            ERRNO_DICT.get(err, "未知错误码"),
+                            ret,
+                            errno=err,
+                            latency=latency,
+                        )
+                        delay, note = pacing.decide(action, err)
 
-                except RequestException as e:
-                    yield f"[尝试 {attempt}/60] 请求异常: {e}"
-                    time.sleep(interval / 1000)
+                    except Cancelled:
+                        break
 
-                except Exception as e:
-                    yield f"[尝试 {attempt}/60] 未知异常: {e}"
-                    time.sleep(interval / 1000)
-            else:
-                if show_random_message:
-                    yield f"群友说👴： {get_random_fail_message()}"
-                yield "重试次数过多，重新准备订单"
-                continue
-            if result is None:
-                yield "token过期，需要重新准备订单"
-                continue
+                    except effects.RequestTimedOut as e:
+                        yield events.attempt(
+                            attempt,
+                            "[尝试 {}] 请求超时（{}）: {}",
+                            progress,
+                            timeout,
+                            e,
+                            latency=time.perf_counter() - request_start,
+                        )
+                        delay, note = pacing.decide(None)
 
-            request_result, errno = result
-            if errno == 0:
-                # 使用统一的工厂方法创建NotifierManager
-                # 不传递interval_seconds和duration_minutes，让每个推送渠道使用自己的默认值
-                notifierManager = NotifierManager.create_from_config(
-                    config=notifier_config,
-                    title="抢票成功",
-                    content=f"bilibili会员购，请尽快前往订单中心付款: {detail}",
-                )
+                    except effects.RequestFailed as e:
+                        yield events.attempt(attempt, "[尝试 {}] 请求异常: {}", progress, e)
+                        delay, note = pacing.decide(None)
 
-                # 启动所有已配置的推送渠道
-                notifierManager.start_all()
+                    except Exception as e:
+                        yield events.attempt(attempt, "[尝试 {}] 未知异常: {}", progress, e)
+                        delay, note = pacing.decide(None)
+                    if note:
+                        yield events.message(note)
+                if result is None:
+                    continue
 
-                yield "3）抢票成功，弹出付款二维码"
-                qrcode_url = get_qrcode_url(
-                    _request,
-                    request_result["data"]["orderId"],
+                request_result, errno = result
+                if errno == 0:
+                    yield events.phase("抢票成功", "3）抢票成功，获取付款二维码")
+                    # 推送和获取付款二维码同时进行
+                    notify = yield effects.Spawn(
+                        start_notifiers, (notifier_config, detail, cancel_token)
+                    )
+                    order_id = request_result["data"]["orderId"]
+                    try:
+                        response = yield effects.Request(
+                            "GET",
+                            pay_param_url(order_id),
+                            timeout=policy.timeouts["getPayParam"],
+                        )
+                        code_url = parse_qrcode_url(response.json())
+                        yield events.pay_qr(
+                            (yield effects.Call(save_pay_qr, (order_id, code_url)))
+                        )
+                    except Exception as e:
+                        yield events.message(
+                            "获取付款二维码失败: {}，请尽快前往订单中心付款",
+                            e,
+                            level="WARNING",
+                        )
+                    yield effects.Join(notify)
+                    break
+                if errno == 100079:
+                    yield events.phase("重复订单", "有重复订单，停止重试")
+                    break
+                yield events.phase(
+                    "已停止", "{}，停止抢票", ERRNO_DICT.get(errno, "未知错误码")
                 )
-                qr_gen = qrcode.QRCode()
-                qr_gen.add_data(qrcode_url)
-                qr_gen.make(fit=True)
-                qr_gen_image = qr_gen.make_image()
-                qr_gen_image.show()  # type: ignore
-                break
-            if errno == 100079:
-                yield "有重复订单，停止重试"
                 break
-        except JSONDecodeError as e:
-            yield f"配置文件格式错误: {e}"
-        except HTTPError as e:
-            logger.exception(e)
-            yield f"请求错误: {e}"
-        except Exception as e:
-            logger.exception(e)
-            yield f"程序异常: {repr(e)}"
+            except Cancelled:
+                continue
+            except JSONDecodeError as e:
+                yield events.message("配置文件格式错误: {}", e)
+                prepare_delay, _ = pacing.decide(None)
+            except effects.RequestTimedOut as e:
+                yield events.attempt(
+                    prepare_attempt,
+                    "[准备 {}] 请求超时（{}）: {}",
+                    policy.prepare_budget.describe(prepare_attempt),
+                    timeout,
+                    e,
+                    latency=time.perf_counter() - request_start,
+                )
+                prepare_delay, note = pacing.decide(None)
+                if note:
+                    yield events.message(note)
+            except effects.RequestFailed as e:
+                logger.exception(e)
+                yield events.message("请求错误: {}", e)
+                prepare_delay, _ = pacing.decide(None)
+            except Exception as e:
+                logger.exception(e)
+                yield events.message("程序异常: {!r}", e)
+                prepare_delay, _ = pacing.decide(None)
+        else:
+            yield events.phase("已取消", "停止抢票: {}", cancel_token.reason)
+    finally:
+        if lease is not None:
+            lease.release()
+
+
+class _SyncRunner:
+    """在当前线程中执行 order_flow 产出的 effect"""
+
+    def __init__(self, telemetry: TaskTelemetry, cancel_token: CancelToken):
+        self.telemetry = telemetry
+        self.cancel_token = cancel_token
+        self.request: BiliRequest | None = None
+
+    def perform(self, effect: effects.Effect) -> Any:
+        if isinstance(effect, effects.Request):
+            assert self.request is not None
+            send = self.request.get if effect.method == "GET" else self.request.post
+            try:
+                return send(effect.url, effect.data, effect.isJson, effect.timeout)
+            except Timeout as e:
+                raise effects.RequestTimedOut(str(e)) from e
+            except RequestException as e:
+                raise effects.RequestFailed(str(e)) from e
+        if isinstance(effect, effects.Wait):
+            return self.cancel_token.wait(effect.seconds)
+        if isinstance(effect, effects.Open):
+            self.request = BiliRequest(
+                cookies=effect.cookies,
+                proxy=effect.proxy,
+                telemetry=self.telemetry,
+                cancel_token=self.cancel_token,
+            )
+            return None
+        if isinstance(effect, effects.Call):
+            return effect.fn(*effect.args)
+        if isinstance(effect, effects.Spawn):
+            thread = threading.Thread(target=effect.fn, args=effect.args, name="notify")
+            thread.start()
+            return thread
+        if isinstance(effect, effects.Join):
+            effect.handle.join()
+            return None
+        raise TypeError(f"未知的 effect: {effect!r}")
+
+
+def buy_stream(
+    tickets_info,
+    time_start,
+    interval,
+    notifier_config,
+    https_proxys,
+    show_random_message=True,
+    telemetry: TaskTelemetry | None = None,
+    policy: OutcomePolicy | None = None,
+    cancel_token: CancelToken | None = None,
+    low_jitter: bool = False,
+) -> Iterator[events.BuyEvent]:
+    """同步引擎：在当前线程中执行 order_flow，产出 events.BuyEvent，由调用方分发给各个 sink"""
+    if telemetry is None:
+        telemetry = TaskTelemetry()
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    if policy is None:
+        policy = OutcomePolicy()
+    runner = _SyncRunner(telemetry, cancel_token)
+    flow = order_flow(
+        tickets_info,
+        time_start,
+        interval,
+        notifier_config,
+        https_proxys,
+        show_random_message,
+        telemetry,
+        policy,
+        cancel_token,
+        low_jitter,
+    )
+    reply: Any = None
+    error: Exception | None = None
+    try:
+        while True:
+            try:
+                item = flow.send(reply) if error is None else flow.throw(error)
+            except StopIteration:
+                return
+            reply, error = None, None
+            if isinstance(item, events.BuyEvent):
+                yield item
+                continue
+            try:
+                reply = runner.perform(item)
+            except Exception as e:
+                error = e
+    finally:
+        flow.close()
 
 
 def buy(
@@ -219,6 +531,13 @@ def buy(
     ntfy_username=None,
     ntfy_password=None,
     show_random_message=True,
+    telemetry: TaskTelemetry | None = None,
+    task_name: str | None = None,
+    policy: OutcomePolicy | None = None,
+    cancel_token: CancelToken | None = None,
+    extra_sinks: list[events.EventSink] | None = None,
+    low_jitter: bool = False,
+    sinks: events.SinkGroup | None = None,
 ):
     # 创建NotifierConfig对象
     notifier_config = NotifierConfig(
@@ -232,18 +551,52 @@ def buy(
         audio_path=audio_path,
     )
 
-    for msg in buy_stream(
-        tickets_info,
-        time_start,
-        interval,
-        notifier_config,
-        https_proxys,
-        show_random_message,
-    ):
-        logger.info(msg)
+    telemetry = telemetry or GlobalStatusInstance.telemetry
+    # sinks 由调用方传入时，调用方可以在任务卡住时提前关闭
+    if sinks is None:
+        sinks = events.SinkGroup()
+    sinks.sinks.extend(
+        [
+            events.LogSink(task_name),
+            events.TelemetrySink(telemetry),
+            events.MetricsSink(task_name, telemetry),
+            *(extra_sinks or []),
+        ]
+    )
+    events.dispatch(
+        buy_stream(
+            tickets_info,
+            time_start,
+            interval,
+            notifier_config,
+            https_proxys,
+            show_random_message,
+            telemetry=telemetry,
+            policy=policy,
+            cancel_token=cancel_token,
+            low_jitter=low_jitter,
+        ),
+        sinks,
+    )
 
 
-def buy_new_terminal(
+def get_btb_command() -> list[str]:
+    # 1️⃣ PyInstaller / frozen
+    if getattr(sys, "frozen", False):
+        return [sys.executable]
+    # 2️⃣ 源码模式：检查「当前脚本目录」是否有 main.py
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    main_py = os.path.join(script_dir, "main.py")
+    if os.path.exists(main_py):
+        return [sys.executable, main_py]
+    # 3️⃣ 兜底：使用 btb（pip / pipx）
+    btb_path = shutil.which("btb")
+    if not btb_path:
+        raise RuntimeError("Cannot find main.py or btb command")
+    return [btb_path]
+
+
+def build_buy_args(
     endpoint_url,
     tickets_info,
     time_start,
@@ -259,27 +612,10 @@ def buy_new_terminal(
     ntfy_password=None,
     show_random_message=True,
     terminal_ui="网页",
-) -> subprocess.Popen:
-    command = None
-
-    # 1️⃣ PyInstaller / frozen
-    if getattr(sys, "frozen", False):
-        command = [sys.executable]
-    else:
-        # 2️⃣ 源码模式：检查「当前脚本目录」是否有 main.py
-        script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        main_py = os.path.join(script_dir, "main.py")
-
-        if os.path.exists(main_py):
-            command = [sys.executable, main_py]
-        # 3️⃣ 兜底：使用 btb（pip / pipx）
-        else:
-            btb_path = shutil.which("btb")
-            if not btb_path:
-                raise RuntimeError("Cannot find main.py or btb command")
-
-            command = [btb_path]
-    command.extend(["buy", tickets_info])
+    worker_index=None,
+) -> list[str]:
+    """`btb buy` 子命令的参数列表（不含可执行文件和 buy 本身）"""
+    command = [tickets_info]
     if interval is not None:
         command.extend(["--interval", str(interval)])
     if time_start:
@@ -306,7 +642,52 @@ def buy_new_terminal(
         command.extend(["--hide_random_message"])
     if terminal_ui == "网页":
         command.append("--web")
+    if worker_index is not None:
+        command.extend(["--worker_index", str(worker_index)])
     command.extend(["--endpoint_url", endpoint_url])
+    return command
+
+
+def buy_new_terminal(
+    endpoint_url,
+    tickets_info,
+    time_start,
+    interval,
+    audio_path,
+    pushplusToken,
+    serverchanKey,
+    barkToken,
+    https_proxys,
+    serverchan3ApiUrl=None,
+    ntfy_url=None,
+    ntfy_username=None,
+    ntfy_password=None,
+    show_random_message=True,
+    terminal_ui="网页",
+    worker_index=None,
+) -> subprocess.Popen:
+    command = get_btb_command()
+    command.append("buy")
+    command.extend(
+        build_buy_args(
+            endpoint_url,
+            tickets_info,
+            time_start,
+            interval,
+            audio_path,
+            pushplusToken,
+            serverchanKey,
+            barkToken,
+            https_proxys,
+            serverchan3ApiUrl,
+            ntfy_url,
+            ntfy_username,
+            ntfy_password,
+            show_random_message,
+            terminal_ui,
+            worker_index,
+        )
+    )
 
     if terminal_ui == "网页":
         proc = subprocess.Popen(command)
@@ -0,0 +1,70 @@
+"""
+下单流程与执行引擎之间的约定。
+
+task.buy.order_flow 只描述下单状态机，需要联网、等待或执行阻塞操作时产出下面的 effect，
+由同步引擎（task.buy.buy_stream）或异步引擎（task.abuy.abuy_stream）执行后把结果送回。
+两个引擎各自的请求异常统一转换为 RequestTimedOut / RequestFailed 抛回流程中。
+"""
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from util.BiliRequest import RequestTimeout
+
+
+class RequestTimedOut(Exception):
+    """请求超时"""
+
+
+class RequestFailed(Exception):
+    """连接失败、HTTP 状态码错误等请求异常"""
+
+
+@dataclass(slots=True)
+class Open:
+    """创建请求会话，之后的 Request 都通过它发出"""
+
+    cookies: list
+    proxy: str
+
+
+@dataclass(slots=True)
+class Request:
+    """返回响应对象，只使用 .json() 和 .headers"""
+
+    method: str
+    url: str
+    data: Any = None
+    isJson: bool = False
+    timeout: RequestTimeout | None = None
+
+
+@dataclass(slots=True)
+class Wait:
+    """等待 seconds 秒，返回等待期间任务是否被取消"""
+
+    seconds: float
+
+
+@dataclass(slots=True)
+class Call:
+    """执行阻塞函数并返回结果，异步引擎放到线程中执行"""
+
+    fn: Callable[..., Any]
+    args: tuple = ()
+
+
+@dataclass(slots=True)
+class Spawn:
+    """在后台执行阻塞函数，返回交给 Join 的句柄"""
+
+    fn: Callable[..., Any]
+    args: tuple = ()
+
+
+@dataclass(slots=True)
+class Join:
+    handle: Any
+
+
+Effect = Open | Request | Wait | Call | Spawn | Join
@@ -1,40 +1,204 @@
-import os
+import asyncio
+import json
 import threading
-import time
-from gradio_client import Client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import httpx
+import requests
 from loguru import logger
 
 from util import GlobalStatusInstance
+from util.CancelToken import CancelToken
+from util.Telemetry import TaskTelemetry
+
+HEARTBEAT_PATH = "/heartbeat"
+HEARTBEAT_INTERVAL = 2
+
+
+class _HeartbeatHandler(BaseHTTPRequestHandler):
+    """
+    Master 端的心跳接口，payload 为紧凑 JSON:
+    {"u": 终端地址, "d": 任务详情, "s": TaskTelemetry.snapshot()}
+    需要停止该终端时响应 200 和 {"stop": 1}，否则响应 204
+    """
+
+    def do_POST(self):
+        if self.path != HEARTBEAT_PATH:
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            GlobalStatusInstance.report(
+                payload["u"], payload.get("d", ""), payload.get("s")
+            )
+        except Exception:
+            self.send_error(400)
+            return
+        if GlobalStatusInstance.consume_stop(payload["u"]):
+            body = b'{"stop":1}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # 心跳很频繁，不输出访问日志
+        pass
+
+
+class HeartbeatServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), _HeartbeatHandler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{str(host)}:{port}"
+
+    def start(self) -> "HeartbeatServer":
+        self.thread.start()
+        logger.info(f"心跳服务已启动: {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
 
+_heartbeat_server: HeartbeatServer | None = None
 
-def start_heartbeat_thread(client: Client, self_url: str, to_url: str):
+
+def get_heartbeat_server() -> HeartbeatServer:
+    """Master 进程内共享一个心跳服务"""
+    global _heartbeat_server
+    if _heartbeat_server is None:
+        _heartbeat_server = HeartbeatServer().start()
+    return _heartbeat_server
+
+
+class _HeartbeatReporter:
+    """心跳内容和响应处理，线程版本和协程版本共用"""
+
+    def __init__(
+        self,
+        self_url: str,
+        to_url: str,
+        telemetry: TaskTelemetry | None,
+        cancel_token: CancelToken,
+    ):
+        self.self_url = self_url
+        self.url = to_url.rstrip("/") + HEARTBEAT_PATH
+        self.telemetry = telemetry
+        self.cancel_token = cancel_token
+        self.failures = 0
+
+    def payload(self) -> str:
+        telemetry = self.telemetry
+        return json.dumps(
+            {
+                "u": self.self_url,
+                "d": GlobalStatusInstance.nowTask if telemetry is None else telemetry.task,
+                "s": (telemetry or GlobalStatusInstance.telemetry).snapshot(),
+            },
+            separators=(",", ":"),
+        )
+
+    def handle(self, response) -> None:
+        """response 为 requests 或 httpx 的响应"""
+        response.raise_for_status()
+        self.failures = 0
+        if response.status_code == 200 and response.json().get("stop"):
+            self.cancel_token.cancel("Master 要求停止")
+
+    def fail(self, e: Exception) -> None:
+        self.failures += 1
+        logger.error(f"report_heart error: {e}")
+        if self.failures > 100:
+            logger.error("report_heart error too many times, exit")
+            self.cancel_token.cancel("与 Master 的心跳连续失败")
+
+
+def start_heartbeat_thread(
+    self_url: str,
+    to_url: str,
+    telemetry: TaskTelemetry | None = None,
+    cancel_token: CancelToken | None = None,
+) -> Callable[[], None]:
     """
     send task detail to Master
 
+    同一进程运行多个任务时，每个任务传入自己的 telemetry 分别上报。
+    Master 要求停止或连续失败过多时取消 cancel_token；
+    返回立即上报一次的函数，供退出前发送最终状态
     """
-    cnt = 0
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    reporter = _HeartbeatReporter(self_url, to_url, telemetry, cancel_token)
+    session = requests.Session()
+    session.trust_env = False
 
-    def report_heart(client: Client, self_url: str, to_url: str):
-        nonlocal cnt
+    def report_heart():
         try:
-            client.predict(
-                self_url,
-                GlobalStatusInstance.nowTask,
-                api_name="/report",
+            reporter.handle(
+                session.post(
+                    reporter.url,
+                    data=reporter.payload(),
+                    headers={"Content-Type": "application/json"},
+                    timeout=1,
+                )
             )
-            cnt = 0
         except Exception as e:
-            cnt += 1
-            logger.error(f"report_heart error: {e}")
-            if cnt > 100:
-                logger.error("report_heart error too many times, exit")
-                time.sleep(3)
-                os._exit(1)
+            reporter.fail(e)
 
     def heartbeat_loop():
         while True:
-            report_heart(client, self_url, to_url)
-            time.sleep(2)
+            report_heart()
+            if cancel_token.wait(HEARTBEAT_INTERVAL):
+                break
 
     t = threading.Thread(target=heartbeat_loop, daemon=True)
     t.start()
+    return report_heart
+
+
+async def heartbeat_async(
+    self_url: str,
+    to_url: str,
+    telemetry: TaskTelemetry | None = None,
+    cancel_token: CancelToken | None = None,
+) -> None:
+    """
+    start_heartbeat_thread 的协程版本，与异步抢票引擎共用事件循环。
+    一直运行到被调用方取消，取消时上报最后一次状态
+    """
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    reporter = _HeartbeatReporter(self_url, to_url, telemetry, cancel_token)
+    async with httpx.AsyncClient(trust_env=False, timeout=1) as client:
+
+        async def report_heart():
+            try:
+                reporter.handle(
+                    await client.post(
+                        reporter.url,
+                        content=reporter.payload(),
+                        headers={"Content-Type": "application/json"},
+                    )
+                )
+            except Exception as e:
+                reporter.fail(e)
+
+        try:
+            while True:
+                await report_heart()
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+        finally:
+            await report_heart()
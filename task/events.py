@@ -0,0 +1,231 @@
+"""
+抢票流程事件。
+
+buy_stream 产出 BuyEvent，由各个 sink 消费。只有日志 sink 需要拼接文字，
+并且交给 loguru 延迟格式化；telemetry、统计等 sink 直接读取字段。
+控制台、日志文件和网页日志都是 loguru 的输出，Master 心跳读取 telemetry。
+付款二维码事件由 TerminalQRSink 或网页日志的 ViewerQRSink 展示。
+"""
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, AsyncIterable, Iterable, Optional, Protocol
+
+from loguru import logger
+
+from util.QRCodeUtil import qr_text
+from util.Telemetry import TaskTelemetry
+
+
+class EventKind(Enum):
+    PHASE = "phase"
+    ATTEMPT = "attempt"
+    MESSAGE = "message"
+    PAY_QR = "pay_qr"
+
+
+@dataclass(slots=True)
+class BuyEvent:
+    kind: EventKind
+    template: str
+    args: tuple = ()
+    phase: Optional[str] = None
+    attempt: Optional[int] = None
+    errno: Optional[int] = None
+    # 请求耗时，单位秒
+    latency: Optional[float] = None
+    level: str = "INFO"
+    # 附加数据，如 PAY_QR 事件的 PayQR
+    data: Any = None
+    time: float = field(default_factory=time.time)
+
+    @property
+    def message(self) -> str:
+        return self.template.format(*self.args) if self.args else self.template
+
+    def __str__(self) -> str:
+        return self.message
+
+
+def phase(name: str, template: str, *args: Any) -> BuyEvent:
+    return BuyEvent(EventKind.PHASE, template, args, phase=name)
+
+
+def attempt(
+    number: Optional[int],
+    template: str,
+    *args: Any,
+    errno: Optional[int] = None,
+    latency: Optional[float] = None,
+    level: str = "INFO",
+) -> BuyEvent:
+    return BuyEvent(
+        EventKind.ATTEMPT,
+        template,
+        args,
+        attempt=number,
+        errno=errno,
+        latency=latency,
+        level=level,
+    )
+
+
+def message(
+    template: str, *args: Any, latency: Optional[float] = None, level: str = "INFO"
+) -> BuyEvent:
+    return BuyEvent(EventKind.MESSAGE, template, args, latency=latency, level=level)
+
+
+@dataclass(slots=True)
+class PayQR:
+    order_id: str
+    url: str
+    png: bytes
+    # 保存到日志目录的 PNG 路径，保存失败时为 None
+    path: Optional[str] = None
+
+
+def pay_qr(qr: PayQR) -> BuyEvent:
+    return BuyEvent(
+        EventKind.PAY_QR,
+        "付款二维码已生成，订单号 {}，图片 {}，付款链接 {}",
+        (qr.order_id, qr.path or "未保存", qr.url),
+        level="SUCCESS",
+        data=qr,
+    )
+
+
+class EventSink(Protocol):
+    def handle(self, event: BuyEvent) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class LogSink:
+    """输出到 loguru，没有 handler 接收该级别时不会格式化"""
+
+    def __init__(self, task_name: Optional[str] = None):
+        self.prefix = f"[{task_name}] " if task_name else ""
+
+    def handle(self, event: BuyEvent) -> None:
+        logger.opt(lazy=True).log(
+            event.level, "{}", lambda: self.prefix + event.message
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class TelemetrySink:
+    """更新 TaskTelemetry，心跳会把它上报给 Master"""
+
+    def __init__(self, telemetry: TaskTelemetry):
+        self.telemetry = telemetry
+
+    def handle(self, event: BuyEvent) -> None:
+        if event.phase is not None:
+            self.telemetry.set_phase(event.phase)
+        if event.latency is not None:
+            self.telemetry.record_latency(event.latency)
+        if event.kind == EventKind.ATTEMPT and event.attempt is not None:
+            self.telemetry.record_attempt(event.attempt, event.errno)
+
+    def close(self) -> None:
+        pass
+
+
+class TerminalQRSink:
+    """在终端打印付款二维码字符画"""
+
+    def handle(self, event: BuyEvent) -> None:
+        if event.kind != EventKind.PAY_QR:
+            return
+        print("\n请使用B站APP扫描下方二维码付款:\n", flush=True)
+        print(qr_text(event.data.url), flush=True)
+
+    def close(self) -> None:
+        pass
+
+
+class MetricsSink:
+    """统计尝试次数和错误码分布，结束时输出汇总"""
+
+    def __init__(
+        self, task_name: Optional[str] = None, telemetry: Optional[TaskTelemetry] = None
+    ):
+        self.task_name = task_name
+        self.telemetry = telemetry
+        self.attempts = 0
+        self.errnos: Counter = Counter()
+        self.started = time.monotonic()
+
+    def handle(self, event: BuyEvent) -> None:
+        if event.kind != EventKind.ATTEMPT:
+            return
+        self.attempts += 1
+        if event.errno is not None:
+            self.errnos[event.errno] += 1
+
+    def close(self) -> None:
+        prefix = f"[{self.task_name}] " if self.task_name else ""
+        if self.telemetry is not None and self.telemetry.wake_error is not None:
+            logger.info(f"{prefix}开票唤醒误差 {self.telemetry.wake_error:.2f}ms")
+        if self.attempts == 0:
+            return
+        distribution = ", ".join(f"{k}×{v}" for k, v in self.errnos.most_common())
+        logger.info(
+            f"{prefix}共尝试 {self.attempts} 次，用时 "
+            f"{time.monotonic() - self.started:.1f}s，错误码分布: {distribution or '无'}"
+        )
+        if self.telemetry is None:
+            return
+        p50 = self.telemetry.start_error_percentile(50)
+        if p50 is not None:
+            logger.info(
+                f"{prefix}重试调度误差 p50 {p50:.2f}ms / "
+                f"p95 {self.telemetry.start_error_percentile(95):.2f}ms"
+            )
+
+
+class SinkGroup:
+    """
+    一个任务的全部 sink。close 只生效一次，并且可以在其他线程调用：
+    任务线程卡在请求上时，由 task.runner 代为关闭，保证汇总照常输出
+    """
+
+    def __init__(self, sinks: Optional[list[EventSink]] = None):
+        self.sinks: list[EventSink] = list(sinks or [])
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def handle(self, event: BuyEvent) -> None:
+        if self.closed:
+            return
+        for sink in self.sinks:
+            sink.handle(event)
+
+    def close(self) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        for sink in self.sinks:
+            sink.close()
+
+
+def dispatch(events: Iterable[BuyEvent], sinks: SinkGroup) -> None:
+    try:
+        for event in events:
+            sinks.handle(event)
+    finally:
+        sinks.close()
+
+
+async def dispatch_async(events: AsyncIterable[BuyEvent], sinks: SinkGroup) -> None:
+    try:
+        async for event in events:
+            sinks.handle(event)
+    finally:
+        sinks.close()
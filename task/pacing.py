@@ -0,0 +1,149 @@
+"""
+createV2 重试间隔和请求超时控制。
+
+策略判定为 Action.COOLDOWN（默认为服务器拥挤 900001/900002 和抢票CD中 3）
+或请求异常时按倍数退避，其他结果逐步恢复到用户设置的间隔，任何情况下都不会低于该间隔。
+间隔从上一次请求开始时计算，而不是收到响应之后再等待。
+"""
+import math
+import random
+import time
+from typing import Optional
+
+from task.policy import CONGESTION_ERRNOS, COOLDOWN_ERRNOS, Action
+from util.BiliRequest import RequestTimeout
+from util.Telemetry import TaskTelemetry
+
+BACKOFF_FACTOR = 2.0
+# 间隔为 0 时倍数退避无效，至少增加该秒数
+BACKOFF_STEP = 0.2
+COOLDOWN_MIN_DELAY = 1.0
+MAX_DELAY = 5.0
+# 退避时额外增加的随机比例，避免多个进程同时重试
+JITTER = 0.2
+
+# 自适应超时至少需要的延迟样本数，以及读取超时的下限
+ADAPTIVE_MIN_SAMPLES = 10
+MIN_READ_TIMEOUT = 0.5
+
+
+class PacingController:
+    def __init__(self, interval: float, max_delay: float = MAX_DELAY):
+        """interval 为用户设置的间隔，单位秒"""
+        self.base = max(interval, 0.0)
+        self.max_delay = max(max_delay, self.base)
+        self.delay = self.base
+        self.reason = "正常"
+
+    def _backoff(self, floor: float = 0.0) -> float:
+        return min(
+            self.max_delay,
+            max(self.delay * BACKOFF_FACTOR, self.base + BACKOFF_STEP, floor),
+        )
+
+    def decide(
+        self, action: Optional[Action], errno: Optional[int] = None
+    ) -> tuple[float, Optional[str]]:
+        """
+        根据策略给出的 action 返回 (等待秒数, 说明)，action 为 None 表示请求异常。
+        抢票CD中的 errno 至少等待 COOLDOWN_MIN_DELAY。
+        只有退避等级变化时才返回说明，调用方据此输出日志
+        """
+        previous = (self.delay, self.reason)
+        if action is None:
+            self.delay, self.reason = self._backoff(), "请求异常"
+        elif action == Action.COOLDOWN and errno in COOLDOWN_ERRNOS:
+            self.delay, self.reason = self._backoff(COOLDOWN_MIN_DELAY), "抢票CD中"
+        elif action == Action.COOLDOWN:
+            reason = "服务器拥挤" if errno in CONGESTION_ERRNOS else action.value
+            self.delay, self.reason = self._backoff(), reason
+        else:
+            self.delay = max(self.base, self.delay / BACKOFF_FACTOR)
+            self.reason = "正常" if self.delay == self.base else "恢复中"
+
+        wait = self.delay
+        if self.delay > self.base:
+            wait += random.uniform(0, self.delay * JITTER)
+
+        note = None
+        if (self.delay, self.reason) != previous:
+            note = (
+                f"[节奏] {self.reason}，重试间隔调整为 {self.delay:.2f}s"
+                f"（设置 {self.base:.2f}s）"
+            )
+        return wait, note
+
+
+class TimeoutController:
+    """
+    按接口给出请求超时。factor 大于 0 时读取超时取最近延迟 p95 的 factor 倍，
+    向上取整到 0.1s，并限制在 MIN_READ_TIMEOUT 和固定值之间。
+    超时的请求以耗时计入延迟样本，网络变慢时超时随之放宽
+    """
+
+    def __init__(
+        self,
+        timeouts: dict[str, RequestTimeout],
+        factor: float = 0,
+        telemetry: Optional[TaskTelemetry] = None,
+    ):
+        self.timeouts = timeouts
+        self.factor = factor
+        self.telemetry = telemetry
+        self.current: dict[str, RequestTimeout] = {}
+
+    def decide(self, name: str) -> tuple[RequestTimeout, Optional[str]]:
+        """返回 (超时, 说明)，只有超时变化时才返回说明"""
+        timeout = self.timeouts[name]
+        source = "固定"
+        if (
+            self.factor > 0
+            and self.telemetry is not None
+            and len(self.telemetry.latencies) >= ADAPTIVE_MIN_SAMPLES
+        ):
+            p95 = self.telemetry.latency_percentile(95) or 0.0
+            read = math.ceil(p95 / 1000 * self.factor * 10) / 10
+            timeout = RequestTimeout(
+                timeout.connect, min(timeout.read, max(MIN_READ_TIMEOUT, read))
+            )
+            source = f"p95 {p95:.0f}ms ×{self.factor:g}"
+        note = None
+        if self.current.get(name) != timeout:
+            self.current[name] = timeout
+            note = f"[超时] {name} {timeout}（{source}）"
+        return timeout, note
+
+
+class DeadlineScheduler:
+    """
+    下一次请求在上一次请求开始后 delay 秒到期。
+    响应慢于 delay 时到期后立即发出，但不会补发错过的请求，因此不会出现突发
+    """
+
+    def __init__(self, telemetry: Optional[TaskTelemetry] = None):
+        self.telemetry = telemetry
+        self.last_start: Optional[float] = None
+        self.delay = 0.0
+        # 本次请求计划发出的时刻，start 时据此记录调度误差
+        self.due: Optional[float] = None
+
+    def plan(self, delay: float) -> float:
+        """返回距离下一次请求到期的秒数，由引擎负责等待"""
+        self.delay = delay
+        if self.last_start is None:
+            self.due = None
+            return 0.0
+        now = time.monotonic()
+        self.due = max(self.last_start + delay, now)
+        return self.due - now
+
+    def start(self) -> None:
+        """请求发出前调用，记录实际间隔和调度误差"""
+        now = time.monotonic()
+        if self.telemetry is not None:
+            if self.last_start is not None:
+                self.telemetry.record_period(now - self.last_start, self.delay)
+            if self.due is not None:
+                self.telemetry.record_start_error(now - self.due)
+        self.last_start = now
+        self.due = None
@@ -0,0 +1,119 @@
+"""
+抢票流程中各请求结果的处理策略。
+
+订单准备（prepare）和创建订单（createV2）各有一张 errno -> Action 表，
+未列出的 errno 按 default 处理；每个阶段另有尝试次数和时间预算，
+以及各接口的连接/读取超时。
+"""
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Optional
+
+from util.BiliRequest import DEFAULT_TIMEOUT, RequestTimeout
+
+# 服务器拥挤和抢票CD中，默认按 Action.COOLDOWN 退避
+CONGESTION_ERRNOS = {900001, 900002}
+COOLDOWN_ERRNOS = {3}
+
+
+class Action(Enum):
+    SUCCESS = "成功"
+    RETRY = "重试"
+    # 重试间隔按倍数退避，见 task.pacing.PacingController
+    COOLDOWN = "退避重试"
+    UPDATE_PRICE = "更新票价"
+    REPREPARE = "重新准备订单"
+    STOP = "停止抢票"
+
+
+def _with_cooldown(table: dict[int, Action]) -> dict[int, Action]:
+    return {
+        **{errno: Action.COOLDOWN for errno in CONGESTION_ERRNOS | COOLDOWN_ERRNOS},
+        **table,
+    }
+
+
+PREPARE_TABLE = _with_cooldown({0: Action.SUCCESS})
+
+CREATE_TABLE = _with_cooldown(
+    {
+        0: Action.SUCCESS,
+        100034: Action.UPDATE_PRICE,
+        100051: Action.REPREPARE,
+        100048: Action.STOP,
+        100079: Action.STOP,
+    }
+)
+
+# 开票时卡住的请求应尽快失败，交给节奏控制重试；获取付款二维码不着急
+ORDER_TIMEOUT = RequestTimeout(connect=3.05, read=5)
+PHASE_TIMEOUTS = {
+    "prepare": ORDER_TIMEOUT,
+    "createV2": ORDER_TIMEOUT,
+    "getPayParam": DEFAULT_TIMEOUT,
+}
+
+
+@dataclass(frozen=True)
+class PhaseBudget:
+    """attempts 和 seconds 为 0 表示不限制"""
+
+    attempts: int = 0
+    seconds: float = 0
+
+    def exhausted(self, attempt: int, started: float) -> bool:
+        """attempt 为已完成的尝试次数，started 为该阶段开始的 time.monotonic()"""
+        if self.attempts and attempt >= self.attempts:
+            return True
+        return bool(self.seconds) and time.monotonic() - started >= self.seconds
+
+    def describe(self, attempt: int) -> str:
+        return f"{attempt}/{self.attempts}" if self.attempts else str(attempt)
+
+
+@dataclass
+class OutcomePolicy:
+    """只读配置，可以在多个任务间共享"""
+
+    prepare_budget: PhaseBudget = field(default_factory=PhaseBudget)
+    create_budget: PhaseBudget = field(default_factory=lambda: PhaseBudget(attempts=60))
+    prepare_table: dict[int, Action] = field(default_factory=lambda: dict(PREPARE_TABLE))
+    create_table: dict[int, Action] = field(default_factory=lambda: dict(CREATE_TABLE))
+    default: Action = Action.RETRY
+    timeouts: dict[str, RequestTimeout] = field(default_factory=lambda: dict(PHASE_TIMEOUTS))
+    # 大于 0 时 prepare / createV2 的读取超时取最近延迟 p95 的该倍数，不超过固定值
+    adaptive_timeout: float = 0
+
+    @classmethod
+    def from_budgets(
+        cls,
+        prepare_attempts: int = 0,
+        prepare_timeout: float = 0,
+        create_attempts: int = 60,
+        create_timeout: float = 0,
+        connect_timeout: float = ORDER_TIMEOUT.connect,
+        read_timeout: float = ORDER_TIMEOUT.read,
+        adaptive_timeout: float = 0,
+    ) -> "OutcomePolicy":
+        order_timeout = RequestTimeout(connect_timeout, read_timeout)
+        return cls(
+            prepare_budget=PhaseBudget(prepare_attempts, prepare_timeout),
+            create_budget=PhaseBudget(create_attempts, create_timeout),
+            timeouts={**PHASE_TIMEOUTS, "prepare": order_timeout, "createV2": order_timeout},
+            adaptive_timeout=adaptive_timeout,
+        )
+
+    def prepare_action(self, errno: Optional[int], token: Optional[str]) -> Action:
+        """errno 为 None 表示请求异常；成功但没有 token 时按重试处理"""
+        if errno is None:
+            return self.default
+        action = self.prepare_table.get(errno, self.default)
+        if action == Action.SUCCESS and not token:
+            return Action.RETRY
+        return action
+
+    def create_action(self, errno: Optional[int]) -> Action:
+        if errno is None:
+            return self.default
+        return self.create_table.get(errno, self.default)
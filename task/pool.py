@@ -0,0 +1,89 @@
+"""
+预热的抢票进程池。
+
+GUI 每次启动抢票都要新开解释器并重新导入所有模块（包括 util 中的 NTP 校时），
+这里提前启动若干个 `btb worker` 进程完成导入后在 stdin 上等待配置，
+点击「开始抢票」时直接把 `btb buy` 的参数写入管道即可。
+"""
+import json
+import subprocess
+import sys
+import threading
+from collections import deque
+
+from loguru import logger
+
+from task.buy import get_btb_command
+
+DEFAULT_POOL_SIZE = 2
+
+
+def worker_cmd(parser):
+    """`btb worker` 入口：完成导入后等待 master 发送 buy 参数"""
+    # 提前导入抢票需要的模块，util 导入时会完成 NTP 校时
+    import util  # noqa: F401
+    import task.buy  # noqa: F401
+    import task.endpoint  # noqa: F401
+    import task.viewer  # noqa: F401
+    from app_cmd.buy import buy_cmd
+
+    line = sys.stdin.readline()
+    if not line:
+        # master 已退出或进程池关闭
+        return
+    argv = json.loads(line)["argv"]
+    buy_cmd(parser.parse_args(["buy", *argv]))
+
+
+class WarmWorkerPool:
+    def __init__(self, size: int = DEFAULT_POOL_SIZE):
+        self.size = size
+        self.idle: deque[subprocess.Popen] = deque()
+        self.lock = threading.Lock()
+
+    def _spawn(self) -> subprocess.Popen:
+        return subprocess.Popen([*get_btb_command(), "worker"], stdin=subprocess.PIPE)
+
+    def _drop_dead(self):
+        self.idle = deque(p for p in self.idle if p.poll() is None)
+
+    def ensure(self, count: int = 0):
+        """保证至少有 max(count, size) 个空闲进程"""
+        target = max(count, self.size)
+        with self.lock:
+            self._drop_dead()
+            while len(self.idle) < target:
+                self.idle.append(self._spawn())
+
+    def ensure_async(self, count: int = 0):
+        threading.Thread(target=self.ensure, args=(count,), daemon=True).start()
+
+    def submit(self, buy_args: list[str]) -> subprocess.Popen:
+        """把 buy 参数交给一个空闲进程，没有空闲进程时现启动一个"""
+        with self.lock:
+            self._drop_dead()
+            proc = self.idle.popleft() if self.idle else self._spawn()
+        assert proc.stdin
+        proc.stdin.write((json.dumps({"argv": buy_args}) + "\n").encode("utf-8"))
+        proc.stdin.close()
+        logger.info(f"已将任务交给预热进程 pid={proc.pid}")
+        self.ensure_async()
+        return proc
+
+    def shutdown(self):
+        with self.lock:
+            for proc in self.idle:
+                # 关闭 stdin 后空闲进程读到 EOF 自行退出
+                if proc.stdin:
+                    proc.stdin.close()
+            self.idle.clear()
+
+
+_worker_pool: WarmWorkerPool | None = None
+
+
+def get_worker_pool() -> WarmWorkerPool:
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = WarmWorkerPool()
+    return _worker_pool
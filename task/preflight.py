@@ -0,0 +1,246 @@
+"""
+开票前的预检。
+
+配置结构在任务启动时立即校验，有问题直接停止；登录状态、票种和购票人需要请求接口，
+在等待开票期间于后台线程完成，并且只在开票前 PREFLIGHT_MARGIN 秒之前进行，
+到时还没完成的检查直接放弃，不会推迟抢票。
+"""
+import json
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from json import JSONDecodeError
+from typing import Any, Optional
+
+from requests import Timeout
+
+from task import events
+from util.ApiCache import (
+    fetch_addresses,
+    fetch_buyers,
+    fetch_linkgoods_detail,
+    fetch_nav,
+    fetch_project,
+)
+from util.BiliRequest import BiliRequest, RequestTimeout
+from util.CancelToken import CancelToken, Cancelled
+from util.Catalogue import Catalogue
+from util.CriticalWindow import get_critical_window
+
+# 距离开票不足该秒数时跳过联网检查
+MIN_PREFLIGHT_SECONDS = 5.0
+# 联网检查需在开票前该秒数之前结束
+PREFLIGHT_MARGIN = 2.0
+PREFLIGHT_WORKERS = 4
+PREFLIGHT_TIMEOUT = RequestTimeout(connect=3.05, read=5)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+class PreflightError(ValueError):
+    """配置无法用于抢票"""
+
+
+@dataclass(slots=True)
+class Finding:
+    level: str
+    message: str
+
+
+@dataclass(slots=True)
+class PreflightSpec:
+    """联网检查需要的字段，在配置被下单流程改写前取出"""
+
+    cookies: list
+    project_id: int
+    screen_id: int
+    sku_id: int
+    count: int
+    pay_money: int
+    link_id: Optional[int]
+    buyer_ids: list
+    addr_id: Optional[int]
+
+
+def _is_id(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, str) and value.isdigit())
+
+
+def validate_config(tickets_info: str) -> dict:
+    """解析并校验配置结构，有问题时抛出 PreflightError 并列出全部问题"""
+    try:
+        config = json.loads(tickets_info)
+    except JSONDecodeError as e:
+        raise PreflightError(f"配置不是合法的 JSON: {e}") from e
+    if not isinstance(config, dict):
+        raise PreflightError("配置应为 JSON 对象")
+
+    problems = []
+    for key in ("detail", "cookies", "buyer_info", "deliver_info"):
+        if key not in config:
+            problems.append(f"缺少字段 {key}")
+    for key in ("count", "screen_id", "project_id", "sku_id", "pay_money"):
+        if key not in config:
+            problems.append(f"缺少字段 {key}")
+        elif not _is_id(config[key]):
+            problems.append(f"字段 {key} 应为整数，当前为 {config[key]!r}")
+    if problems:
+        raise PreflightError("；".join(problems))
+
+    if not config["cookies"]:
+        problems.append("cookies 为空，请重新登录后生成配置")
+    buyers = config["buyer_info"]
+    if not isinstance(buyers, list) or not all(
+        isinstance(b, dict) and "id" in b for b in buyers
+    ):
+        problems.append("buyer_info 应为包含 id 的购票人列表")
+    elif buyers and len(buyers) != int(config["count"]):
+        problems.append(f"购票人数量 {len(buyers)} 与购票数量 {config['count']} 不一致")
+    if not isinstance(config["deliver_info"], dict):
+        problems.append("deliver_info 应为 JSON 对象")
+    if int(config["count"]) <= 0:
+        problems.append("购票数量应大于 0")
+    if problems:
+        raise PreflightError("；".join(problems))
+    return config
+
+
+def preflight_spec(config: dict) -> PreflightSpec:
+    """config 为 validate_config 的结果"""
+    return PreflightSpec(
+        cookies=config["cookies"],
+        project_id=int(config["project_id"]),
+        screen_id=int(config["screen_id"]),
+        sku_id=int(config["sku_id"]),
+        count=int(config["count"]),
+        pay_money=int(config["pay_money"]),
+        link_id=config.get("link_id"),
+        buyer_ids=[b["id"] for b in config["buyer_info"]],
+        addr_id=config["deliver_info"].get("addr_id"),
+    )
+
+
+def _data(ret: dict, what: str) -> dict:
+    if ret.get("errno", ret.get("code")) != 0:
+        raise RuntimeError(f"获取{what}失败: {ret.get('msg', ret.get('message', ret))}")
+    return ret["data"]
+
+
+def _check_ticket(request, spec: PreflightSpec) -> list[Finding]:
+    if spec.link_id:
+        detail = _data(fetch_linkgoods_detail(request, spec.link_id, refresh=True), "场贩商品")
+        catalogue = Catalogue({"id": spec.project_id, "name": detail.get("name", "")})
+        catalogue.add_linkgoods(detail, spec.link_id)
+    else:
+        catalogue = Catalogue(_data(fetch_project(request, spec.project_id, refresh=True), "项目信息"))
+    ticket = catalogue.by_sku(spec.sku_id)
+    if ticket is None:
+        if catalogue.sales_dates:
+            return [Finding("INFO", f"票种 {spec.sku_id} 按日期售卖，未在项目信息中，跳过检查")]
+        return [Finding("ERROR", f"项目中已没有票种 {spec.sku_id}，请重新生成配置")]
+    findings = []
+    if ticket.screen.id != spec.screen_id:
+        findings.append(
+            Finding("ERROR", f"票种 {spec.sku_id} 属于场次 {ticket.screen.id}，配置中为 {spec.screen_id}")
+        )
+    if ticket.price * spec.count != spec.pay_money:
+        findings.append(
+            Finding(
+                "WARNING",
+                f"票价已变为 ￥{ticket.price * spec.count / 100:.2f}"
+                f"（配置中为 ￥{spec.pay_money / 100:.2f}），下单时会按提示更新",
+            )
+        )
+    return findings
+
+
+def _check_buyers(request, spec: PreflightSpec) -> list[Finding]:
+    if not spec.buyer_ids:
+        return []
+    existing = {b["id"] for b in _data(fetch_buyers(request, spec.project_id, refresh=True), "购票人")["list"]}
+    missing = [i for i in spec.buyer_ids if i not in existing]
+    if missing:
+        return [Finding("ERROR", f"购票人 {missing} 已不存在，请重新生成配置")]
+    return []
+
+
+def _check_address(request, spec: PreflightSpec) -> list[Finding]:
+    if not spec.addr_id:
+        return []
+    existing = {a["id"] for a in _data(fetch_addresses(request, refresh=True), "收货地址")["addr_list"]}
+    if spec.addr_id not in existing:
+        return [Finding("ERROR", f"收货地址 {spec.addr_id} 已不存在，请重新生成配置")]
+    return []
+
+
+def run_preflight(
+    spec: PreflightSpec, proxy: str, cancel_token: CancelToken, deadline: float
+) -> list[Finding]:
+    """
+    deadline 为 time.monotonic() 时间，超过后不再发起新的检查，
+    进行中的请求和 412 冷却也不会超过它
+    """
+    request = BiliRequest(
+        cookies=spec.cookies,
+        proxy=proxy,
+        cancel_token=cancel_token,
+        timeout=PREFLIGHT_TIMEOUT,
+        deadline=deadline,
+    )
+    try:
+        nav = fetch_nav(request, refresh=True)
+    except Timeout:
+        if time.monotonic() < deadline:
+            raise
+        return [Finding("WARNING", "临近开票，跳过登录状态检查")]
+    if not (nav.get("code") == 0 and nav["data"].get("isLogin")):
+        return [Finding("ERROR", "登录已失效，请重新登录后生成配置")]
+    findings = []
+    for name, check in (("票种", _check_ticket), ("购票人", _check_buyers), ("收货地址", _check_address)):
+        if (
+            time.monotonic() >= deadline
+            or cancel_token.cancelled
+            or get_critical_window().active
+        ):
+            findings.append(Finding("WARNING", f"临近开票，跳过{name}检查"))
+            continue
+        try:
+            findings.extend(check(request, spec))
+        except Exception as e:
+            findings.append(Finding("WARNING", f"检查{name}失败: {e}"))
+    return findings
+
+
+def start_preflight(
+    spec: PreflightSpec, proxy: str, cancel_token: CancelToken, budget: float
+) -> Optional[Future]:
+    """在后台进行联网检查，budget 为距离开票的秒数，时间不足时返回 None"""
+    global _executor
+    if budget < MIN_PREFLIGHT_SECONDS:
+        return None
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=PREFLIGHT_WORKERS, thread_name_prefix="preflight"
+        )
+    return _executor.submit(
+        run_preflight,
+        spec,
+        proxy,
+        cancel_token,
+        time.monotonic() + budget - PREFLIGHT_MARGIN,
+    )
+
+
+def preflight_events(future: Future) -> list[events.BuyEvent]:
+    """已完成的联网检查结果转为事件"""
+    try:
+        findings = future.result()
+    except Cancelled:
+        return []
+    except Exception as e:
+        return [events.message("[预检] 检查失败: {}", e, level="WARNING")]
+    if not findings:
+        return [events.message("[预检] 登录状态、票种、购票人和收货地址检查通过")]
+    return [events.message("[预检] {}", f.message, level=f.level) for f in findings]
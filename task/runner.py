@@ -0,0 +1,137 @@
+"""
+在同一个进程内运行多个抢票配置，同步引擎每个任务一个线程，异步引擎共用一个事件循环。
+
+各任务共享时间偏差、日志输出和推送线程池（util.Notifier.get_notifier_dispatcher），但各自持有独立的 BiliRequest
+（cookies 与 HTTP session）以及 TaskTelemetry。
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Coroutine
+
+from loguru import logger
+
+from task import events
+from task.abuy import abuy
+from task.buy import buy
+from util.CancelToken import CancelToken
+from util.CriticalWindow import get_critical_window
+from util.Telemetry import TaskTelemetry
+
+# 取消后等待各任务退出的最长时间
+SHUTDOWN_GRACE = 1.0
+JOIN_POLL_INTERVAL = 0.5
+
+
+@dataclass
+class BuyTask:
+    name: str
+    tickets_info: str
+    telemetry: TaskTelemetry = field(default_factory=TaskTelemetry)
+
+    def __post_init__(self):
+        self.telemetry.task = self.name
+
+
+def unique_task_names(names: list[str]) -> list[str]:
+    """同名配置追加序号，保证日志前缀和心跳地址可区分"""
+    seen: dict[str, int] = {}
+    result = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        result.append(name if seen[name] == 1 else f"{name}#{seen[name]}")
+    return result
+
+
+def run_buy_tasks(
+    tasks: list[BuyTask], cancel_token: CancelToken | None = None, **buy_kwargs
+):
+    """
+    每个任务一个线程，全部结束后返回。
+    取消后最多再等待 SHUTDOWN_GRACE 秒，仍在等待请求返回的任务直接放弃，
+    并代为关闭它的 sink，输出统计汇总
+    """
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    sink_groups = [events.SinkGroup() for _ in tasks]
+
+    def run(task: BuyTask, sinks: events.SinkGroup):
+        try:
+            buy(
+                task.tickets_info,
+                telemetry=task.telemetry,
+                # 单个任务不加日志前缀，保持原有输出
+                task_name=task.name if len(tasks) > 1 else None,
+                cancel_token=cancel_token,
+                sinks=sinks,
+                **buy_kwargs,
+            )
+        except Exception as e:
+            logger.exception(e)
+            logger.error(f"[{task.name}] 任务异常退出: {e}")
+        finally:
+            if not cancel_token.cancelled:
+                task.telemetry.set_phase("已结束")
+
+    threads = [
+        threading.Thread(
+            target=run, args=(task, sinks), name=f"buy-{task.name}", daemon=True
+        )
+        for task, sinks in zip(tasks, sink_groups)
+    ]
+    for t in threads:
+        t.start()
+    if len(tasks) > 1:
+        logger.info(f"已在当前进程启动 {len(tasks)} 个抢票任务")
+    while any(t.is_alive() for t in threads):
+        if cancel_token.wait(JOIN_POLL_INTERVAL):
+            break
+    deadline = time.monotonic() + SHUTDOWN_GRACE
+    for t in threads:
+        t.join(max(deadline - time.monotonic(), 0))
+    for task, t, sinks in zip(tasks, threads, sink_groups):
+        if t.is_alive():
+            logger.warning(f"[{task.name}] 请求未在 {SHUTDOWN_GRACE}s 内返回，放弃等待")
+            sinks.close()
+    # 任务异常退出时未释放的低抖动窗口在这里恢复
+    get_critical_window().restore()
+
+
+async def run_buy_tasks_async(
+    tasks: list[BuyTask],
+    cancel_token: CancelToken | None = None,
+    background: list[Coroutine[None, None, None]] | None = None,
+    **buy_kwargs,
+):
+    """
+    run_buy_tasks 的异步引擎版本：所有任务和 background 中的协程（如心跳）
+    共用一个事件循环，任务全部结束后取消 background 协程
+    """
+    if cancel_token is None:
+        cancel_token = CancelToken()
+
+    async def run(task: BuyTask):
+        try:
+            await abuy(
+                task.tickets_info,
+                telemetry=task.telemetry,
+                task_name=task.name if len(tasks) > 1 else None,
+                cancel_token=cancel_token,
+                **buy_kwargs,
+            )
+        except Exception as e:
+            logger.exception(e)
+            logger.error(f"[{task.name}] 任务异常退出: {e}")
+        finally:
+            if not cancel_token.cancelled:
+                task.telemetry.set_phase("已结束")
+
+    helpers = [asyncio.create_task(coro) for coro in background or []]
+    if len(tasks) > 1:
+        logger.info(f"已在当前进程启动 {len(tasks)} 个抢票任务")
+    await asyncio.gather(*(run(task) for task in tasks))
+    get_critical_window().restore()
+    for helper in helpers:
+        helper.cancel()
+    await asyncio.gather(*helpers, return_exceptions=True)
@@ -0,0 +1,237 @@
+"""
+Master 端的抢票进程监控。
+
+记录每个启动的抢票进程，定期采样 CPU / 内存，开票前异常退出的进程自动重启，
+并支持一键停止全部进程。
+"""
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from loguru import logger
+
+from util import GlobalStatusInstance
+
+SAMPLE_INTERVAL = 2
+MAX_RESTARTS = 3
+# 启动后超过该秒数仍没有心跳，视为可能卡死
+HEARTBEAT_GRACE = 30
+# snapshot 中 CPU（%）和内存（MB）按该粒度取整，页面只在变化明显时刷新
+CPU_BUCKET = 5
+RSS_BUCKET_MB = 10
+
+
+def _bucket(value: float, step: int) -> int:
+    return int(round(value / step) * step)
+
+
+class _ProcessSampler:
+    """采样其他进程的 CPU 和内存，优先使用 psutil，其次读取 /proc"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.last: Optional[tuple[float, float]] = None
+        self.process = None
+        try:
+            import psutil  # 可选依赖
+
+            self.process = psutil.Process(pid)
+            self.process.cpu_percent(None)
+        except Exception:
+            self.process = None
+
+    def sample(self) -> tuple[Optional[float], Optional[int]]:
+        """返回 (cpu 百分比, rss 字节)"""
+        if self.process is not None:
+            try:
+                return self.process.cpu_percent(None), self.process.memory_info().rss
+            except Exception:
+                return None, None
+        try:
+            with open(f"/proc/{self.pid}/stat", "r") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf(
+                "SC_CLK_TCK"
+            )
+            with open(f"/proc/{self.pid}/statm", "r") as f:
+                rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except Exception:
+            return None, None
+        now = time.monotonic()
+        cpu = None
+        if self.last is not None and now > self.last[0]:
+            cpu = (cpu_seconds - self.last[1]) / (now - self.last[0]) * 100
+        self.last = (now, cpu_seconds)
+        return cpu, rss
+
+
+@dataclass
+class SupervisedWorker:
+    name: str
+    launch: Callable[[], subprocess.Popen]
+    proc: subprocess.Popen
+    time_start: Optional[float] = None
+    started_at: float = field(default_factory=time.time)
+    restarts: int = 0
+    exit_code: Optional[int] = None
+    stopped: bool = False
+    cpu: Optional[float] = None
+    rss: Optional[int] = None
+    sampler: Optional[_ProcessSampler] = None
+    # 终端模式的进程不开启网页，也不向 Master 发送心跳
+    heartbeats: bool = True
+
+    def __post_init__(self):
+        self.sampler = _ProcessSampler(self.proc.pid)
+
+    @property
+    def status(self) -> str:
+        if self.exit_code is None:
+            return "运行中"
+        if self.stopped:
+            return "已停止"
+        return "已退出" if self.exit_code == 0 else "异常退出"
+
+
+class WorkerSupervisor:
+    def __init__(self):
+        self.workers: list[SupervisedWorker] = []
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def add(
+        self,
+        name: str,
+        launch: Callable[[], subprocess.Popen],
+        time_start: Optional[float] = None,
+        heartbeats: bool = True,
+    ) -> SupervisedWorker:
+        """heartbeats 为 False 时不按心跳判断进程是否卡死"""
+        worker = SupervisedWorker(
+            name=name,
+            launch=launch,
+            proc=launch(),
+            time_start=time_start,
+            heartbeats=heartbeats,
+        )
+        with self.lock:
+            self.workers.append(worker)
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
+            self.thread.start()
+        return worker
+
+    def _monitor_loop(self):
+        while True:
+            self.check()
+            time.sleep(SAMPLE_INTERVAL)
+
+    def check(self):
+        with self.lock:
+            workers = list(self.workers)
+        for worker in workers:
+            if worker.exit_code is not None:
+                continue
+            code = worker.proc.poll()
+            if code is None:
+                worker.cpu, worker.rss = worker.sampler.sample()  # type: ignore
+                continue
+            worker.exit_code = code
+            logger.info(f"抢票进程 {worker.name} pid={worker.proc.pid} 退出，退出码 {code}")
+            if (
+                code != 0
+                and worker.time_start is not None
+                and time.time() < worker.time_start
+                and worker.restarts < MAX_RESTARTS
+            ):
+                self._restart(worker)
+
+    def _restart(self, worker: SupervisedWorker):
+        worker.restarts += 1
+        logger.warning(
+            f"抢票进程 {worker.name} 在开票前异常退出，第 {worker.restarts} 次重启"
+        )
+        try:
+            worker.proc = worker.launch()
+            worker.sampler = _ProcessSampler(worker.proc.pid)
+            worker.exit_code = None
+            worker.started_at = time.time()
+            worker.cpu = worker.rss = None
+        except Exception as e:
+            logger.exception(e)
+
+    def stop_all(self, timeout: float = 5) -> int:
+        """
+        先通过心跳响应和 SIGTERM 通知进程自行退出，超时后 kill，返回停止的进程数。
+        Windows 上 terminate 会直接结束进程，因此只依赖心跳通知；
+        终端模式的进程没有心跳，超时后直接结束
+        """
+        with self.lock:
+            running = [w for w in self.workers if w.proc.poll() is None]
+            for w in running:
+                # 避免停止后被当作异常退出重启
+                w.time_start = None
+                w.stopped = True
+        GlobalStatusInstance.request_stop()
+        if os.name != "nt":
+            for w in running:
+                w.proc.terminate()
+        deadline = time.monotonic() + timeout
+        for w in running:
+            try:
+                w.proc.wait(max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                w.proc.kill()
+                w.proc.wait()
+        self.check()
+        return len(running)
+
+    def heartbeat_pids(self) -> set[int]:
+        return {
+            e.stats["pid"]
+            for e in GlobalStatusInstance.available_endpoints()
+            if e.stats and "pid" in e.stats
+        }
+
+    def snapshot(self) -> list[dict]:
+        alive = self.heartbeat_pids()
+        now = time.time()
+        rows = []
+        with self.lock:
+            workers = list(self.workers)
+        for w in workers:
+            status = w.status
+            if (
+                status == "运行中"
+                and w.heartbeats
+                and w.proc.pid not in alive
+                and now - w.started_at > HEARTBEAT_GRACE
+            ):
+                status = "无心跳"
+            rows.append(
+                {
+                    "name": w.name,
+                    "pid": w.proc.pid,
+                    "status": status,
+                    "exit_code": w.exit_code,
+                    "restarts": w.restarts,
+                    "cpu": None if w.cpu is None else _bucket(w.cpu, CPU_BUCKET),
+                    "rss": None
+                    if w.rss is None
+                    else _bucket(w.rss / (1024 * 1024), RSS_BUCKET_MB),
+                }
+            )
+        return rows
+
+
+_supervisor: WorkerSupervisor | None = None
+
+
+def get_supervisor() -> WorkerSupervisor:
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = WorkerSupervisor()
+    return _supervisor
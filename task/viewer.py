@@ -0,0 +1,251 @@
+"""
+不依赖 Gradio 的轻量日志查看页面，供 `btb buy --web` 使用。
+
+基于标准库 HTTP 服务和 server-sent events 推送日志。
+"""
+import base64
+import html
+import json
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from loguru import logger
+
+from task.events import BuyEvent, EventKind
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+  body {{ margin: 0; display: flex; flex-direction: column; height: 100vh;
+         background: #111827; color: #e5e7eb; font-family: sans-serif; }}
+  header {{ padding: 12px 16px; display: flex; align-items: center; gap: 16px; }}
+  header h1 {{ font-size: 18px; margin: 0; flex: 1; }}
+  header span {{ font-size: 12px; color: #9ca3af; }}
+  button {{ background: #dc2626; color: white; border: 0; border-radius: 6px;
+           padding: 8px 16px; cursor: pointer; }}
+  #log {{ flex: 1; overflow: auto; margin: 0; padding: 8px 16px;
+         font: 13px/1.4 Consolas, Menlo, monospace; white-space: pre-wrap; }}
+  .ERROR, .CRITICAL {{ color: #f87171; }}
+  .WARNING {{ color: #fbbf24; }}
+  .SUCCESS {{ color: #4ade80; }}
+  #qr {{ padding: 8px 16px; display: flex; align-items: center; gap: 16px;
+        background: #1f2937; }}
+  #qr img {{ width: 200px; height: 200px; image-rendering: pixelated;
+            background: white; }}
+  #qr[hidden] {{ display: none; }}
+</style>
+</head>
+<body>
+<header>
+  <h1>当前抢票 {title}</h1>
+  <span id="state">连接中...</span>
+  <button id="exit">关闭程序</button>
+</header>
+<div id="qr" hidden><img alt="付款二维码"><span></span></div>
+<pre id="log"></pre>
+<script>
+  const log = document.getElementById("log");
+  const state = document.getElementById("state");
+  const source = new EventSource("/events");
+  source.onopen = () => state.textContent = "已连接";
+  source.onerror = () => state.textContent = "连接已断开";
+  source.onmessage = (e) => {{
+    const stick = log.scrollTop + log.clientHeight >= log.scrollHeight - 4;
+    const line = document.createElement("div");
+    const level = (e.data.match(/\\|(\\w+)\\|/) || [])[1];
+    if (level) line.className = level;
+    line.textContent = e.data;
+    log.appendChild(line);
+    while (log.childElementCount > {backlog}) log.removeChild(log.firstChild);
+    if (stick) log.scrollTop = log.scrollHeight;
+  }};
+  source.addEventListener("qr", (e) => {{
+    const data = JSON.parse(e.data);
+    const qr = document.getElementById("qr");
+    qr.querySelector("img").src = data.src;
+    qr.querySelector("span").textContent = data.caption;
+    qr.hidden = false;
+  }});
+  document.getElementById("exit").onclick = () => {{
+    if (!confirm("确定关闭程序？")) return;
+    fetch("/exit", {{ method: "POST" }}).finally(() => {{
+      source.close();
+      state.textContent = "程序已关闭";
+    }});
+  }};
+</script>
+</body>
+</html>
+"""
+
+KEEPALIVE_SECONDS = 15
+
+
+class LogViewer:
+    """
+    作为 loguru 的 sink 接收日志，缓存最近 backlog 行，并推送给所有打开的页面
+    """
+
+    def __init__(
+        self,
+        title: str,
+        on_exit: Callable[[], None],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        backlog: int = 5000,
+    ):
+        self.title = title
+        self.on_exit = on_exit
+        self.backlog = backlog
+        # (序号, SSE 事件名, 数据)
+        self.lines: deque[tuple[int, str, str]] = deque(maxlen=backlog)
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.httpd = ThreadingHTTPServer((host, port or 0), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        host = str(host)
+        if host in ("0.0.0.0", "::"):
+            host = "127.0.0.1"
+        return f"http://{host}:{port}"
+
+    def start(self) -> "LogViewer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def write(self, message):
+        """loguru sink"""
+        with self.cond:
+            for line in str(message).rstrip("\n").split("\n"):
+                self.seq += 1
+                self.lines.append((self.seq, "message", line))
+            self.cond.notify_all()
+
+    def show_image(self, png: bytes, caption: str = ""):
+        """在日志上方显示图片，如付款二维码"""
+        data = json.dumps(
+            {
+                "src": "data:image/png;base64," + base64.b64encode(png).decode(),
+                "caption": caption,
+            }
+        )
+        with self.cond:
+            self.seq += 1
+            self.lines.append((self.seq, "qr", data))
+            self.cond.notify_all()
+
+    def _lines_after(self, seq: int) -> list[tuple[int, str, str]]:
+        return [item for item in self.lines if item[0] > seq]
+
+    def _make_handler(self):
+        viewer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path == "/":
+                    body = PAGE_TEMPLATE.format(
+                        title=html.escape(viewer.title), backlog=viewer.backlog
+                    ).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path == "/events":
+                    self._stream_events()
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path != "/exit":
+                    self.send_error(404)
+                    return
+                self.send_response(204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                self.wfile.flush()
+                viewer.on_exit()
+
+            def _stream_events(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                # 浏览器断线重连时带上最后收到的序号，只补发之后的日志
+                try:
+                    last_seq = int(self.headers.get("Last-Event-ID") or 0)
+                except ValueError:
+                    last_seq = 0
+                try:
+                    while True:
+                        with viewer.cond:
+                            pending = viewer._lines_after(last_seq)
+                            if not pending:
+                                viewer.cond.wait(KEEPALIVE_SECONDS)
+                                pending = viewer._lines_after(last_seq)
+                        if pending:
+                            last_seq = pending[-1][0]
+                            chunk = "".join(
+                                f"id: {seq}\nevent: {event}\ndata: {data}\n\n"
+                                for seq, event, data in pending
+                            )
+                        else:
+                            chunk = ": keepalive\n\n"
+                        self.wfile.write(chunk.encode("utf-8"))
+                        self.wfile.flush()
+                except ConnectionError:
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class ViewerQRSink:
+    """把付款二维码显示在日志页面上"""
+
+    def __init__(self, viewer: LogViewer):
+        self.viewer = viewer
+        # 显示过二维码时，任务结束后保持页面直到用户关闭程序
+        self.shown = False
+
+    def handle(self, event: BuyEvent) -> None:
+        if event.kind == EventKind.PAY_QR:
+            self.shown = True
+            self.viewer.show_image(
+                event.data.png, f"订单 {event.data.order_id}，请使用B站APP扫码付款"
+            )
+
+    def close(self) -> None:
+        pass
+
+
+def start_log_viewer(
+    title: str, on_exit: Callable[[], None], host: str = "127.0.0.1", port: int = 0
+) -> LogViewer:
+    """启动日志页面，并把 INFO 以上的日志接入页面"""
+    viewer = LogViewer(title, on_exit, host=host, port=port).start()
+    logger.add(
+        viewer.write,
+        level="INFO",
+        colorize=False,
+        format="[{time:MM-DD:HH:mm:ss.SSS}]|{level}|{message}",
+    )
+    return viewer
@@ -0,0 +1,289 @@
+"""
+接口响应缓存。
+
+票务目录（project/getV2、infoByDate、场贩商品）在生成配置的过程中会被反复请求，
+这里提供内存 + 磁盘两级的 TTL 缓存，GUI、`btb config` 和 `btb info` 共用。
+项目、场次和票种的响应中带有售卖状态，只缓存 SALE_STATUS_TTL 秒。
+用户名、购票人和地址按账号缓存在内存中，登录或注销时失效。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from util import EXE_PATH, ConfigDB
+
+CACHE_DIR = os.path.join(EXE_PATH, "cache")
+DEFAULT_CATALOGUE_TTL = 300  # 秒
+SALE_STATUS_TTL = 15  # 秒
+
+
+class TTLCache:
+    """
+    值以 JSON 文本保存，每次读取都反序列化出新对象，调用方可以随意修改返回值
+    """
+
+    def __init__(self, ttl: float, cache_dir: Optional[str] = None):
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.memory: dict[str, tuple[float, str]] = {}
+        self.lock = threading.Lock()
+        self.key_locks: dict[str, threading.Lock] = {}
+
+    def _path(self, key: str) -> str:
+        assert self.cache_dir
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+        )
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Any:
+        """ttl 为空时使用缓存的默认 TTL"""
+        with self.lock:
+            entry = self.memory.get(key)
+        if entry is None and self.cache_dir:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                entry = (saved["saved_at"], saved["value"])
+                with self.lock:
+                    self.memory[key] = entry
+            except (OSError, ValueError, KeyError):
+                entry = None
+        if entry is None or time.time() - entry[0] >= (self.ttl if ttl is None else ttl):
+            return None
+        return json.loads(entry[1])
+
+    def set(self, key: str, value: Any) -> None:
+        entry = (time.time(), json.dumps(value, ensure_ascii=False))
+        with self.lock:
+            self.memory[key] = entry
+        if self.cache_dir:
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                # 第一次写入时才创建目录
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"key": key, "saved_at": entry[0], "value": entry[1]}, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"写入缓存失败: {e}")
+
+    def invalidate(self, prefix: str = "") -> None:
+        """删除以 prefix 开头的缓存，默认全部删除"""
+        with self.lock:
+            keys = [k for k in self.memory if k.startswith(prefix)]
+            for k in keys:
+                del self.memory[k]
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    key = json.load(f)["key"]
+                if key.startswith(prefix):
+                    os.remove(path)
+            except (OSError, ValueError, KeyError):
+                continue
+
+    def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Any],
+        refresh: bool = False,
+        cacheable: Callable[[Any], bool] = lambda _: True,
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """
+        同一个 key 同时只会请求一次，其他调用等待并复用结果
+        """
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if not refresh:
+                value = self.get(key, ttl)
+                if value is not None:
+                    return value
+            value = fetch()
+            if cacheable(value):
+                self.set(key, value)
+            return value
+
+
+def get_catalogue_ttl() -> float:
+    value = os.environ.get("BTB_CATALOGUE_CACHE_TTL") or ConfigDB.get(
+        "catalogueCacheTTL"
+    )
+    try:
+        return float(value) if value is not None else DEFAULT_CATALOGUE_TTL
+    except ValueError:
+        return DEFAULT_CATALOGUE_TTL
+
+
+catalogue_cache = TTLCache(
+    ttl=get_catalogue_ttl(), cache_dir=os.path.join(CACHE_DIR, "catalogue")
+)
+
+
+def _is_ok(ret: Any) -> bool:
+    return isinstance(ret, dict) and ret.get("errno", ret.get("code")) == 0
+
+
+def _cached_get(
+    request, key: str, url: str, refresh: bool, ttl: Optional[float] = None
+) -> dict:
+    return catalogue_cache.get_or_fetch(
+        key,
+        lambda: request.get(url=url).json(),
+        refresh=refresh,
+        cacheable=_is_ok,
+        ttl=ttl,
+    )
+
+
+def _sale_status_ttl() -> float:
+    return min(SALE_STATUS_TTL, catalogue_cache.ttl)
+
+
+def fetch_project(request, project_id, refresh: bool = False) -> dict:
+    """project/getV2 的原始响应"""
+    return _cached_get(
+        request,
+        f"project:{project_id}",
+        f"https://show.bilibili.com/api/ticket/project/getV2?version=134&id={project_id}&project_id={project_id}",
+        refresh,
+        _sale_status_ttl(),
+    )
+
+
+def fetch_project_by_date(request, project_id, date: str, refresh: bool = False) -> dict:
+    """project/infoByDate 的原始响应"""
+    return _cached_get(
+        request,
+        f"project:{project_id}:date:{date}",
+        f"https://show.bilibili.com/api/ticket/project/infoByDate?id={project_id}&date={date}",
+        refresh,
+        _sale_status_ttl(),
+    )
+
+
+PREFETCH_WORKERS = 4  # 预取多日票务信息时的最大并发请求数
+_prefetch_executor: Optional[ThreadPoolExecutor] = None
+
+
+def prefetch_project_dates(
+    request, project_id, dates: list[str], refresh: bool = False
+) -> dict[str, Future]:
+    """
+    在后台并发获取每个日期的 infoByDate 并写入缓存。
+    之后调用 fetch_project_by_date 会直接命中缓存，若请求仍在进行则等待其完成而不会重复请求
+    """
+    global _prefetch_executor
+    if _prefetch_executor is None:
+        _prefetch_executor = ThreadPoolExecutor(
+            max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch"
+        )
+    futures = {
+        date: _prefetch_executor.submit(
+            fetch_project_by_date, request, project_id, date, refresh
+        )
+        for date in dates
+    }
+
+    def log_failure(date: str) -> Callable[[Future], None]:
+        def callback(future: Future) -> None:
+            if future.exception() is not None:
+                logger.warning(f"预取 {date} 的票务信息失败: {future.exception()}")
+
+        return callback
+
+    for date, future in futures.items():
+        future.add_done_callback(log_failure(date))
+    return futures
+
+
+def fetch_linkgoods_list(request, project_id, refresh: bool = False) -> dict:
+    return _cached_get(
+        request,
+        f"project:{project_id}:linkgoods",
+        f"https://show.bilibili.com/api/ticket/linkgoods/list?project_id={project_id}&page_type=0",
+        refresh,
+    )
+
+
+def fetch_linkgoods_detail(request, link_id, refresh: bool = False) -> dict:
+    return _cached_get(
+        request,
+        f"linkgoods:{link_id}",
+        f"https://show.bilibili.com/api/ticket/linkgoods/detail?link_id={link_id}",
+        refresh,
+        _sale_status_ttl(),
+    )
+
+
+# 账号相关数据（用户名、购票人、地址）含个人信息，只缓存在内存中
+DEFAULT_ACCOUNT_TTL = 600  # 秒
+
+account_cache = TTLCache(ttl=DEFAULT_ACCOUNT_TTL)
+
+
+def _account_id(request) -> Optional[str]:
+    try:
+        if not request.cookieManager.have_cookies():
+            return None
+        return request.cookieManager.get_cookies_value("DedeUserID")
+    except Exception:
+        return None
+
+
+def invalidate_account(request=None) -> None:
+    """登录、注销或手动刷新时调用，request 为空时清空所有账号的缓存"""
+    account_id = None if request is None else _account_id(request)
+    account_cache.invalidate(f"account:{account_id}:" if account_id else "account:")
+
+
+def _account_get(request, name: str, url: str, refresh: bool, cacheable=_is_ok):
+    account_id = _account_id(request)
+    if account_id is None:
+        # 无法区分账号时不缓存
+        return request.get(url=url).json()
+    return account_cache.get_or_fetch(
+        f"account:{account_id}:{name}",
+        lambda: request.get(url=url).json(),
+        refresh=refresh,
+        cacheable=cacheable,
+    )
+
+
+def fetch_nav(request, refresh: bool = False) -> dict:
+    """x/web-interface/nav 的原始响应，只缓存已登录的结果"""
+    return _account_get(
+        request,
+        "nav",
+        "https://api.bilibili.com/x/web-interface/nav",
+        refresh,
+        cacheable=lambda ret: _is_ok(ret) and bool(ret["data"].get("isLogin")),
+    )
+
+
+def fetch_buyers(request, project_id, refresh: bool = False) -> dict:
+    """buyer/list 的原始响应"""
+    return _account_get(
+        request,
+        f"buyers:{project_id}",
+        f"https://show.bilibili.com/api/ticket/buyer/list?is_default&projectId={project_id}",
+        refresh,
+    )
+
+
+def fetch_addresses(request, refresh: bool = False) -> dict:
+    """addr/list 的原始响应"""
+    return _account_get(
+        request, "addresses", "https://show.bilibili.com/api/ticket/addr/list", refresh
+    )
@@ -1,33 +1,78 @@
 import json
 import time
+from dataclasses import dataclass
+
+import httpx
 import loguru
 import requests
+from util.CancelToken import CancelToken
 from util.CookieManager import CookieManager
 
+DEFAULT_HEADERS = {
+    "accept": "*/*",
+    "accept-language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6,zh-TW;q=0.5,ja;q=0.4",
+    "content-type": "application/x-www-form-urlencoded",
+    "cookie": "",
+    "referer": "https://show.bilibili.com/",
+    "priority": "u=1, i",
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36 Edg/126.0.0.0",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class RequestTimeout:
+    """连接超时和读取超时，单位秒"""
+
+    connect: float
+    read: float
+
+    def for_requests(self) -> tuple[float, float]:
+        return (self.connect, self.read)
+
+    def for_httpx(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read, connect=self.connect)
+
+    def __str__(self) -> str:
+        return f"连接 {self.connect:g}s / 读取 {self.read:g}s"
+
+
+DEFAULT_TIMEOUT = RequestTimeout(connect=10, read=10)
+
+
+def parse_proxy_list(proxy: str) -> list[str]:
+    proxy_list = (
+        [v.strip() for v in proxy.split(",") if len(v.strip()) != 0] if proxy else []
+    )
+    if len(proxy_list) == 0:
+        raise ValueError("at least have none proxy")
+    return proxy_list
+
 
 class BiliRequest:
     def __init__(
-        self, headers=None, cookies=None, cookies_config_path=None, proxy: str = "none"
+        self,
+        headers=None,
+        cookies=None,
+        cookies_config_path=None,
+        proxy: str = "none",
+        telemetry=None,
+        cancel_token: CancelToken | None = None,
+        timeout: RequestTimeout = DEFAULT_TIMEOUT,
+        deadline: float | None = None,
     ):
+        """
+        timeout 为调用时未指定超时时使用的值；
+        deadline 为 time.monotonic() 截止时间，请求超时和 412 冷却都不会超过它
+        """
         self.session = requests.Session()
-        self.proxy_list = (
-            [v.strip() for v in proxy.split(",") if len(v.strip()) != 0]
-            if proxy
-            else []
-        )
-        if len(self.proxy_list) == 0:
-            raise ValueError("at least have none proxy")
+        self.timeout = timeout
+        self.deadline = deadline
+        self.telemetry = telemetry
+        self.cancel_token = cancel_token or CancelToken()
+        self.proxy_list = parse_proxy_list(proxy)
         self.now_proxy_idx = 0
         self.cookieManager = CookieManager(cookies_config_path, cookies)
-        self.headers = headers or {
-            "accept": "*/*",
-            "accept-language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6,zh-TW;q=0.5,ja;q=0.4",
-            "content-type": "application/x-www-form-urlencoded",
-            "cookie": "",
-            "referer": "https://show.bilibili.com/",
-            "priority": "u=1, i",
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36 Edg/126.0.0.0",
-        }
+        self.headers = headers or dict(DEFAULT_HEADERS)
         self.request_count = 0  # 记录请求次数
 
     def count_and_sleep(self, threshold=60, sleep_time=60):
@@ -36,27 +81,51 @@ class BiliRequest:
         """
         self.request_count += 1
         if self.request_count % threshold == 0:
-            loguru.logger.info(f"达到 {threshold} 次请求 412，休眠 {sleep_time} 秒")
-            time.sleep(sleep_time)
+            if self.deadline is not None:
+                sleep_time = max(min(sleep_time, self.deadline - time.monotonic()), 0)
+            loguru.logger.info(f"达到 {threshold} 次请求 412，休眠 {sleep_time:g} 秒")
+            if self.telemetry is not None:
+                phase = self.telemetry.phase
+                self.telemetry.set_phase("412冷却")
+                self.telemetry.record_attempt(self.telemetry.attempt, 412)
+            cancelled = self.cancel_token.wait(sleep_time)
+            if self.telemetry is not None:
+                self.telemetry.set_phase(phase)
+            if cancelled:
+                self.cancel_token.check()
 
     def clear_request_count(self):
         self.request_count = 0
 
-    def get(self, url, data=None, isJson=False):
+    def _bounded(self, timeout: RequestTimeout) -> RequestTimeout:
+        """超时不超过距离 deadline 的剩余时间，已过 deadline 时不再发起请求"""
+        if self.deadline is None:
+            return timeout
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout("已超过截止时间")
+        return RequestTimeout(min(timeout.connect, remaining), min(timeout.read, remaining))
+
+    def get(self, url, data=None, isJson=False, timeout: RequestTimeout | None = None):
+        self.cancel_token.check()
+        timeout = timeout or self.timeout
+        bounded = self._bounded(timeout)
         self.headers["cookie"] = self.cookieManager.get_cookies_str()
         if isJson:
             self.headers["Content-Type"] = "application/json"
             data = json.dumps(data)
         else:
             self.headers["Content-Type"] = "application/x-www-form-urlencoded"
-        response = self.session.get(url, data=data, headers=self.headers, timeout=10)
+        response = self.session.get(
+            url, data=data, headers=self.headers, timeout=bounded.for_requests()
+        )
         if response.status_code == 412:
             self.count_and_sleep()
             self.switch_proxy()
             loguru.logger.warning(
                 f"412风控，切换代理到 {self.proxy_list[self.now_proxy_idx]}"
             )
-            return self.get(url, data, isJson)
+            return self.get(url, data, isJson, timeout)
         response.raise_for_status()
         self.clear_request_count()
         if response.json().get("msg", "") == "请先登录":
@@ -75,33 +144,151 @@ class BiliRequest:
                 "https": current_proxy,
             }
 
-    def post(self, url, data=None, isJson=False):
+    def post(self, url, data=None, isJson=False, timeout: RequestTimeout | None = None):
+        self.cancel_token.check()
+        timeout = timeout or self.timeout
+        bounded = self._bounded(timeout)
         self.headers["cookie"] = self.cookieManager.get_cookies_str()
         if isJson:
             self.headers["content-type"] = "application/json"
             data = json.dumps(data)
         else:
             self.headers["content-type"] = "application/x-www-form-urlencoded"
-        response = self.session.post(url, data=data, headers=self.headers, timeout=10)
+        response = self.session.post(
+            url, data=data, headers=self.headers, timeout=bounded.for_requests()
+        )
         if response.status_code == 412:
             self.count_and_sleep()
             self.switch_proxy()
             loguru.logger.warning(
                 f"412风控，切换代理到 {self.proxy_list[self.now_proxy_idx]}"
             )
-            return self.post(url, data, isJson)
+            return self.post(url, data, isJson, timeout)
         response.raise_for_status()
         self.clear_request_count()
         if response.json().get("msg", "") == "请先登录":
             raise RuntimeError("当前未登录，请重新登陆")
         return response
 
-    def get_request_name(self):
+    def get_request_name(self, refresh=False):
+        from util.ApiCache import fetch_nav
+
         try:
             if not self.cookieManager.have_cookies():
                 loguru.logger.warning("获取用户名失败，请重新登录")
                 return "未登录"
-            result = self.get("https://api.bilibili.com/x/web-interface/nav").json()
+            result = fetch_nav(self, refresh=refresh)
             return result["data"]["uname"]
         except Exception as e:
             return "未登录"
+
+
+class AsyncBiliRequest:
+    """
+    BiliRequest 的 httpx 异步版本，供异步抢票引擎使用。
+    请求通过 cancel_token.race 发出，任务取消时立即中止正在进行的请求
+    """
+
+    def __init__(
+        self,
+        headers=None,
+        cookies=None,
+        cookies_config_path=None,
+        proxy: str = "none",
+        telemetry=None,
+        cancel_token: CancelToken | None = None,
+        timeout: RequestTimeout = DEFAULT_TIMEOUT,
+    ):
+        self.timeout = timeout
+        self.telemetry = telemetry
+        self.cancel_token = cancel_token or CancelToken()
+        self.proxy_list = parse_proxy_list(proxy)
+        self.now_proxy_idx = 0
+        self.cookieManager = CookieManager(cookies_config_path, cookies)
+        self.headers = headers or dict(DEFAULT_HEADERS)
+        self.request_count = 0  # 记录请求次数
+        self.client = self._new_client()
+
+    def _new_client(self) -> httpx.AsyncClient:
+        current_proxy = self.proxy_list[self.now_proxy_idx]
+        return httpx.AsyncClient(
+            proxy=None if current_proxy == "none" else current_proxy,
+            timeout=self.timeout.for_httpx(),
+        )
+
+    async def count_and_sleep(self, threshold=60, sleep_time=60):
+        self.request_count += 1
+        if self.request_count % threshold == 0:
+            loguru.logger.info(f"达到 {threshold} 次请求 412，休眠 {sleep_time} 秒")
+            if self.telemetry is not None:
+                phase = self.telemetry.phase
+                self.telemetry.set_phase("412冷却")
+                self.telemetry.record_attempt(self.telemetry.attempt, 412)
+            cancelled = await self.cancel_token.wait_async(sleep_time)
+            if self.telemetry is not None:
+                self.telemetry.set_phase(phase)
+            if cancelled:
+                self.cancel_token.check()
+
+    def clear_request_count(self):
+        self.request_count = 0
+
+    async def switch_proxy(self):
+        # 只有一个代理时保留原有连接池，避免 412 后重新握手
+        if len(self.proxy_list) <= 1:
+            return
+        self.now_proxy_idx = (self.now_proxy_idx + 1) % len(self.proxy_list)
+        old_client, self.client = self.client, self._new_client()
+        await old_client.aclose()
+
+    async def request(
+        self, method, url, data=None, isJson=False, timeout: RequestTimeout | None = None
+    ) -> httpx.Response:
+        # httpx 不接受首尾带空白的请求头
+        headers = {
+            **self.headers,
+            "cookie": self.cookieManager.get_cookies_str().strip(),
+        }
+        content: str | None = None
+        form: dict | None = None
+        if isJson:
+            headers["content-type"] = "application/json"
+            content = json.dumps(data)
+        else:
+            headers["content-type"] = "application/x-www-form-urlencoded"
+            form = data
+        response = await self.cancel_token.race(
+            self.client.request(
+                method,
+                url,
+                content=content,
+                data=form,
+                headers=headers,
+                timeout=(timeout or self.timeout).for_httpx(),
+            )
+        )
+        if response.status_code == 412:
+            await self.count_and_sleep()
+            await self.switch_proxy()
+            loguru.logger.warning(
+                f"412风控，切换代理到 {self.proxy_list[self.now_proxy_idx]}"
+            )
+            return await self.request(method, url, data, isJson, timeout)
+        response.raise_for_status()
+        self.clear_request_count()
+        if response.json().get("msg", "") == "请先登录":
+            raise RuntimeError("当前未登录，请重新登陆")
+        return response
+
+    async def get(
+        self, url, data=None, isJson=False, timeout: RequestTimeout | None = None
+    ) -> httpx.Response:
+        return await self.request("GET", url, data, isJson, timeout)
+
+    async def post(
+        self, url, data=None, isJson=False, timeout: RequestTimeout | None = None
+    ) -> httpx.Response:
+        return await self.request("POST", url, data, isJson, timeout)
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,121 @@
+"""
+抢票任务的取消信号。
+
+等待开票、重试间隔、412 冷却等等待都通过 CancelToken.wait 进行，取消后立即返回；
+正在进行的请求受超时限制，返回后在下一个检查点退出。
+协程中使用 wait_async / race，异步引擎取消时会直接中止正在进行的请求。
+"""
+import asyncio
+import signal
+import threading
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class Cancelled(Exception):
+    """任务已被取消"""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self._async_event: Optional[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = None
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "已取消") -> bool:
+        """只有第一次调用生效，返回是否由本次调用取消"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.exception(e)
+        return True
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """注册取消时的回调，已取消时立即调用。回调应当很快返回"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, seconds: Optional[float] = None) -> bool:
+        """最多等待 seconds 秒，返回是否已取消"""
+        if seconds is not None and seconds <= 0:
+            return self.cancelled
+        return self._event.wait(seconds)
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def _loop_event(self) -> asyncio.Event:
+        """当前事件循环中与取消状态同步的 asyncio.Event，每个循环只注册一次回调"""
+        loop = asyncio.get_running_loop()
+        if self._async_event is None or self._async_event[0] is not loop:
+            event = asyncio.Event()
+            self._async_event = (loop, event)
+
+            def wake():
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(event.set)
+
+            self.on_cancel(wake)
+        return self._async_event[1]
+
+    async def wait_async(self, seconds: Optional[float] = None) -> bool:
+        """wait 的协程版本"""
+        if self.cancelled:
+            return True
+        if seconds is not None and seconds <= 0:
+            return False
+        try:
+            await asyncio.wait_for(self._loop_event().wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self.cancelled
+
+    async def race(self, awaitable: Awaitable[T]) -> T:
+        """等待 awaitable，期间被取消则中止它并抛出 Cancelled"""
+        self.check()
+        task = asyncio.ensure_future(awaitable)
+        cancel_wait = asyncio.ensure_future(self._loop_event().wait())
+        try:
+            await asyncio.wait({task, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            cancel_wait.cancel()
+            pending = not task.done()
+            if pending:
+                task.cancel()
+        if pending:
+            raise Cancelled(self.reason)
+        return task.result()
+
+
+def install_signal_handlers(token: CancelToken) -> None:
+    """
+    SIGINT / SIGTERM 触发取消，第二次收到信号时按 Ctrl+C 处理立即退出。
+    只能在主线程调用
+    """
+
+    def handler(signum, frame):
+        if not token.cancel(f"收到 {signal.Signals(signum).name}"):
+            raise KeyboardInterrupt
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, handler)
@@ -0,0 +1,272 @@
+"""
+票务目录模型。
+
+project/getV2、infoByDate 和场贩商品详情的响应在这里解析成紧凑的记录，
+按 sku_id、screen_id 和日期建立索引，GUI、`btb config` 和 `btb info` 共用。
+"""
+from datetime import datetime
+from typing import Optional
+
+# 销售状态映射
+SALES_FLAG_MAP = {
+    1: "不可售",
+    2: "预售",
+    3: "停售",
+    4: "售罄",
+    5: "不可用",
+    6: "库存紧张",
+    8: "暂时售罄",
+    9: "不在白名单",
+    101: "未开始",
+    102: "已结束",
+    103: "未完成",
+    105: "下架",
+    106: "已取消",
+}
+
+
+def format_timestamp(ts: int) -> str:
+    try:
+        return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return "未知"
+
+
+class Screen:
+    __slots__ = (
+        "id",
+        "name",
+        "project_id",
+        "is_hot_project",
+        "express_fee",
+        "link_id",
+        "date",
+        "tickets",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        project_id: int,
+        is_hot_project: bool,
+        express_fee: int,
+        link_id: Optional[int] = None,
+        date: Optional[str] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.project_id = project_id
+        self.is_hot_project = is_hot_project
+        self.express_fee = express_fee
+        self.link_id = link_id
+        self.date = date
+        self.tickets: list[Ticket] = []
+
+
+class Ticket:
+    __slots__ = (
+        "sku_id",
+        "desc",
+        "price",
+        "sale_start",
+        "sale_flag",
+        "clickable",
+        "screen",
+    )
+
+    def __init__(self, raw: dict, screen: Screen):
+        self.sku_id: int = raw["id"]
+        self.desc: str = raw.get("desc", "未知")
+        # 价格已包含运费，单位为分
+        self.price: int = raw.get("price", 0) + screen.express_fee
+        self.sale_start: str = raw.get("sale_start", "未知")
+        self.sale_flag: Optional[int] = raw.get("sale_flag_number")
+        self.clickable: bool = bool(raw.get("clickable"))
+        self.screen = screen
+
+    @property
+    def status(self) -> str:
+        if self.sale_flag in SALES_FLAG_MAP:
+            return SALES_FLAG_MAP[self.sale_flag]
+        return "可购买" if self.clickable else "不可购买"
+
+    @property
+    def label(self) -> str:
+        return (
+            f"{self.screen.name} - {self.desc} - ￥{self.price / 100:.2f} - "
+            f"{self.status} - 【起售时间：{self.sale_start}】"
+        )
+
+    def order_fields(self, count: int) -> dict:
+        """抢票配置中与票种相关的字段"""
+        fields = {
+            "screen_id": self.screen.id,
+            "project_id": self.screen.project_id,
+            "is_hot_project": self.screen.is_hot_project,
+            "sku_id": self.sku_id,
+            "order_type": 1,
+            "pay_money": self.price * count,
+        }
+        if self.screen.link_id is not None:
+            fields["link_id"] = self.screen.link_id
+        return fields
+
+
+class Catalogue:
+    __slots__ = (
+        "project_id",
+        "name",
+        "is_hot_project",
+        "has_eticket",
+        "start_time",
+        "end_time",
+        "venue_name",
+        "venue_address",
+        "sales_dates",
+        "screens",
+        "_by_sku",
+        "_by_screen",
+        "_by_date",
+        "_linkgoods",
+        "selected_date",
+    )
+
+    def __init__(self, data: dict):
+        """data 为 project/getV2 响应中的 data"""
+        self.project_id: int = data["id"]
+        self.name: str = data["name"]
+        self.is_hot_project: bool = bool(data.get("hotProject"))
+        self.has_eticket: bool = bool(data.get("has_eticket"))
+        self.start_time: int = data.get("start_time", 0)
+        self.end_time: int = data.get("end_time", 0)
+        venue_info = data.get("venue_info") or {}
+        self.venue_name: str = venue_info.get("name", "未知")
+        self.venue_address: str = venue_info.get("address_detail", "未知")
+        self.sales_dates: list[str] = [t["date"] for t in data.get("sales_dates", [])]
+        self.screens: list[Screen] = []
+        self._by_sku: dict[int, Ticket] = {}
+        self._by_screen: dict[int, Screen] = {}
+        # 项目主体和场贩商品的票记在 None 下
+        self._by_date: dict[Optional[str], list[Ticket]] = {None: []}
+        # 场贩商品不按日期售卖，每个日期的选项中都包含
+        self._linkgoods: list[Ticket] = []
+        # 界面上已加载的日期，场贩商品陆续到达时按它刷新选票列表
+        self.selected_date: Optional[str] = None
+        self.add_screens(data.get("screen_list", []), self.project_id)
+
+    def add_screens(
+        self,
+        screen_list: list[dict],
+        project_id: int,
+        link_id: Optional[int] = None,
+        date: Optional[str] = None,
+    ) -> list[Ticket]:
+        added = []
+        date_tickets = self._by_date.setdefault(date, [])
+        for raw_screen in screen_list:
+            if "name" not in raw_screen:
+                #  TODO 应该是跳转到会员购了
+                continue
+            express_fee = 0
+            # 电子票免费；-2 === t ? "快递到付" : -1 === t ? "快递包邮" : "快递配送"
+            if not self.has_eticket and raw_screen.get("express_fee", 0) >= 0:
+                express_fee = raw_screen.get("express_fee", 0)
+            screen = Screen(
+                id=raw_screen["id"],
+                name=raw_screen["name"],
+                project_id=project_id,
+                is_hot_project=self.is_hot_project,
+                express_fee=express_fee,
+                link_id=raw_screen.get("link_id", link_id),
+                date=date,
+            )
+            for raw_ticket in raw_screen.get("ticket_list", []):
+                ticket = Ticket(raw_ticket, screen)
+                screen.tickets.append(ticket)
+                self._by_sku[ticket.sku_id] = ticket
+                added.append(ticket)
+            self.screens.append(screen)
+            self._by_screen[screen.id] = screen
+        date_tickets.extend(added)
+        return added
+
+    def add_linkgoods(self, detail: dict, link_id: int) -> list[Ticket]:
+        """detail 为 linkgoods/detail 响应中的 data"""
+        added = self.add_screens(detail["specs_list"], detail["item_id"], link_id=link_id)
+        self._linkgoods.extend(added)
+        return added
+
+    def add_date(self, date: str, data: dict) -> list[Ticket]:
+        """data 为 project/infoByDate 响应中的 data，重复调用会覆盖该日期的票"""
+        for ticket in self._by_date.pop(date, []):
+            if self._by_sku.get(ticket.sku_id) is ticket:
+                del self._by_sku[ticket.sku_id]
+        for screen in self.screens:
+            if screen.date == date and self._by_screen.get(screen.id) is screen:
+                del self._by_screen[screen.id]
+        self.screens = [s for s in self.screens if s.date != date]
+        return self.add_screens(data.get("screen_list", []), self.project_id, date=date)
+
+    def has_date(self, date: str) -> bool:
+        return date in self._by_date
+
+    def tickets(self, date: Optional[str] = None) -> list[Ticket]:
+        return list(self._by_date.get(date, []))
+
+    def by_sku(self, sku_id: int) -> Optional[Ticket]:
+        return self._by_sku.get(sku_id)
+
+    def by_screen(self, screen_id: int) -> Optional[Screen]:
+        return self._by_screen.get(screen_id)
+
+    def choices(self, date: Optional[str] = None) -> list[tuple[str, int]]:
+        """下拉框选项，值为 sku_id，指定日期时附带场贩商品"""
+        tickets = self._by_date.get(date, [])
+        if date is not None:
+            tickets = tickets + self._linkgoods
+        return [(t.label, t.sku_id) for t in tickets]
+
+    @property
+    def summary(self) -> str:
+        return (
+            f"展会名称：{self.name}\n"
+            f"开展时间：{format_timestamp(self.start_time)} - {format_timestamp(self.end_time)}\n"
+            f"场馆地址：{self.venue_name} {self.venue_address}"
+        )
+
+
+def build_buy_config(
+    request,
+    username: str,
+    catalogue: Catalogue,
+    ticket: Ticket,
+    buyers: list[dict],
+    buyer_name: str,
+    buyer_tel: str,
+    address: dict,
+) -> dict:
+    """生成 `btb buy` 使用的配置"""
+    detail = f"{username}-{catalogue.name}-{ticket.label}"
+    for p in buyers:
+        detail += f"-{p['name']}"
+    return {
+        "username": username,
+        "detail": detail,
+        "count": len(buyers),
+        **ticket.order_fields(len(buyers)),
+        "buyer_info": buyers,
+        "buyer": buyer_name,
+        "tel": buyer_tel,
+        "deliver_info": {
+            "name": address["name"],
+            "tel": address["phone"],
+            "addr_id": address["id"],
+            "addr": address.get("prov", "")
+            + address.get("city", "")
+            + address.get("area", "")
+            + address.get("addr", ""),
+        },
+        "cookies": request.cookieManager.get_cookies(),
+        "phone": request.cookieManager.get_config_value("phone", ""),
+    }
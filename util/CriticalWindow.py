@@ -0,0 +1,211 @@
+"""
+开票前后的低抖动运行模式（`btb buy --low_jitter`）。
+
+开票前 LEAD_SECONDS 秒进入关键窗口：冻结已有对象并关闭自动 GC、提高进程优先级、
+把各任务的下单线程分别绑定到不同的 CPU，预检等非必要的后台工作不再进行；
+下单结束或超过 HOLD_SECONDS 后恢复原状。每一项都尽力而为，系统不允许时跳过并说明原因。
+同一进程内的多个任务共用一个窗口，最后一个任务离开时恢复。
+绑定 CPU 时从 worker_index 开始依次分配，多个 worker 进程因此错开。
+"""
+import gc
+import os
+import sys
+import threading
+from typing import Callable, Optional
+
+from loguru import logger
+
+# 开票前多少秒进入关键窗口
+LEAD_SECONDS = 5.0
+# 关键窗口最长保持时间，超过后无论下单是否结束都恢复
+HOLD_SECONDS = 60.0
+NICE_BOOST = 5
+
+
+def _thread_ids() -> list[int]:
+    """Linux 上优先级和 CPU 亲和性按线程生效，需要逐个设置"""
+    try:
+        return [int(tid) for tid in os.listdir("/proc/self/task")]
+    except OSError:
+        return [0]
+
+
+def _freeze_gc() -> Callable[[], None]:
+    was_enabled = gc.isenabled()
+    gc.freeze()
+    gc.disable()
+
+    def restore():
+        gc.unfreeze()
+        if was_enabled:
+            gc.enable()
+
+    return restore
+
+
+def _raise_priority() -> Callable[[], None]:
+    if sys.platform == "win32":
+        import psutil  # 可选依赖
+
+        process = psutil.Process()
+        old_class = process.nice()
+        process.nice(psutil.HIGH_PRIORITY_CLASS)
+        return lambda: process.nice(old_class)
+
+    old = {tid: os.getpriority(os.PRIO_PROCESS, tid) for tid in _thread_ids()}
+    for tid, nice in old.items():
+        os.setpriority(os.PRIO_PROCESS, tid, max(nice - NICE_BOOST, -20))
+
+    def restore():
+        for tid, nice in old.items():
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, nice)
+            except OSError:
+                pass  # 线程已退出
+
+    return restore
+
+
+def _pin_thread(cpu: int) -> Callable[[], None]:
+    """把当前线程绑定到 cpu，Linux 上亲和性按线程生效"""
+    tid = threading.get_native_id()
+    old = os.sched_getaffinity(tid)
+    os.sched_setaffinity(tid, {cpu})
+
+    def restore():
+        try:
+            os.sched_setaffinity(tid, old)
+        except OSError:
+            pass  # 线程已退出
+
+    return restore
+
+
+MEASURES: tuple[tuple[str, Callable[[], Callable[[], None]]], ...] = (
+    ("冻结并关闭 GC", _freeze_gc),
+    ("提高优先级", _raise_priority),
+)
+
+
+class CriticalWindowLease:
+    """一个任务对关键窗口的占用，release 可以重复调用"""
+
+    def __init__(self, window: "CriticalWindow", generation: int, summary: str):
+        self.window = window
+        self.generation = generation
+        self.summary = summary
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.window._leave(self.generation)
+
+
+class CriticalWindow:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._depth = 0
+        # 每次进入加一，超时恢复后旧的 lease 不再影响新的窗口
+        self._generation = 0
+        self._summary = ""
+        self._restores: list[tuple[str, Callable[[], None]]] = []
+        self._timer: Optional[threading.Timer] = None
+        # 窗口开始时可用的 CPU，以及本窗口内已绑定的线程
+        self._cpus: list[int] = []
+        self._pinned: set[int] = set()
+        # worker 进程的序号，由 `btb buy --worker_index` 设置
+        self.worker_index = 0
+
+    @property
+    def active(self) -> bool:
+        return self._depth > 0
+
+    def enter(self, hold: float = HOLD_SECONDS) -> CriticalWindowLease:
+        """进入关键窗口，已在窗口内时只增加计数"""
+        with self._lock:
+            self._depth += 1
+            if self._depth == 1:
+                self._generation += 1
+                applied, skipped = [], []
+                for name, apply in MEASURES:
+                    try:
+                        self._restores.append((name, apply()))
+                        applied.append(name)
+                    except Exception as e:
+                        skipped.append(f"{name}（{e!r}）")
+                self._summary = f"已{'、'.join(applied)}" if applied else "没有生效的措施"
+                if skipped:
+                    self._summary += f"；跳过{'、'.join(skipped)}"
+                if hasattr(os, "sched_getaffinity"):
+                    self._cpus = sorted(os.sched_getaffinity(0))
+                self._timer = threading.Timer(hold, self._expire, args=(hold,))
+                self._timer.daemon = True
+                self._timer.start()
+            return CriticalWindowLease(
+                self, self._generation, self._summary + self._pin_current()
+            )
+
+    def _pin_current(self) -> str:
+        """持有 _lock 时调用，绑定调用 enter 的线程，返回说明"""
+        tid = threading.get_native_id()
+        if tid in self._pinned:
+            # 异步引擎的多个任务共用事件循环线程
+            return ""
+        if not hasattr(os, "sched_setaffinity"):
+            return "；跳过绑定 CPU（当前系统不支持按线程设置）"
+        if len(self._cpus) < 2:
+            return "；跳过绑定 CPU（只有一个可用 CPU）"
+        cpu = self._cpus[(self.worker_index + len(self._pinned)) % len(self._cpus)]
+        try:
+            self._restores.append(("绑定 CPU", _pin_thread(cpu)))
+        except Exception as e:
+            return f"；跳过绑定 CPU（{e!r}）"
+        self._pinned.add(tid)
+        return f"；下单线程绑定到 CPU {cpu}"
+
+    def _leave(self, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation or self._depth == 0:
+                return
+            self._depth -= 1
+            if self._depth == 0:
+                self._restore()
+
+    def restore(self) -> None:
+        """立即恢复正常模式，供所有任务结束后兜底调用"""
+        with self._lock:
+            if self._depth:
+                self._depth = 0
+                self._restore()
+
+    def _expire(self, hold: float) -> None:
+        with self._lock:
+            if self._depth:
+                logger.warning(f"关键窗口超过 {hold:g}s，恢复正常模式")
+                self._depth = 0
+                self._restore()
+
+    def _restore(self) -> None:
+        """持有 _lock 时调用"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for name, restore in reversed(self._restores):
+            try:
+                restore()
+            except Exception as e:
+                logger.warning(f"恢复{name}失败: {e!r}")
+        self._restores.clear()
+        self._pinned.clear()
+        logger.info("已退出关键窗口，恢复正常模式")
+
+
+_critical_window: Optional[CriticalWindow] = None
+
+
+def get_critical_window() -> CriticalWindow:
+    global _critical_window
+    if _critical_window is None:
+        _critical_window = CriticalWindow()
+    return _critical_window
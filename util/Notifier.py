@@ -2,9 +2,13 @@ from abc import ABC, abstractmethod
 import threading
 import loguru
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
 from dataclasses import dataclass
 from typing import Optional
 
+# 进程内所有抢票任务共用的推送线程数，Ntfy 等重复推送会长时间占用一个线程
+NOTIFY_WORKERS = 16
+
 class NotifierBase(ABC):
     """推送器基类。
 
@@ -37,6 +41,8 @@ class NotifierBase(ABC):
         self.duration_minutes = duration_minutes
         self.stop_event = threading.Event()
         self.thread = threading.Thread(target=self.run, daemon=False)
+        # 通过 NotifierDispatcher 提交时的执行结果
+        self.future: Optional[Future] = None
 
     def run(self):
         """线程运行函数，实现间隔发送通知"""
@@ -58,7 +64,7 @@ class NotifierBase(ABC):
 
             except Exception as e:
                 loguru.logger.error(f"通知发送失败: {e}")
-                time.sleep(self.interval_seconds)  # 发生错误时等待重试
+                self.stop_event.wait(self.interval_seconds)  # 发生错误时等待重试
 
         loguru.logger.info(f"通知发送成功")
     
@@ -68,9 +74,13 @@ class NotifierBase(ABC):
             self.thread = threading.Thread(target=self.run, daemon=False)
             self.thread.start()
     
-    def stop(self):
+    def stop(self, wait: bool = True):
         self.stop_event.set()
-        self.thread.join(timeout=3)
+        if wait:
+            if self.future is not None:
+                wait_futures([self.future], timeout=3)
+            elif self.thread.is_alive():
+                self.thread.join(timeout=3)
 
     @abstractmethod
     def send_message(self, title, message):
@@ -104,6 +114,35 @@ class NotifierConfig:
             audio_path=ConfigDB.get("audioPath")
         )
 
+class NotifierDispatcher:
+    """进程内共用的推送线程池，同一进程中所有任务的推送都提交到这里
+
+    线程按需创建并复用，进程退出前会等待已提交的推送完成
+    """
+
+    def __init__(self, max_workers: int = NOTIFY_WORKERS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="notify"
+        )
+
+    def submit(self, notifier: NotifierBase) -> Future:
+        notifier.stop_event.clear()
+        notifier.future = self._executor.submit(notifier.run)
+        return notifier.future
+
+
+_dispatcher: Optional[NotifierDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_notifier_dispatcher() -> NotifierDispatcher:
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotifierDispatcher()
+        return _dispatcher
+
+
 class NotifierManager():
     def __init__(self):
         self.notifier_dict:dict[str,NotifierBase] = {}
@@ -135,9 +174,14 @@ class NotifierManager():
         for notifer in self.notifier_dict.values():
             notifer.start()
 
-    def stop_all(self):
+    def dispatch_all(self, dispatcher: Optional[NotifierDispatcher] = None) -> list[Future]:
+        """提交到共用的推送线程池，不再为每个推送器单独创建线程"""
+        dispatcher = dispatcher or get_notifier_dispatcher()
+        return [dispatcher.submit(notifer) for notifer in self.notifier_dict.values()]
+
+    def stop_all(self, wait: bool = True):
         for notifer in self.notifier_dict.values():
-            notifer.stop()
+            notifer.stop(wait)
 
     def start_notifier(self, name: str):
         notifer = self.notifier_dict.get(name)
@@ -73,7 +73,7 @@ class RepeatedNotifier(threading.Thread):
 
             except Exception as e:
                 loguru.logger.error(f"重复通知发送失败: {e}")
-                time.sleep(self.interval_seconds)  # 发生错误时仍然等待
+                self.stop_event.wait(self.interval_seconds)  # 发生错误时仍然等待
 
         # 线程结束时从活动线程列表中移除
         with _thread_lock:
@@ -298,6 +298,6 @@ class NtfyNotifier(NotifierBase):
 
             except Exception as e:
                 loguru.logger.error(f"Ntfy重复通知发送失败: {e}")
-                time.sleep(self.interval_seconds)  # 发生错误时仍然等待
+                self.stop_event.wait(self.interval_seconds)  # 发生错误时仍然等待
 
         loguru.logger.info(f"Ntfy重复通知完成，共发送了{count}条通知")
@@ -1,14 +1,50 @@
 import re
+import threading
 import time
 import requests
 import loguru
-from typing import List, Dict, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from util.Telemetry import percentile
+
+PROFILE_URL = "https://api.bilibili.com/x/web-interface/nav"
+PROFILE_CACHE_TTL = 60  # 采样结果缓存时间（秒）
+PROFILE_DEADLINE = 30  # 整个采样过程的最长时间（秒）
+# 并发采样的代理数：从 PROFILE_MIN_WORKERS 开始，成功时逐个增加，失败时减半，
+# 避免本机出口被大量并发连接占满而拉高所有代理的延迟
+PROFILE_MIN_WORKERS = 2
+PROFILE_MAX_WORKERS = 16
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36 Edg/126.0.0.0"
+
+# (proxy, samples, timeout) -> 采样结果，结果中带有 tested_at 时间戳
+_profile_cache: Dict[tuple, Dict[str, Any]] = {}
+_profile_cache_lock = threading.Lock()
+
+
+def _jitter(values: List[float]) -> float:
+    """相邻两次采样差值的平均值"""
+    if len(values) < 2:
+        return 0.0
+    diffs = [abs(b - a) for a, b in zip(values, values[1:])]
+    return sum(diffs) / len(diffs)
+
+
 # 代理连通性测试工具
 class ProxyTester:
     
     def __init__(self, timeout: int = 10):
         self.timeout = timeout
+
+    def _new_session(self, proxy: str) -> requests.Session:
+        session = requests.Session()
+        session.trust_env = False
+        if proxy == "none" or proxy.lower() == "direct":
+            session.proxies = {}
+        else:
+            session.proxies = {"http": proxy, "https": proxy}
+        session.headers["user-agent"] = USER_AGENT
+        return session
     
     # 测试单个代理连通性
     def test_single_proxy(self, proxy: str) -> Dict[str, Any]:
@@ -74,7 +110,7 @@ class ProxyTester:
         
         return result
     
-    def _get_ip_info(self, session) -> str:
+    def _get_ip_info(self, session, timeout: float = 3) -> str:
         """获取出口IP信息"""
         # 服务列表：优先详细信息，然后降级到基础服务
         ip_services = [
@@ -90,14 +126,25 @@ class ProxyTester:
             }
         ]
         
-        for service in ip_services:
-            try:
-                ip_response = session.get(service['url'], timeout=3)
-                if ip_response.status_code == 200:
-                    ip_data = ip_response.json()
-                    return service['parser'](ip_data)
-            except Exception:
-                continue
+        def query(service):
+            ip_response = session.get(service['url'], timeout=timeout)
+            if ip_response.status_code != 200:
+                return None
+            return service['parser'](ip_response.json())
+
+        # 两个服务同时查询，取最先成功的结果，不等待较慢的服务
+        executor = ThreadPoolExecutor(max_workers=len(ip_services))
+        try:
+            futures = [executor.submit(query, service) for service in ip_services]
+            for future in as_completed(futures):
+                try:
+                    ip_info = future.result()
+                except Exception:
+                    continue
+                if ip_info:
+                    return ip_info
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
         
         return "IP获取失败"
     
@@ -195,8 +242,238 @@ class ProxyTester:
         output.append(f"测试统计: {success_count}/{len(results)} 个代理可用")
         return "\n".join(output)
 
+    # 多次采样测试单个代理延迟（复用同一连接）
+    def profile_single_proxy(
+        self, proxy: str, samples: int = 5, deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        第一次请求包含 TCP/TLS/代理握手，后续请求复用连接，
+        因此 connect_time ≈ 首次耗时 - 复用连接的 p50，TTFB 统计只使用复用连接的采样。
+        出口IP在采样结束后查询，避免额外连接影响延迟；deadline 为 time.monotonic() 时间，
+        到时不再发起新的请求。
+        """
+        samples = max(int(samples), 1)
+        if deadline is None:
+            deadline = time.monotonic() + PROFILE_DEADLINE
+        result: Dict[str, Any] = {
+            "proxy": "直连" if proxy.lower() in ("none", "direct") else proxy,
+            "status": "failed",
+            "samples": samples,
+            "ok_samples": 0,
+            "connect_time": None,
+            "min": None,
+            "p50": None,
+            "p95": None,
+            "jitter": None,
+            "error": None,
+            "ip_info": None,
+            "tested_at": time.time(),
+            "complete": True,
+        }
+        if result["proxy"] != "直连" and not self._validate_proxy_format(proxy):
+            result["error"] = "代理格式无效"
+            return result
+
+        session = self._new_session(proxy)
+        cold_ms: Optional[float] = None
+        ttfb: List[float] = []
+        status_code = None
+        try:
+            # 首次请求 + samples 次复用连接请求
+            for i in range(samples + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    result["complete"] = False
+                    result["error"] = result["error"] or "超过采样总时限"
+                    break
+                try:
+                    response = session.get(PROFILE_URL, timeout=min(self.timeout, remaining))
+                except requests.exceptions.Timeout:
+                    result["error"] = f"连接超时 (>{self.timeout}s)"
+                    continue
+                except requests.exceptions.ProxyError:
+                    result["error"] = "代理服务器错误或无法连接"
+                    break
+                except requests.exceptions.ConnectionError as e:
+                    result["error"] = "代理连接失败" if "proxy" in str(e).lower() else "网络连接失败"
+                    continue
+                # elapsed 为发出请求到解析完响应头的时间，复用连接时即 TTFB
+                elapsed_ms = response.elapsed.total_seconds() * 1000
+                status_code = response.status_code
+                if cold_ms is None:
+                    cold_ms = elapsed_ms
+                    if i < samples:
+                        continue
+                ttfb.append(elapsed_ms)
+
+            if ttfb:
+                p50 = percentile(ttfb, 50) or 0.0
+                result.update(
+                    ok_samples=len(ttfb),
+                    min=round(min(ttfb), 2),
+                    p50=round(p50, 2),
+                    p95=round(percentile(ttfb, 95) or 0.0, 2),
+                    jitter=round(_jitter(ttfb), 2),
+                    connect_time=round(max((cold_ms or p50) - p50, 0), 2),
+                )
+                if status_code == 200:
+                    result["status"] = "success"
+                    result["error"] = None
+                else:
+                    result["status"] = "partial"
+                    result["error"] = f"B站连接失败: HTTP {status_code}"
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    result["ip_info"] = self._get_ip_info(session, timeout=min(3, remaining))
+        except Exception as e:
+            result["error"] = f"未知错误: {str(e)}"
+        finally:
+            session.close()
+        return result
+
+    # 按 p50/抖动 对代理列表排序并缓存结果
+    def profile_proxy_list(
+        self,
+        proxy_string: str,
+        samples: int = 5,
+        max_workers: Optional[int] = None,
+        refresh: bool = False,
+        deadline: float = PROFILE_DEADLINE,
+    ) -> List[Dict[str, Any]]:
+        """deadline 为整个采样过程的秒数，到时仍未完成的代理记为失败"""
+        proxy_list = [p.strip() for p in (proxy_string or "").split(",") if p.strip()]
+        if not any(p.lower() in ("none", "direct") for p in proxy_list):
+            proxy_list.insert(0, "none")
+
+        results: List[Dict[str, Any]] = []
+        pending: List[str] = []
+        now = time.time()
+        with _profile_cache_lock:
+            for proxy in proxy_list:
+                cached = _profile_cache.get((proxy, samples, self.timeout))
+                if not refresh and cached and now - cached["tested_at"] < PROFILE_CACHE_TTL:
+                    results.append(dict(cached, cached=True))
+                else:
+                    pending.append(proxy)
+
+        if pending:
+            results.extend(self._profile_adaptive(pending, samples, max_workers, deadline))
+
+        status_rank = {"success": 0, "partial": 1, "failed": 2}
+        results.sort(
+            key=lambda r: (
+                status_rank.get(r["status"], 3),
+                r["p50"] if r["p50"] is not None else float("inf"),
+                r["jitter"] if r["jitter"] is not None else float("inf"),
+            )
+        )
+        return results
+
+    def _profile_adaptive(
+        self, pending: List[str], samples: int, max_workers: Optional[int], budget: float
+    ) -> List[Dict[str, Any]]:
+        """按并发上限逐个提交采样，上一个代理成功则上限加一，失败则减半"""
+        upper = max_workers or min(len(pending), PROFILE_MAX_WORKERS)
+        limit = min(PROFILE_MIN_WORKERS, upper)
+        deadline = time.monotonic() + budget
+        queue = list(pending)
+        results: List[Dict[str, Any]] = []
+        executor = ThreadPoolExecutor(max_workers=upper)
+        running: Dict[Any, str] = {}
+        try:
+            while queue or running:
+                while queue and len(running) < limit:
+                    proxy = queue.pop(0)
+                    running[executor.submit(self.profile_single_proxy, proxy, samples, deadline)] = proxy
+                # 留出一个请求超时的余量，让进行中的采样自行结束
+                remaining = deadline - time.monotonic() + self.timeout
+                done, _ = wait(running, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    proxy = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        loguru.logger.error(f"代理采样异常: {e}")
+                        limit = max(limit // 2, 1)
+                        continue
+                    if result["status"] == "success":
+                        limit = min(limit + 1, upper)
+                    else:
+                        limit = max(limit // 2, 1)
+                    if result.pop("complete"):
+                        with _profile_cache_lock:
+                            _profile_cache[(proxy, samples, self.timeout)] = result
+                    results.append(dict(result, cached=False))
+                    loguru.logger.info(
+                        f"代理采样完成: {result['proxy']} - {result['status']} p50={result['p50'] or '-'}ms"
+                    )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        for proxy in queue + list(running.values()):
+            results.append({
+                "proxy": "直连" if proxy.lower() in ("none", "direct") else proxy,
+                "status": "failed",
+                "samples": samples,
+                "ok_samples": 0,
+                "connect_time": None,
+                "min": None,
+                "p50": None,
+                "p95": None,
+                "jitter": None,
+                "error": f"超过采样总时限 ({budget:g}s)",
+                "ip_info": None,
+                "tested_at": time.time(),
+                "cached": False,
+            })
+        return results
+
+    # 格式化采样结果为排名文本
+    def format_profile_results(self, results: List[Dict[str, Any]]) -> str:
+        output = []
+        output.append("代理延迟排名（按 p50 排序）:")
+        output.append("=" * 50)
+        success_count = 0
+        for i, result in enumerate(results, 1):
+            tested_at = time.strftime("%H:%M:%S", time.localtime(result["tested_at"]))
+            source = f"缓存于 {tested_at}" if result.get("cached") else f"测试于 {tested_at}"
+            if result["status"] == "failed":
+                output.append(f"❌ [{i}] {result['proxy']}  ({source})")
+                output.append(f"    错误: {result['error']}")
+                output.append("")
+                continue
+            icon = "✅" if result["status"] == "success" else "⚠️ "
+            output.append(f"{icon} [{i}] {result['proxy']}  ({source})")
+            output.append(
+                f"    TTFB: min {result['min']}ms | p50 {result['p50']}ms | "
+                f"p95 {result['p95']}ms | 抖动 {result['jitter']}ms"
+            )
+            output.append(
+                f"    建连耗时: {result['connect_time']}ms | "
+                f"成功采样: {result['ok_samples']}/{result['samples']}"
+            )
+            if result["ip_info"] and result["ip_info"] != "IP获取失败":
+                output.append(f"    出口IP: {result['ip_info']}")
+            if result["status"] == "partial":
+                output.append(f"    警告: {result['error']}")
+            else:
+                success_count += 1
+            output.append("")
+        output.append("=" * 50)
+        output.append(f"测试统计: {success_count}/{len(results)} 个代理可用")
+        return "\n".join(output)
+
 def test_proxy_connectivity(proxy_string: str = "none", timeout: int = 10) -> str:
     tester = ProxyTester(timeout=timeout)
     results = tester.test_proxy_list(proxy_string)
     return tester.format_test_results(results)
 
+
+def profile_proxy_connectivity(
+    proxy_string: str = "none", timeout: int = 10, samples: int = 5, refresh: bool = False
+) -> str:
+    tester = ProxyTester(timeout=timeout)
+    results = tester.profile_proxy_list(proxy_string, samples=samples, refresh=refresh)
+    return tester.format_profile_results(results)
@@ -0,0 +1,31 @@
+"""
+二维码渲染，不依赖图片查看器：终端字符画和内存中的 PNG。
+"""
+import io
+
+import qrcode
+
+
+def _make(url: str, box_size: int) -> qrcode.QRCode:
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=2,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr
+
+
+def qr_text(url: str) -> str:
+    """用 █ 和空格绘制的二维码，每个模块占两列"""
+    rows = _make(url, 1).modules
+    return "\n".join(
+        "  " + "".join("██" if cell else "  " for cell in row) for row in rows
+    )
+
+
+def qr_png(url: str, box_size: int = 8) -> bytes:
+    buffer = io.BytesIO()
+    _make(url, box_size).make_image().save(buffer, format="PNG")  # type: ignore
+    return buffer.getvalue()
@@ -0,0 +1,161 @@
+"""
+扫码登录。
+
+二维码的生成和轮询在后台线程中进行，GUI 和 `btb login` 只读取会话状态，
+不会为了等待扫码阻塞请求线程。二维码图片在内存中生成，不再写入 TEMP_PATH。
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+import qrcode
+import requests
+from loguru import logger
+
+from util.CookieManager import parse_cookie_list
+
+GENERATE_URL = "https://passport.bilibili.com/x/passport-login/web/qrcode/generate"
+POLL_URL = "https://passport.bilibili.com/x/passport-login/web/qrcode/poll"
+HEADERS = {
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0",
+}
+GENERATE_RETRY = 10
+POLL_INTERVAL = 0.5
+LOGIN_TIMEOUT = 180  # 二维码有效期约 180 秒
+
+# 会话状态
+GENERATING = "生成中"
+WAITING = "等待扫码"
+SCANNED = "已扫码，请在手机上确认"
+SUCCESS = "登录成功"
+EXPIRED = "二维码已过期"
+FAILED = "登录失败"
+CANCELLED = "已取消"
+
+FINISHED_STATES = (SUCCESS, EXPIRED, FAILED, CANCELLED)
+
+
+class QRLoginSession:
+    def __init__(self, on_update: Optional[Callable[["QRLoginSession"], None]] = None):
+        self.on_update = on_update
+        self.status = GENERATING
+        self.message = ""
+        self.url: Optional[str] = None
+        self.qrcode_key: Optional[str] = None
+        self.cookies: Optional[list] = None
+        # 每次状态变化递增，便于界面判断是否需要推送
+        self.version = 0
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> "QRLoginSession":
+        self.thread = threading.Thread(target=self._run, daemon=True, name="qr-login")
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def image(self, box_size: int = 10):
+        """PIL 图片，二维码尚未生成时返回 None"""
+        if not self.url:
+            return None
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_H,  # type: ignore
+            box_size=box_size,
+            border=4,
+        )
+        qr.add_data(self.url)
+        qr.make(fit=True)
+        return qr.make_image(fill_color="black", back_color="white").get_image()
+
+    def _set(self, status: str, message: str = ""):
+        if status == self.status and message == self.message:
+            return
+        self.status, self.message = status, message
+        self.version += 1
+        if self.on_update is not None:
+            try:
+                self.on_update(self)
+            except Exception as e:
+                logger.exception(e)
+
+    def _run(self):
+        try:
+            if not self._generate():
+                return
+            self._poll()
+        except Exception as e:
+            logger.exception(e)
+            self._set(FAILED, str(e))
+        finally:
+            if self.cancelled.is_set() and not self.finished:
+                self._set(CANCELLED)
+            self.done.set()
+
+    def _generate(self) -> bool:
+        for _ in range(GENERATE_RETRY):
+            if self.cancelled.is_set():
+                return False
+            try:
+                res_json = requests.get(GENERATE_URL, headers=HEADERS, timeout=10).json()
+                if res_json["code"] == 0:
+                    self.url = res_json["data"]["url"]
+                    self.qrcode_key = res_json["data"]["qrcode_key"]
+                    self._set(WAITING)
+                    return True
+            except Exception as e:
+                logger.debug(f"获取二维码失败: {e}")
+            self.cancelled.wait(1)
+        self._set(FAILED, "二维码生成失败")
+        return False
+
+    def _poll(self):
+        deadline = time.monotonic() + LOGIN_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.cancelled.wait(POLL_INTERVAL):
+                return
+            try:
+                res = requests.get(
+                    POLL_URL,
+                    params={"qrcode_key": self.qrcode_key},
+                    headers=HEADERS,
+                    timeout=5,
+                )
+                poll_res = res.json()
+            except Exception as e:
+                logger.debug(f"轮询状态失败: {e}")
+                continue
+            if poll_res.get("code") != 0:
+                continue
+            code = poll_res["data"]["code"]
+            if code == 0:
+                self.cookies = parse_cookie_list(res.headers.get("set-cookie", ""))
+                self._set(SUCCESS)
+                return
+            elif code == 86101:
+                self._set(WAITING)
+            elif code == 86090:
+                self._set(SCANNED)
+            elif code == 86038:
+                self._set(EXPIRED, "二维码已过期，请重新获取")
+                return
+            else:
+                self._set(FAILED, poll_res["data"].get("message", "未知错误"))
+                return
+        self._set(EXPIRED, "登录超时，请重试")
+
+
+def start_qr_login(
+    on_update: Optional[Callable[[QRLoginSession], None]] = None,
+) -> QRLoginSession:
+    return QRLoginSession(on_update=on_update).start()
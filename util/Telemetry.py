@@ -0,0 +1,119 @@
+import os
+import sys
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+
+def get_rss_bytes() -> Optional[int]:
+    """当前进程常驻内存，获取失败返回 None"""
+    try:
+        import psutil  # 可选依赖
+
+        return psutil.Process().memory_info().rss
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+
+        # ru_maxrss 为峰值内存，Linux 单位为 KB，macOS 为字节
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+def percentile(values, pct: float) -> Optional[float]:
+    """按排序后的下标取百分位，values 为空时返回 None"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+@dataclass
+class TaskTelemetry:
+    """
+    单个抢票任务的运行状态，由 buy_stream 的事件（TelemetrySink）更新，通过心跳上报给 Master
+    """
+
+    task: str = "none"
+    phase: str = "初始化"
+    attempt: int = 0
+    last_errno: Optional[int] = None
+    time_offset: float = 0.0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=50))
+    # createV2 相邻两次请求开始的实际间隔，以及当前目标间隔，单位毫秒
+    periods: deque = field(default_factory=lambda: deque(maxlen=50))
+    target_period: Optional[float] = None
+    # createV2 重试计划发出时刻到实际发出时刻的延迟，单位毫秒
+    start_errors: deque = field(default_factory=lambda: deque(maxlen=50))
+    # 开票时刻的唤醒误差，单位毫秒，与重试的调度误差分开统计
+    wake_error: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def set_phase(self, phase: str) -> None:
+        self.phase = phase
+
+    def record_attempt(self, attempt: int, errno: Optional[int] = None) -> None:
+        self.attempt = attempt
+        if errno is not None:
+            self.last_errno = errno
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(seconds * 1000)
+
+    def record_period(self, seconds: float, target: float) -> None:
+        with self._lock:
+            self.periods.append(seconds * 1000)
+            self.target_period = target * 1000
+
+    def record_start_error(self, seconds: float) -> None:
+        with self._lock:
+            self.start_errors.append(seconds * 1000)
+
+    def record_wake_error(self, seconds: float) -> None:
+        self.wake_error = seconds * 1000
+
+    def _percentile(self, values: deque, pct: float) -> Optional[float]:
+        with self._lock:
+            ordered = list(values)
+        return percentile(ordered, pct)
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        return self._percentile(self.latencies, pct)
+
+    def period_percentile(self, pct: float) -> Optional[float]:
+        return self._percentile(self.periods, pct)
+
+    def start_error_percentile(self, pct: float) -> Optional[float]:
+        return self._percentile(self.start_errors, pct)
+
+    def snapshot(self) -> dict[str, Any]:
+        """紧凑的心跳 payload，数值取整以减少无意义的状态变化"""
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        i50 = self.period_percentile(50)
+        i95 = self.period_percentile(95)
+        rss = get_rss_bytes()
+        return {
+            "pid": os.getpid(),
+            "t": self.task,
+            "p": self.phase,
+            "a": self.attempt,
+            "e": self.last_errno,
+            "l50": None if p50 is None else round(p50),
+            "l95": None if p95 is None else round(p95),
+            "i50": None if i50 is None else round(i50),
+            "i95": None if i95 is None else round(i95),
+            "it": None if self.target_period is None else round(self.target_period),
+            "o": round(self.time_offset * 1000, 1),
+            "m": None if rss is None else rss // (1024 * 1024),
+        }
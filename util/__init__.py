@@ -2,12 +2,14 @@ from collections import namedtuple
 from dataclasses import dataclass, field
 import os
 import sys
+import threading
 import time
 import loguru
 from util.BiliRequest import BiliRequest
 from util.KVDatabase import KVDatabase
 from util.LogConfig import loguru_config
 from util.TimeUtil import TimeUtil
+from util.Telemetry import TaskTelemetry
 
 
 def get_application_path() -> str:
@@ -84,28 +86,80 @@ main_request = BiliRequest(cookies_config_path=ConfigDB.get("cookies_path"))
 
 
 def set_main_request(request):
+    from util.ApiCache import invalidate_account
+
     global main_request
     main_request = request
+    # 重新登录或导入后账号信息可能已变化
+    invalidate_account(request)
 
 
 time_service = TimeUtil()
 time_service.set_timeoffset(time_service.compute_timeoffset())
 
 
-Endpoint = namedtuple("Endpoint", ["endpoint", "detail", "update_at"])
+Endpoint = namedtuple(
+    "Endpoint", ["endpoint", "detail", "update_at", "stats"], defaults=[None]
+)
+
+HEARTBEAT_TTL = 4  # 超过该秒数未收到心跳的终端视为离线
 
 
 @dataclass
 class GlobalStatus:
     nowTask: str = "none"
+    telemetry: TaskTelemetry = field(default_factory=TaskTelemetry)
     endpoint_details: dict[str, Endpoint] = field(default_factory=dict)
-
-    def available_endpoints(self) -> list[Endpoint]:
-        return [
-            t
+    # 等待通过心跳响应通知停止的终端
+    stop_requests: set[str] = field(default_factory=set)
+    # 终端加入、离开或状态变化时递增，界面据此判断是否需要推送更新
+    version: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def report(self, endpoint: str, detail: str, stats: dict | None = None) -> None:
+        now = time.time()
+        with self._lock:
+            old = self.endpoint_details.get(endpoint)
+            if old is None or old.detail != detail or old.stats != stats:
+                self.version += 1
+            self.endpoint_details[endpoint] = Endpoint(
+                endpoint=endpoint, detail=detail, update_at=now, stats=stats
+            )
+            self._prune(now)
+
+    def request_stop(self, endpoints: list[str] | None = None) -> None:
+        """endpoints 为 None 时停止所有在线终端"""
+        with self._lock:
+            if endpoints is None:
+                endpoints = list(self.endpoint_details)
+            self.stop_requests.update(endpoints)
+
+    def consume_stop(self, endpoint: str) -> bool:
+        with self._lock:
+            if endpoint in self.stop_requests:
+                self.stop_requests.discard(endpoint)
+                return True
+            return False
+
+    def _prune(self, now: float) -> None:
+        stale = [
+            endpoint
             for endpoint, t in self.endpoint_details.items()
-            if time.time() - t.update_at < 4
+            if now - t.update_at >= HEARTBEAT_TTL
         ]
+        for endpoint in stale:
+            del self.endpoint_details[endpoint]
+            self.stop_requests.discard(endpoint)
+        if stale:
+            self.version += 1
+
+    def available_endpoints(self) -> list[Endpoint]:
+        return self.snapshot()[1]
+
+    def snapshot(self) -> tuple[int, list[Endpoint]]:
+        with self._lock:
+            self._prune(time.time())
+            return self.version, list(self.endpoint_details.values())
 
 
 GlobalStatusInstance = GlobalStatus()